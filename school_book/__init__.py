@@ -0,0 +1 @@
+default_app_config = 'school_book.apps.SchoolBookConfig'
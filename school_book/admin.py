@@ -10,7 +10,8 @@ from .models import (
     ClassRoomSchoolSubject,
     Grade,
     Event,
-    Absence
+    Absence,
+    EmailOutbox
 )
 
 # Register your models here.
@@ -26,3 +27,4 @@ admin.register(ClassRoomSchoolSubject)(admin.ModelAdmin)
 admin.register(Grade)(admin.ModelAdmin)
 admin.register(Event)(admin.ModelAdmin)
 admin.register(Absence)(admin.ModelAdmin)
+admin.register(EmailOutbox)(admin.ModelAdmin)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SchoolBookConfig(AppConfig):
     name = 'school_book'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,256 @@
+import json
+import time
+import tracemalloc
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    connection,
+    transaction
+)
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve
+from .helper import (
+    new_salt,
+    new_psw
+)
+from .models import (
+    Role,
+    Gender,
+    User,
+    SchoolClass,
+    SchoolClassProfessor,
+    SchoolClassStudent,
+    ClassRoomSchoolSubject
+)
+from .query_metrics import QueryRecorder
+from .reference_data import reference_data
+from .search import build_search_text
+from .seeding import (
+    SchoolSeeder,
+    SEED_PASSWORD
+)
+from .token_cache import security_token_cache
+
+# Sizes of the seeded school per scale (SchoolSeeder arguments)
+SCALES = {
+    'small': {'school_years': 1, 'classes_per_year': 4, 'students_per_class': 20},
+    'medium': {'school_years': 2, 'classes_per_year': 8, 'students_per_class': 25},
+    'large': {'school_years': 3, 'classes_per_year': 16, 'students_per_class': 30},
+}
+BENCHMARK_EMAIL = 'benchmark.administrator@school.book'
+
+
+def percentile(values, percent):
+    """
+    This method will get the percentile of the values (nearest rank)
+    :param values: sorted list
+    :param percent: e.g. 95
+    :return:
+    """
+    if not values:
+        return None
+    index = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+class EndpointBenchmark:
+    """
+    Benchmark of the endpoints through the Django test client, the requests go through the whole middleware stack.
+    For every endpoint the latency percentiles, the queries per request, the bytes per response and the peak memory of
+    one request (tracemalloc, measured with a separate request because tracing slows the requests down) are measured.
+    Everything runs in a transaction which is rolled back, and the caches are cleared before and after, so the
+    database and the caches are left as they were.
+    """
+
+    def __init__(self, requests=50, warmup=2, routes=None):
+        self.requests = requests
+        self.warmup = warmup
+        self.routes = routes
+        self.client = Client()
+
+    def run(self, scale=None, seed=2020):
+        """
+        This method will benchmark the endpoints
+        :param scale: name of the scale from SCALES which is seeded first, None for the data in the database
+        :param seed:
+        :return: dict of the seeded rows and the results per endpoint
+        """
+        self.clear_caches()
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+                rows = {}
+                if scale:
+                    rows = SchoolSeeder(seed=seed, first_school_year=1900, **SCALES[scale]).seed()
+                school_year = None
+                if scale:
+                    last_year = 1900 + SCALES[scale]['school_years'] - 1
+                    school_year = f'{last_year}/{last_year + 1}'
+                results = {}
+                for name, method, user, path, data in self.endpoints(school_year=school_year):
+                    if self.routes and not any(route in name for route in self.routes):
+                        continue
+                    results[name] = self.measure(method, user, path, data)
+                transaction.set_rollback(True)
+        finally:
+            self.clear_caches()
+        return {'rows': rows, 'endpoints': results}
+
+    @staticmethod
+    def clear_caches():
+        cache.clear()
+        reference_data.clear()
+        security_token_cache.clear()
+
+    def measure(self, method, user, path, data):
+        headers = {'HTTP_AUTHORIZATION': user.security_token()} if user else {}
+
+        def send():
+            if method == 'POST':
+                return self.client.post(path, data=json.dumps(data), content_type='application/json', **headers)
+            return self.client.get(path, **headers)
+
+        for _ in range(self.warmup):
+            send()
+        times = []
+        queries = []
+        response = None
+        for _ in range(self.requests):
+            recorder = QueryRecorder(slowest=0)
+            with connection.execute_wrapper(recorder):
+                start = time.perf_counter()
+                response = send()
+                times.append((time.perf_counter() - start) * 1000)
+            queries.append(recorder.queries)
+        tracemalloc.start()
+        try:
+            send()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        times.sort()
+        return {
+            'status': response.status_code,
+            'p50_ms': round(percentile(times, 50), 3),
+            'p95_ms': round(percentile(times, 95), 3),
+            'p99_ms': round(percentile(times, 99), 3),
+            'mean_ms': round(sum(times) / len(times), 3),
+            'queries': max(queries),
+            'bytes': len(response.content),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def endpoints(self, school_year=None):
+        """
+        This method will get the read endpoints with the users and the ids of the benchmarked data, the data is the
+        first school class of the school year
+        :param school_year: e.g. 2019/2020, the latest school year by default
+        :return: list of (name, method, user, path, data)
+        """
+        administrator = self.get_administrator()
+        if not school_year:
+            school_year = SchoolClass.objects.order_by('-school_year').values_list('school_year', flat=True).first()
+        school_class = SchoolClass.objects.filter(school_year=school_year).order_by('id').first()
+        school_class_student = SchoolClassStudent.objects.select_related('student').filter(
+            school_class=school_class
+        ).exclude(student__parent_mother=None).order_by('id').first()
+        school_class_professor = SchoolClassProfessor.objects.select_related('professor').filter(
+            school_class=school_class
+        ).order_by('id').first()
+        school_class_subject = ClassRoomSchoolSubject.objects.filter(school_class=school_class).order_by('id').first()
+        if not school_class_student or not school_class_professor or not school_class_subject:
+            raise ValueError('There is no school class with students, professors and school subjects to benchmark!')
+        student = school_class_student.student
+        parent = User.objects.select_related('role').get(id=student.parent_mother_id)
+        professor = school_class_professor.professor
+        school_class_id = school_class.id
+        school_subject_id = school_class_subject.school_subject_id
+        child = f'school_book/school_class/{school_class_id}/child/{student.id}'
+        endpoints = [
+            ('POST', None, 'school_book/login', {'email': BENCHMARK_EMAIL, 'password': SEED_PASSWORD}),
+            ('GET', administrator, 'school_book/users/', None),
+            ('GET', administrator, f'school_book/users/user/{student.id}', None),
+            ('GET', parent, 'school_book/parent/children', None),
+            ('GET', parent, 'school_book/parent/dashboard', None),
+            ('GET', parent, 'school_book/parent/events', None),
+            ('GET', administrator, 'school_book/school_subjects', None),
+            ('GET', parent, f'{child}/school_subject/{school_subject_id}/grades', None),
+            ('GET', parent, f'{child}/grade_summaries', None),
+            ('GET', professor, f'school_book/school_class/{school_class_id}/grade_summaries', None),
+            ('GET', parent, f'{child}/school_subject/{school_subject_id}/isJustified/all/absences', None),
+            ('GET', parent, f'{child}/school_subject/{school_subject_id}/absences', None),
+            ('GET', professor, f'school_book/school_class/{school_class_id}/absences', None),
+            ('GET', administrator, 'school_book/admin/roles', None),
+            ('GET', administrator, 'school_book/admin/genders', None),
+            ('GET', administrator, 'school_book/school_classes', None),
+            ('GET', administrator, f'school_book/school_classes/{student.id}', None),
+            ('GET', professor, f'school_book/school_classes/school_class/{school_class_id}/members', None),
+            ('GET', professor, f'school_book/school_classes/school_class/{school_class_id}/school_subjects', None),
+            ('GET', professor, 'school_book/professors/professor/school_classes', None),
+            ('GET', professor, f'school_book/school_classes/{school_class_id}/information', None),
+            ('GET', professor, 'school_book/professor/events', None),
+        ]
+        return [
+            (f'{method} {resolve(f"/{path}").route}', method, user, f'/{path}', data)
+            for method, user, path, data in endpoints
+        ]
+
+    @staticmethod
+    def get_administrator():
+        """
+        This method will create the administrator of the benchmark (rolled back with the benchmark), it is inserted
+        without save(), so no activation mail is queued
+        :return: user
+        """
+        gender = Gender.objects.order_by('id').first()
+        if not gender:
+            raise ValueError('There are no genders, seed the database first!')
+        salt = new_salt()
+        administrator = User(
+            first_name='Benchmark',
+            last_name='Administrator',
+            email=BENCHMARK_EMAIL,
+            phone='0910000000',
+            address='Street 1',
+            city='Zagreb',
+            is_active=True,
+            birth_date=date(1980, 1, 1),
+            gender_id=gender.id,
+            role_id=Role.objects.get_or_create(name='Administrator')[0].id,
+            newsletter=False,
+            salt=salt,
+            password=new_psw(salt, SEED_PASSWORD)
+        )
+        administrator.search_text = build_search_text(administrator)
+        User.objects.bulk_create([administrator])
+        return User.objects.select_related('role').get(email=BENCHMARK_EMAIL)
+
+
+def compare_results(baseline, results, threshold=0.2, min_ms=2.0):
+    """
+    This method will compare the results with the baseline
+    :param baseline: saved results
+    :param results: new results
+    :param threshold: allowed relative growth of the latency, the bytes and the memory e.g. 0.2 for 20 %
+    :param min_ms: latency growth below this is noise
+    :return: list of regressions (scale, endpoint, metric, baseline value, new value)
+    """
+    regressions = []
+    for scale, scale_results in results['scales'].items():
+        baseline_endpoints = baseline.get('scales', {}).get(scale, {}).get('endpoints', {})
+        for name, metrics in scale_results['endpoints'].items():
+            previous = baseline_endpoints.get(name)
+            if not previous:
+                continue
+            for metric in ['p50_ms', 'p95_ms', 'p99_ms']:
+                if metrics[metric] > previous[metric] * (1 + threshold) and metrics[metric] - previous[metric] > min_ms:
+                    regressions.append((scale, name, metric, previous[metric], metrics[metric]))
+            if metrics['queries'] > previous['queries']:
+                regressions.append((scale, name, 'queries', previous['queries'], metrics['queries']))
+            for metric in ['bytes', 'peak_memory_kb']:
+                if metrics[metric] > previous[metric] * (1 + threshold):
+                    regressions.append((scale, name, metric, previous[metric], metrics[metric]))
+            if metrics['status'] != previous['status']:
+                regressions.append((scale, name, 'status', previous['status'], metrics['status']))
+    return regressions
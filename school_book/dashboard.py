@@ -0,0 +1,128 @@
+from collections import defaultdict
+from django.db.models import (
+    Q,
+    Avg,
+    Count
+)
+from django.utils import timezone
+from .flat_serializers import FlatSerializer
+from .models import (
+    User,
+    Grade,
+    Event,
+    Absence,
+    SchoolClassStudent,
+    ClassRoomSchoolSubject
+)
+from .serializers import (
+    UserSerializer,
+    EventSerializer,
+    SchoolClassSerializer,
+    SchoolSubjectSerializer
+)
+
+
+class ParentDashboard:
+    """
+    The home screen of a parent: every child with the current school classes, the per subject grade summaries and
+    absence counts, and the upcoming events of the children school classes.
+    Everything is loaded with six queries (children, school classes, school class subjects, grades grouped by subject,
+    absences grouped by subject and events), so the number of queries doesn't depend on the number of the children,
+    the school classes, the subjects, the grades or the absences.
+    """
+
+    def __init__(self, parent_id, events_limit=20):
+        self.parent_id = parent_id
+        self.events_limit = events_limit
+        self.children = []
+        self.school_classes = defaultdict(list)
+        self.school_subjects = defaultdict(list)
+        self.grades = {}
+        self.absences = {}
+        self.school_class_absences = {}
+        self.events = []
+
+    def load(self):
+        user_serializer = FlatSerializer.for_serializer(UserSerializer)
+        self.children = list(user_serializer.prepare(
+            User.objects.filter(Q(parent_mother=self.parent_id) | Q(parent_father=self.parent_id))
+        ).order_by('id'))
+        children_ids = [child.id for child in self.children]
+        school_class_students = SchoolClassStudent.objects.select_related('school_class').filter(
+            student_id__in=children_ids,
+            is_active=True,
+            school_class__is_active=True
+        ).order_by('-school_class_id')
+        self.school_classes = defaultdict(list)
+        for school_class_student in school_class_students:
+            self.school_classes[school_class_student.student_id].append(school_class_student.school_class)
+        school_class_ids = set(
+            school_class.id for school_classes in self.school_classes.values() for school_class in school_classes
+        )
+        school_class_subjects = ClassRoomSchoolSubject.objects.select_related('school_subject').filter(
+            school_class_id__in=school_class_ids,
+            is_active=True
+        ).order_by('id')
+        self.school_subjects = defaultdict(list)
+        for school_class_subject in school_class_subjects:
+            self.school_subjects[school_class_subject.school_class_id].append(school_class_subject.school_subject)
+        grades = Grade.objects.filter(
+            student_id__in=children_ids,
+            school_class_id__in=school_class_ids
+        ).values('student_id', 'school_class_id', 'school_subject_id').annotate(
+            grades_number=Count('id'),
+            grades_average=Avg('grade')
+        ).order_by()
+        self.grades = {
+            (grade['student_id'], grade['school_class_id'], grade['school_subject_id']): grade for grade in grades
+        }
+        absences = Absence.objects.filter(
+            student_id__in=children_ids,
+            school_class_id__in=school_class_ids
+        ).values('student_id', 'school_class_id', 'school_subject_id').annotate(
+            justified_absences=Count('id', filter=Q(is_justified=True)),
+            unjustified_absences=Count('id', filter=Q(is_justified=False))
+        ).order_by()
+        self.absences = {}
+        self.school_class_absences = defaultdict(lambda: {'justified_absences': 0, 'unjustified_absences': 0})
+        for absence in absences:
+            self.absences[(absence['student_id'], absence['school_class_id'], absence['school_subject_id'])] = absence
+            school_class_absences = self.school_class_absences[(absence['student_id'], absence['school_class_id'])]
+            school_class_absences['justified_absences'] += absence['justified_absences']
+            school_class_absences['unjustified_absences'] += absence['unjustified_absences']
+        event_serializer = FlatSerializer.for_serializer(EventSerializer)
+        self.events = list(event_serializer.prepare(Event.objects.filter(
+            school_class_id__in=school_class_ids,
+            date__gte=timezone.now()
+        )).order_by('date', 'id')[:self.events_limit])
+        return self
+
+    def results(self):
+        """
+        This method will build the dashboard response
+        :return: list of children, list of upcoming events
+        """
+        school_class_serializer = FlatSerializer.for_serializer(SchoolClassSerializer)
+        school_subject_serializer = FlatSerializer.for_serializer(SchoolSubjectSerializer)
+        children = FlatSerializer.for_serializer(UserSerializer).serialize(self.children)
+        for child in children:
+            school_classes = []
+            for school_class in self.school_classes.get(child['id'], []):
+                school_class_data = school_class_serializer.serialize([school_class])[0]
+                school_class_data.update(self.school_class_absences[(child['id'], school_class.id)])
+                school_subjects = []
+                for school_subject in self.school_subjects.get(school_class.id, []):
+                    key = (child['id'], school_class.id, school_subject.id)
+                    grades = self.grades.get(key, {})
+                    absences = self.absences.get(key, {})
+                    school_subject_data = school_subject_serializer.serialize([school_subject])[0]
+                    school_subject_data['grades_number'] = grades.get('grades_number', 0)
+                    school_subject_data['grades_average'] = round(grades['grades_average'], 2) if grades else None
+                    school_subject_data['justified_absences'] = absences.get('justified_absences', 0)
+                    school_subject_data['unjustified_absences'] = absences.get('unjustified_absences', 0)
+                    school_subjects.append(school_subject_data)
+                school_class_data['school_subjects'] = school_subjects
+                school_classes.append(school_class_data)
+            child['school_classes'] = school_classes
+        events = FlatSerializer.for_serializer(EventSerializer).serialize(self.events)
+        return children, events
@@ -0,0 +1,119 @@
+import csv
+import json
+from django.conf import settings
+from django.utils import timezone
+from .models import (
+    Grade,
+    Absence,
+    SchoolClass
+)
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+# Exported columns (name, lookup), the names of the students, the school subjects and the professors are joined by
+# the query, so the rows are read with values_list() without any model instances
+COMMON_COLUMNS = [
+    ('id', 'id'),
+    ('created', 'created'),
+    ('school_year', 'school_class__school_year'),
+    ('school_class_id', 'school_class_id'),
+    ('school_class', 'school_class__name'),
+    ('student_id', 'student_id'),
+    ('student_first_name', 'student__first_name'),
+    ('student_last_name', 'student__last_name'),
+    ('school_subject_id', 'school_subject_id'),
+    ('school_subject', 'school_subject__name'),
+    ('professor_id', 'professor_id'),
+    ('professor_first_name', 'professor__first_name'),
+    ('professor_last_name', 'professor__last_name'),
+]
+EXPORTS = {
+    'grades': (Grade, COMMON_COLUMNS + [
+        ('grade', 'grade'),
+        ('grade_type', 'grade_type'),
+        ('comment', 'comment'),
+    ]),
+    'absences': (Absence, COMMON_COLUMNS + [
+        ('title', 'title'),
+        ('comment', 'comment'),
+        ('is_justified', 'is_justified'),
+    ]),
+}
+
+
+class Echo:
+    """
+    File-like object which returns the written value instead of keeping it, so csv.writer can render one row at a time
+    """
+
+    def write(self, value):
+        return value
+
+
+class SchoolYearExport:
+    """
+    Export of all the grades or absences of a school year (or of one school class of the school year) as CSV or JSON
+    Lines. The rows are read with iterator(chunk_size) (a server-side cursor on PostgreSQL) and rendered one by one, so
+    the memory stays flat no matter how many rows are exported.
+    """
+
+    def __init__(self, kind, school_year, school_class_id=None, export_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+        if kind not in EXPORTS:
+            raise ValueError(f"Unknown export {kind}, use {' or '.join(EXPORTS)}!")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {export_format}, use {' or '.join(EXPORT_FORMATS)}!")
+        if not school_year:
+            raise ValueError('School year is required!')
+        self.kind = kind
+        self.school_year = school_year
+        self.school_class_id = school_class_id
+        self.export_format = export_format
+        self.chunk_size = chunk_size
+        self.model, columns = EXPORTS[kind]
+        self.names = [name for name, lookup in columns]
+        self.lookups = [lookup for name, lookup in columns]
+
+    @property
+    def content_type(self):
+        return EXPORT_FORMATS[self.export_format]
+
+    @property
+    def filename(self):
+        school_class = f'_{self.school_class_id}' if self.school_class_id else ''
+        return f"{self.kind}_{self.school_year.replace('/', '-')}{school_class}.{self.export_format}"
+
+    def queryset(self):
+        school_classes = SchoolClass.objects.filter(school_year=self.school_year)
+        if self.school_class_id:
+            school_classes = school_classes.filter(id=self.school_class_id)
+        return self.model.objects.filter(
+            school_class_id__in=school_classes.values('id')
+        ).order_by('id').values_list(*self.lookups)
+
+    def rows(self):
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        created = self.names.index('created')
+        for row in self.queryset().iterator(chunk_size=self.chunk_size):
+            row = list(row)
+            if row[created] is not None:
+                if current_timezone and timezone.is_aware(row[created]):
+                    row[created] = timezone.localtime(row[created], current_timezone)
+                row[created] = row[created].strftime("%Y-%m-%dT%H:%M:%S")
+            yield row
+
+    def lines(self):
+        """
+        This method will render the export line by line
+        :return: generator of str
+        """
+        if self.export_format == 'csv':
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.names)
+            for row in self.rows():
+                yield writer.writerow(row)
+        else:
+            for row in self.rows():
+                yield json.dumps(dict(zip(self.names, row))) + '\n'
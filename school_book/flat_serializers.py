@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import (
+    ISO_8601,
+    serializers
+)
+from rest_framework.settings import api_settings
+
+# The values of these fields are already JSON ready, they don't need the DRF to_representation
+PLAIN_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+# Names of the side-loaded collections in the included map
+INCLUDED_NAMES = {
+    'User': 'users',
+    'SchoolSubject': 'school_subjects',
+    'SchoolClass': 'school_classes',
+}
+
+
+def iso_datetime(value, current_timezone):
+    """
+    Same output as the DRF DateTimeField with the ISO 8601 format, but the current timezone is read only once per list
+    """
+    if current_timezone is not None:
+        value = value.astimezone(current_timezone) if timezone.is_aware(value) else \
+            timezone.make_aware(value, current_timezone)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def field_converter(field):
+    """
+    This method will get the converter of the field value to the JSON value, the converter is called with the value
+    and the current timezone
+    :param field: DRF field
+    :return: converter or None if the value is already JSON ready
+    """
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    if isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone') and \
+            str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601:
+        return iso_datetime
+    return lambda value, current_timezone: field.to_representation(value)
+
+
+class FlatSerializer:
+    """
+    Fast serialization of the list endpoints. The field plan (output name, source, converter and nested plan) is built
+    once per DRF serializer class from its fields, and then the rows are turned into plain dicts directly, with the
+    same JSON shape as the DRF serializer but without the per-row field binding and the OrderedDicts.
+    The rows can be model instances with the relations loaded (select_related) or values_list() rows.
+    In the side-loaded mode the nested objects are replaced with their ids and every referenced object is serialized
+    only once into the included map.
+    """
+    plans = {}
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.lookups = []
+        self.related = []
+        self.nested_serializers = {}
+        self.plan = self.build_plan(serializer=serializer_class(), prefix='')
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        """
+        This method will get the flat serializer of the DRF serializer class, the plan is built only the first time
+        :param serializer_class: e.g. UserSerializer
+        :return: FlatSerializer
+        """
+        flat_serializer = cls.plans.get(serializer_class)
+        if not flat_serializer:
+            flat_serializer = cls.plans[serializer_class] = cls(serializer_class)
+        return flat_serializer
+
+    def lookup_index(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return self.lookups.index(lookup)
+
+    def build_plan(self, serializer, prefix):
+        """
+        This method will build the plan of the serializer fields
+        :param serializer:
+        :param prefix: lookup of the nested serializer e.g. 'student__parent_mother__'
+        :return: list of (name, source, values index, converter, nested plan)
+        """
+        plan = []
+        for name, field in serializer.fields.items():
+            source = field.source.replace('.', '__')
+            if isinstance(field, serializers.BaseSerializer):
+                self.related.append(f'{prefix}{source}')
+                if not prefix:
+                    self.nested_serializers[name] = type(field)
+                index = self.lookup_index(f'{prefix}{source}__id')
+                plan.append((name, source, index, None, self.build_plan(serializer=field, prefix=f'{prefix}{source}__')))
+            else:
+                plan.append((name, source, self.lookup_index(f'{prefix}{source}'), field_converter(field), None))
+        return plan
+
+    def prepare(self, queryset):
+        """
+        This method will load the relations of the serializer with the queryset
+        :param queryset:
+        :return: queryset
+        """
+        return queryset.select_related(*self.related) if self.related else queryset
+
+    def serialize(self, instances):
+        """
+        This method will serialize the model instances (the relations should be loaded with prepare)
+        :param instances:
+        :return: list of dicts
+        """
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [self.render_instance(self.plan, instance, current_timezone) for instance in instances]
+
+    def serialize_values(self, queryset):
+        """
+        This method will read the queryset as values_list() rows and serialize them, the model instances are not
+        created at all
+        :param queryset:
+        :return: list of dicts
+        """
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [self.render_row(self.plan, row, current_timezone) for row in queryset.values_list(*self.lookups)]
+
+    def serialize_sideloaded(self, instances):
+        """
+        This method will serialize the model instances with the ids of the nested objects, the nested objects are read
+        with one query per model (e.g. the professors and the students with one users query)
+        :param instances: the relations don't need to be loaded
+        :return: list of dicts, included map e.g. {'users': {'1': {...}}, 'school_subjects': {...}}
+        """
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        results = []
+        nested_ids = {}
+        for instance in instances:
+            data = {}
+            for name, source, index, converter, nested in self.plan:
+                if nested:
+                    value = getattr(instance, f'{source}_id')
+                    if value is not None:
+                        nested_ids.setdefault(self.nested_serializers[name], set()).add(value)
+                else:
+                    value = getattr(instance, source)
+                    if converter and value is not None:
+                        value = converter(value, current_timezone)
+                data[name] = value
+            results.append(data)
+        included = {}
+        for serializer_class, ids in nested_ids.items():
+            flat_serializer = FlatSerializer.for_serializer(serializer_class)
+            model = serializer_class.Meta.model
+            objects = flat_serializer.serialize(flat_serializer.prepare(model.objects.filter(id__in=ids).order_by('id')))
+            included.setdefault(INCLUDED_NAMES.get(model.__name__, model._meta.model_name), {}).update(
+                {str(nested_object['id']): nested_object for nested_object in objects}
+            )
+        return results, included
+
+    def render_instance(self, plan, instance, current_timezone):
+        data = {}
+        for name, source, index, converter, nested in plan:
+            value = getattr(instance, source)
+            if nested:
+                data[name] = self.render_instance(nested, value, current_timezone) if value is not None else None
+            elif converter and value is not None:
+                data[name] = converter(value, current_timezone)
+            else:
+                data[name] = value
+        return data
+
+    def render_row(self, plan, row, current_timezone):
+        data = {}
+        for name, source, index, converter, nested in plan:
+            value = row[index]
+            if nested:
+                data[name] = self.render_row(nested, row, current_timezone) if value is not None else None
+            elif converter and value is not None:
+                data[name] = converter(value, current_timezone)
+            else:
+                data[name] = value
+        return data
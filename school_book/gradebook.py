@@ -0,0 +1,88 @@
+from collections import defaultdict
+from .models import (
+    Grade,
+    SchoolClassStudent,
+    ClassRoomSchoolSubject
+)
+from .serializers import (
+    UserSerializer,
+    GradeSerializer,
+    SchoolClassSubjectsSerializer
+)
+
+USER_RELATIONS = ['gender', 'role', 'parent_mother', 'parent_father']
+
+
+def user_relations(prefix):
+    """
+    This method will return select_related paths for all the relations which UserSerializer reads
+    :param prefix: name of the user relationship e.g. professor
+    :return: list of paths
+    """
+    return [f'{prefix}__{relation}' for relation in USER_RELATIONS]
+
+
+class Gradebook:
+    """
+    The gradebook of one school class (all students, all school class subjects and all grades).
+    The roster, the subjects and the grades are loaded with one query each and grouped in memory, so the number of
+    queries doesn't depend on the number of the students, the subjects or the grades.
+    """
+
+    def __init__(self, school_class_id):
+        self.school_class_id = school_class_id
+        self.students = []
+        self.school_class_subjects = []
+        self.grades = defaultdict(list)
+
+    def load(self):
+        school_class_students = SchoolClassStudent.objects.select_related(
+            'student',
+            *user_relations('student')
+        ).filter(school_class_id=self.school_class_id).order_by('id')
+        self.students = [school_class_student.student for school_class_student in school_class_students]
+        self.school_class_subjects = list(
+            ClassRoomSchoolSubject.objects.select_related(
+                'professor',
+                *user_relations('professor'),
+                'school_subject',
+                'school_class'
+            ).filter(school_class_id=self.school_class_id).order_by('id')
+        )
+        grades = Grade.objects.select_related(
+            'professor',
+            *user_relations('professor'),
+            'student',
+            *user_relations('student'),
+            'school_subject',
+            'school_class'
+        ).filter(school_class_id=self.school_class_id).order_by('id')
+        self.grades = defaultdict(list)
+        for grade in grades:
+            self.grades[(grade.student_id, grade.school_subject_id)].append(grade)
+        return self
+
+    def results(self):
+        """
+        This method will build the same response as the old per student and per subject loop did
+        :return: list of students with their school subjects and grades
+        """
+        school_subjects = [
+            (
+                school_class_subject.school_subject_id,
+                SchoolClassSubjectsSerializer(many=False, instance=school_class_subject).data
+            )
+            for school_class_subject in self.school_class_subjects
+        ]
+        students = UserSerializer(many=True, instance=self.students).data
+        for student in students:
+            subject_list = []
+            for school_subject_id, school_subject in school_subjects:
+                grades = self.grades.get((student['id'], school_subject_id), [])
+                temp = {}
+                temp['school_subject'] = dict(school_subject)
+                temp['school_subject']['grades'] = [grade.grade for grade in grades]
+                temp['school_subject']['grades_info'] = GradeSerializer(many=True, instance=grades).data
+                subject_list.append(temp)
+            student['school_subjects'] = subject_list
+        return students
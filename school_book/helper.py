@@ -4,7 +4,10 @@ from random import (
     choice,
     random
 )
-from hashlib import sha512
+from hashlib import (
+    sha1,
+    sha512
+)
 import django
 from django.utils import timezone
 from django.http import HttpResponse
@@ -75,37 +78,58 @@ def activation_code(size):
     return ''.join([random.choice(string.ascii_letters + string.digits) for n in range(size)])
 
 
-def check_valid_limit_and_offset(limit, offset):
-    if not limit and offset:
-        return 0, 0
-    if limit:
-        try:
-            int(limit)
-        except ValueError as ex:
-            print(ex)
-    if offset:
-        try:
-            int(offset)
-        except ValueError as ex:
-            print(ex)
-    return int(limit), int(offset)
-
-
 def authorization(func):
     """
-    Authorization decorator to check does user send security token from the client side.
+    Authorization decorator to check does user send security token from the client side and was the token resolved
+    to the requester (request.principal) by the SecurityTokenMiddleware.
     :param func:
     :return:
     """
     def wrapper(*args, **kwargs):
         if 'Authorization' not in args[0].headers:
             response = error_handler(error_status=401, message=f'Security token is missing!')
+        elif not getattr(args[0], 'principal', None):
+            response = error_handler(error_status=401, message=f'Security token is not valid!')
         else:
             response = func(*args, **kwargs)
         return response
     return wrapper
 
 
+def conditional_get(*resource_keys):
+    """
+    Conditional GET decorator (after the authorization decorator). The strong ETag is the signature of the request
+    path, the requester and the versions of the resources which the response is built from, so If-None-Match is
+    answered with 304 Not Modified with one query and before the view reads or serializes anything.
+    :param resource_keys: e.g. 'school_class:{school_class_id}', 'professor:{principal.user_id}', the placeholders are
+    the view arguments and the principal
+    :return:
+    """
+    def decorator(func):
+        def wrapper(request, *args, **kwargs):
+            from .models import ResourceVersion
+            from .reference_data import reference_data
+            principal = request.principal
+            keys = [resource_key.format(principal=principal, **kwargs) for resource_key in resource_keys]
+            versions = ResourceVersion.get_versions(keys=keys)
+            for key, version in zip(keys, versions):
+                if key.startswith('reference:'):
+                    reference_data.check_version(kind=key[len('reference:'):], version=version)
+            signature = json.dumps([request.get_full_path(), principal.user_id, principal.role, keys, versions])
+            etag = f'"{sha1(signature.encode("utf-8", "ignore")).hexdigest()}"'
+            if_none_match = request.headers.get('If-None-Match', '')
+            if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                response = HttpResponse(status=304)
+            else:
+                response = func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
 # def check_does_requester_exist(security_token):
 #     security_token = security_token
 #     decoded_security_token = User.check_security_token(security_token=security_token)
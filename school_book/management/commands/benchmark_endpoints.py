@@ -0,0 +1,99 @@
+import json
+import platform
+import django
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.db import connection
+from school_book.benchmark import (
+    SCALES,
+    EndpointBenchmark,
+    compare_results
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the read endpoints (and the login) through the Django test client at several scales of a ' \
+           'seeded school: p50/p95/p99 latency, queries per request, bytes per response and peak memory. The ' \
+           'seeded rows are rolled back and the caches are cleared, run it against a development database. Save the ' \
+           'results with --output and compare a later run with --compare, the regressions fail the command.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='small',
+                            help=f"Comma separated scales ({', '.join(SCALES)}), or 'database' to benchmark the "
+                                 f"data in the database without seeding.")
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=2, help='Requests per endpoint before measuring.')
+        parser.add_argument('--seed', type=int, default=2020, help='Random seed of the seeded school.')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Benchmark only the endpoints which contain the text (repeatable).')
+        parser.add_argument('--output', help='Save the results as a JSON baseline file.')
+        parser.add_argument('--compare', help='Compare the results with the JSON baseline file.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative growth of the latency, bytes and memory (0.2 is 20 %%).')
+        parser.add_argument('--min-ms', type=float, default=2.0,
+                            help='Latency growth which is always ignored as noise.')
+
+    def handle(self, *args, **options):
+        scales = [scale.strip() for scale in options['scales'].split(',') if scale.strip()]
+        for scale in scales:
+            if scale not in SCALES and scale != 'database':
+                raise CommandError(f'Unknown scale {scale}!')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1!')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as ex:
+                raise CommandError(f'Baseline {options["compare"]} can not be read: {ex}')
+        benchmark = EndpointBenchmark(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            routes=options['routes']
+        )
+        results = {
+            'created': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': options['requests'],
+            'scales': {}
+        }
+        for scale in scales:
+            try:
+                scale_results = benchmark.run(scale=None if scale == 'database' else scale, seed=options['seed'])
+            except ValueError as ex:
+                raise CommandError(f'{ex}')
+            results['scales'][scale] = scale_results
+            self.write_scale(scale, scale_results)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2, sort_keys=True)
+            self.stdout.write(f"Results are saved to {options['output']}")
+        if baseline is not None:
+            regressions = compare_results(
+                baseline=baseline,
+                results=results,
+                threshold=options['threshold'],
+                min_ms=options['min_ms']
+            )
+            for scale, name, metric, previous, current in regressions:
+                self.stdout.write(f'REGRESSION {scale} {name} {metric}: {previous} -> {current}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions compared to {options["compare"]}!')
+            self.stdout.write(f"No regressions compared to {options['compare']}")
+
+    def write_scale(self, scale, scale_results):
+        rows = sum(scale_results['rows'].values())
+        self.stdout.write(f'{scale}' + (f' ({rows} seeded rows)' if rows else ''))
+        self.stdout.write(
+            f"{'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'bytes':>9} {'peak KB':>9}  endpoint"
+        )
+        for name, metrics in scale_results['endpoints'].items():
+            self.stdout.write(
+                f"{metrics['status']:>6} {metrics['p50_ms']:>8.2f} {metrics['p95_ms']:>8.2f} {metrics['p99_ms']:>8.2f} "
+                f"{metrics['queries']:>7} {metrics['bytes']:>9} {metrics['peak_memory_kb']:>9.1f}  {name}"
+            )
@@ -0,0 +1,80 @@
+import json
+import time
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.db import transaction
+from school_book.flat_serializers import FlatSerializer
+from school_book.models import (
+    User,
+    Grade,
+    Absence
+)
+from school_book.seeding import SchoolSeeder
+from school_book.serializers import (
+    UserSerializer,
+    GradeSerializer,
+    AbsenceSerializer
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF serializers with the flat (and side-loaded) serializers on the big lists (grades, ' \
+           'absences, users). The time includes reading the rows and json.dumps, the best time of the repeats is shown.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of rows per list.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', action='store_true',
+                            help='Seed a school first and roll it back at the end.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                SchoolSeeder(first_school_year=1900, classes_per_year=8, students_per_class=50).seed()
+            lists = [
+                ('grades', GradeSerializer, Grade.objects.order_by('id')),
+                ('absences', AbsenceSerializer, Absence.objects.order_by('id')),
+                ('users', UserSerializer, User.objects.order_by('id')),
+            ]
+            for name, serializer_class, queryset in lists:
+                queryset = queryset[:options['rows']]
+                rows = queryset.count()
+                if not rows:
+                    raise CommandError(f'There are no {name}, use --seed or seed the database first!')
+                flat_serializer = FlatSerializer.for_serializer(serializer_class)
+                drf = self.best_time(options['repeat'], lambda: json.dumps(
+                    serializer_class(many=True, instance=flat_serializer.prepare(queryset)).data
+                ))
+                flat = self.best_time(options['repeat'], lambda: json.dumps(
+                    flat_serializer.serialize(flat_serializer.prepare(queryset))
+                ))
+                flat_values = self.best_time(options['repeat'], lambda: json.dumps(
+                    flat_serializer.serialize_values(queryset)
+                ))
+                self.stdout.write(
+                    f'{name} ({rows} rows): DRF {drf * 1000:.0f} ms, '
+                    f'flat {flat * 1000:.0f} ms ({drf / flat:.1f}x), '
+                    f'flat values {flat_values * 1000:.0f} ms ({drf / flat_values:.1f}x)'
+                )
+                if flat_serializer.nested_serializers and serializer_class is not UserSerializer:
+                    sideloaded = self.best_time(options['repeat'], lambda: json.dumps(
+                        flat_serializer.serialize_sideloaded(queryset)
+                    ))
+                    inline_bytes = len(json.dumps(flat_serializer.serialize(flat_serializer.prepare(queryset))))
+                    sideloaded_bytes = len(json.dumps(flat_serializer.serialize_sideloaded(queryset)))
+                    self.stdout.write(
+                        f'{name} side-loaded: {sideloaded * 1000:.0f} ms ({drf / sideloaded:.1f}x), '
+                        f'{sideloaded_bytes} bytes instead of {inline_bytes} bytes'
+                    )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def best_time(repeat, function):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
@@ -0,0 +1,98 @@
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.db import (
+    connection,
+    transaction
+)
+from django.db.models import Q
+from school_book.models import (
+    User,
+    Grade,
+    Event,
+    Absence
+)
+from school_book.seeding import SchoolSeeder
+
+
+class Command(BaseCommand):
+    help = 'Explain the query plans of the hot access paths (grades, absences, events, parents, login, search) and show ' \
+           'whether they use an index or scan the whole table. Run it before and after ' \
+           '"migrate school_book 0002" to compare the plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='Seed a school first and roll it back at the end.')
+        parser.add_argument('--school-years', type=int, default=1)
+        parser.add_argument('--classes-per-year', type=int, default=8)
+        parser.add_argument('--students-per-class', type=int, default=25)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                counts = SchoolSeeder(
+                    first_school_year=1900,
+                    school_years=options['school_years'],
+                    classes_per_year=options['classes_per_year'],
+                    students_per_class=options['students_per_class']
+                ).seed()
+                self.stdout.write(f'Seeded {counts}')
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            for name, queryset in self.access_paths():
+                plan = queryset.explain()
+                self.stdout.write(f'{name}: {self.scan_type(plan)}')
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def access_paths():
+        grade = Grade.objects.order_by('id').first()
+        absence = Absence.objects.order_by('id').first()
+        event = Event.objects.order_by('id').first()
+        student = User.objects.filter(role__name='Student').exclude(parent_mother=None).order_by('id').first()
+        if not grade or not absence or not event or not student:
+            raise CommandError('There is no data to explain, use --seed or seed the database first!')
+        parent_id = student.parent_mother_id
+        return [
+            ('Grade(student, school_class, school_subject)', Grade.objects.filter(
+                student_id=grade.student_id,
+                school_class_id=grade.school_class_id,
+                school_subject_id=grade.school_subject_id
+            )),
+            ('Absence(student, school_class, school_subject, is_justified)', Absence.objects.filter(
+                student_id=absence.student_id,
+                school_class_id=absence.school_class_id,
+                school_subject_id=absence.school_subject_id,
+                is_justified=True
+            )),
+            ('Absence(school_class, school_subject) unjustified', Absence.objects.filter(
+                school_class_id=absence.school_class_id,
+                school_subject_id=absence.school_subject_id,
+                is_justified=False
+            )),
+            ('Event(school_class, -id)', Event.objects.filter(school_class_id=event.school_class_id).order_by('-id')),
+            ('Event(professor, -id)', Event.objects.filter(professor_id=event.professor_id).order_by('-id')),
+            ('User(parent_mother) | User(parent_father)', User.objects.filter(
+                Q(parent_mother=parent_id) | Q(parent_father=parent_id)
+            )),
+            ('User(email)', User.objects.filter(email=User.objects.get(id=parent_id).email)),
+            ('User search', User.get_all_users(data={'search': student.last_name[:3]}, requester='Professor')),
+        ]
+
+    @staticmethod
+    def scan_type(plan):
+        """
+        This method will summarize the plan (PostgreSQL and SQLite plans)
+        :param plan:
+        :return: index scan, sequential scan or mixed
+        """
+        lines = plan.upper().splitlines()
+        sequential = any('SEQ SCAN' in line or ('SCAN ' in line and 'INDEX' not in line) for line in lines)
+        index = any('INDEX' in line for line in lines)
+        if index and not sequential:
+            return 'index scan'
+        if sequential and not index:
+            return 'sequential scan'
+        return 'mixed'
@@ -0,0 +1,47 @@
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from school_book.exports import (
+    EXPORTS,
+    EXPORT_FORMATS,
+    EXPORT_CHUNK_SIZE,
+    SchoolYearExport
+)
+
+
+class Command(BaseCommand):
+    help = 'Export all the grades or absences of a school year (or of one school class) as CSV or JSON Lines. The ' \
+           'rows are streamed from the database in chunks, so the memory stays flat.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--school-year', required=True, help='e.g. 2019/2020')
+        parser.add_argument('--school-class-id', type=int)
+        parser.add_argument('--format', dest='export_format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='Output file, the standard output by default.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            export = SchoolYearExport(
+                kind=options['kind'],
+                school_year=options['school_year'],
+                school_class_id=options['school_class_id'],
+                export_format=options['export_format'],
+                chunk_size=options['chunk_size']
+            )
+        except ValueError as ex:
+            raise CommandError(f'{ex}')
+        if not options['output']:
+            for line in export.lines():
+                self.stdout.write(line, ending='')
+            return
+        rows = 0
+        with open(options['output'], 'w', newline='') as output:
+            for line in export.lines():
+                output.write(line)
+                rows += 1
+        if export.export_format == 'csv':
+            rows -= 1
+        self.stderr.write(f"Exported {rows} {options['kind']} to {options['output']}")
@@ -0,0 +1,49 @@
+import json
+import time
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from school_book.user_import import (
+    USER_IMPORT_CHUNK_SIZE,
+    UserImport,
+    read_users_csv
+)
+
+
+class Command(BaseCommand):
+    help = 'Import many users from a CSV file (the first line is the header with the field names) or a JSON file (list ' \
+           'of users). All the rows are validated first and nothing is imported if any row is not valid. The ' \
+           'passwords are hashed in a process pool and the activation mails are queued into the email outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes, the number of the CPUs by default.')
+        parser.add_argument('--chunk-size', type=int, default=USER_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the rows.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig') as users_file:
+                content = users_file.read()
+            rows = json.loads(content) if options['path'].endswith('.json') else read_users_csv(content)
+        except (OSError, ValueError) as ex:
+            raise CommandError(f"{options['path']} can not be read: {ex}")
+        if not isinstance(rows, list):
+            raise CommandError(f"{options['path']} should have a list of users!")
+        user_import = UserImport(rows=rows, chunk_size=options['chunk_size'], workers=options['workers'])
+        start = time.perf_counter()
+        if options['dry_run']:
+            users_number, errors = {}, user_import.validate()
+        else:
+            users_number, errors = user_import.run()
+        for error in errors:
+            self.stderr.write(f"Row {error['index'] + 1} {error['email'] or ''}: {error['message']}")
+        if errors:
+            raise CommandError(f'{len(errors)} rows are not valid, no user is imported!')
+        if options['dry_run']:
+            self.stdout.write(f'All {len(rows)} rows are valid.')
+            return
+        for role, number in users_number.items():
+            self.stdout.write(f'{role}: {number}')
+        self.stdout.write(f'Imported {len(rows)} users in {time.perf_counter() - start:.1f} s')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from school_book.models import GradeSummary
+
+
+class Command(BaseCommand):
+    help = 'Build the grade summaries (number, sum, average, min, max and last date of the grades per student, ' \
+           'school class and school subject) again from the grades.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Number of summaries per insert.')
+
+    def handle(self, *args, **options):
+        summaries_number = GradeSummary.rebuild_grade_summaries(batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt {summaries_number} grade summaries.')
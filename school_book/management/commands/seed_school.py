@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from school_book.seeding import SchoolSeeder
+
+
+class Command(BaseCommand):
+    help = 'Generate a school for load testing (school years, school classes, professors, parents with 1-3 children, ' \
+           'students, grades, absences and events). The same --seed always generates the same school, the rows are ' \
+           'inserted with bulk_create in batches without save() and without the activation mails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=2020, help='Random seed.')
+        parser.add_argument('--first-school-year', type=int, default=2019,
+                            help='First school year e.g. 2019 for 2019/2020, the school years must not exist yet.')
+        parser.add_argument('--school-years', type=int, default=1)
+        parser.add_argument('--classes-per-year', type=int, default=4)
+        parser.add_argument('--students-per-class', type=int, default=25)
+        parser.add_argument('--school-subjects', type=int, default=12)
+        parser.add_argument('--subjects-per-class', type=int, default=8)
+        parser.add_argument('--professors-per-subject', type=int, default=2)
+        parser.add_argument('--grades-per-subject', type=int, default=6,
+                            help='Average number of grades of a student per school subject.')
+        parser.add_argument('--absences-per-student', type=int, default=10,
+                            help='Average number of absences of a student per school year.')
+        parser.add_argument('--events-per-class', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for name in ['school_years', 'classes_per_year', 'students_per_class', 'school_subjects', 'subjects_per_class',
+                     'professors_per_subject', 'batch_size']:
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1!")
+        seeder = SchoolSeeder(
+            seed=options['seed'],
+            first_school_year=options['first_school_year'],
+            school_years=options['school_years'],
+            classes_per_year=options['classes_per_year'],
+            students_per_class=options['students_per_class'],
+            school_subjects=options['school_subjects'],
+            subjects_per_class=options['subjects_per_class'],
+            professors_per_subject=options['professors_per_subject'],
+            grades_per_subject=options['grades_per_subject'],
+            absences_per_student=options['absences_per_student'],
+            events_per_class=options['events_per_class'],
+            batch_size=options['batch_size']
+        )
+        start = time.perf_counter()
+        try:
+            counts = seeder.seed()
+        except ValueError as ex:
+            raise CommandError(f'{ex}')
+        duration = time.perf_counter() - start
+        rows = sum(counts.values())
+        for name, number in counts.items():
+            self.stdout.write(f'{name}: {number}')
+        self.stdout.write(f'Seeded {rows} rows in {duration:.1f} s ({rows / max(duration, 0.001):.0f} rows/s)')
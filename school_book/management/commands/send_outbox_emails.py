@@ -0,0 +1,81 @@
+import time
+from django.core.mail import (
+    EmailMessage,
+    get_connection
+)
+from django.core.management.base import BaseCommand
+from school_book.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = 'Send the queued mails from the email outbox in batches over one SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of mails sent per batch.')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Give up a mail after this many failures.')
+        parser.add_argument('--retry-delay', type=int, default=60, help='Seconds before the first retry.')
+        parser.add_argument('--lease', type=int, default=300,
+                            help='Seconds a claimed mail is skipped by the other workers while it is sent.')
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox until stopped.')
+        parser.add_argument('--sleep', type=int, default=5, help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.send_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                retry_delay=options['retry_delay'],
+                lease=options['lease']
+            )
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} mails, {failed} failed.')
+            if not options['loop']:
+                break
+            if not sent and not failed:
+                time.sleep(options['sleep'])
+
+    @staticmethod
+    def send_batch(batch_size, max_attempts, retry_delay, lease=300):
+        """
+        This method will send one batch of the pending mails, the mails are claimed in a short transaction and sent
+        outside of it, every mail is marked as sent or scheduled for a retry with its own update
+        :param batch_size:
+        :param max_attempts:
+        :param retry_delay:
+        :param lease: seconds a claimed mail is skipped by the other workers
+        :return: number of sent and number of failed mails
+        """
+        emails = EmailOutbox.claim_pending_emails(limit=batch_size, lease=lease)
+        if not emails:
+            return 0, 0
+        sent = 0
+        failed = 0
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as ex:
+            print(ex)
+            for email in emails:
+                email.schedule_retry(error=ex, max_attempts=max_attempts, retry_delay=retry_delay)
+            return 0, len(emails)
+        try:
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.message,
+                    from_email=email.from_email,
+                    to=[email.to_email],
+                    connection=connection
+                )
+                try:
+                    message.send()
+                except Exception as ex:
+                    print(ex)
+                    email.schedule_retry(error=ex, max_attempts=max_attempts, retry_delay=retry_delay)
+                    failed += 1
+                    continue
+                EmailOutbox.mark_as_sent(email_ids=[email.id])
+                sent += 1
+        finally:
+            connection.close()
+        return sent, failed
@@ -0,0 +1,114 @@
+from collections import namedtuple
+from django.conf import settings
+from django.db import connection
+from .models import User
+from .token_cache import security_token_cache
+from .reference_data import reference_data
+from .query_metrics import (
+    QueryRecorder,
+    query_metrics
+)
+
+
+class Principal(namedtuple('Principal', ['user_id', 'email', 'role', 'role_id', 'is_token_current'])):
+    """
+    The authenticated requester. The principal is resolved once per request from the security token and it can't be
+    changed during the request.
+    is_token_current is True when the token claims (email, role and user id) still match the user, that is the same
+    check as comparing the token with user.security_token() but without signing a new token.
+    """
+    __slots__ = ()
+
+    def has_role(self, *role_names):
+        """
+        This method will check does the requester have one of the roles
+        :param role_names: e.g. 'Administrator', 'Professor'
+        :return: True or False
+        """
+        return self.role in role_names
+
+    def is_token_of(self, user):
+        """
+        This method will check is the security token issued for the user
+        :param user:
+        :return: True or False
+        """
+        return self.is_token_current and \
+            user.id == self.user_id and user.email == self.email and user.role_id == self.role_id
+
+
+class SecurityTokenMiddleware:
+    """
+    This middleware will decode the security token from the Authorization header only once per request (or take it
+    from the security token cache), load the requester in one query (the role name comes from the reference data cache)
+    and set request.principal (None if the token is missing or not valid).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = self.get_principal(request)
+        return self.get_response(request)
+
+    @staticmethod
+    def get_principal(request):
+        security_token = request.headers.get('Authorization')
+        if not security_token:
+            return None
+        cached = security_token_cache.get(security_token)
+        if cached:
+            decoded_security_token, user_id = cached
+            user = User.objects.filter(id=user_id).first()
+            if not user or user.email != decoded_security_token['email']:
+                security_token_cache.evict(security_token)
+                return None
+        else:
+            decoded_security_token = User.check_security_token(security_token=security_token)
+            if not decoded_security_token:
+                return None
+            user = User.objects.filter(email=decoded_security_token['email']).first()
+            if not user:
+                return None
+            security_token_cache.set(security_token, claims=decoded_security_token, user_id=user.id)
+        role = reference_data.get_role_name(user.role_id)
+        return Principal(
+            user_id=user.id,
+            email=user.email,
+            role=role,
+            role_id=user.role_id,
+            is_token_current=decoded_security_token['role'] == role and
+            decoded_security_token['user_id'] == user.id
+        )
+
+
+class QueryMetricsMiddleware:
+    """
+    This middleware will record the number of the queries, the database time and the slowest statements of every
+    request into the query metrics (per URL pattern), in the debug mode they are also sent in the X-DB-Queries,
+    X-DB-Time-Ms and X-DB-Slowest-Ms response headers. It should be the first middleware, so the queries of the other
+    middlewares (e.g. the principal) are counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.route if resolver_match else 'unresolved'
+        query_metrics.record(
+            route=route,
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            recorder=recorder
+        )
+        if settings.DEBUG:
+            slowest = recorder.slowest_queries()
+            response['X-DB-Queries'] = str(recorder.queries)
+            response['X-DB-Time-Ms'] = f'{recorder.time * 1000:.3f}'
+            response['X-DB-Slowest-Ms'] = f"{slowest[0]['time_ms']:.3f}" if slowest else '0'
+        return response
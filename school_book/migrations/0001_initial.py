@@ -0,0 +1,179 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import school_book.helper
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('subject', models.CharField(help_text='This field is required!', max_length=128)),
+                ('message', models.TextField(help_text='This field is required!')),
+                ('from_email', models.CharField(help_text='This field is required!', max_length=128)),
+                ('to_email', models.CharField(help_text='This field is required!', max_length=254)),
+                ('attempts', models.IntegerField(default=0, help_text='This field will fill automatically after every failed sending! Non-required!')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, help_text='The mail will not be sent before this time! This field will fill automatically after every failed sending! Non-required!')),
+                ('sent', models.DateTimeField(blank=True, help_text='This field will fill automatically when the mail is sent! Non-required!', null=True)),
+                ('is_failed', models.BooleanField(default=False, help_text='If sending fails too many times the mail will not be sent anymore!')),
+                ('last_error', models.TextField(blank=True, help_text='This field will fill automatically after every failed sending! Non-required!', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Gender',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('name', models.CharField(help_text='This field is required!', max_length=10, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('name', models.CharField(help_text='This field is required!', max_length=50, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchoolClass',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('school_year', models.CharField(help_text='This field is required!', max_length=9)),
+                ('name', models.CharField(help_text='This field is required!', max_length=50)),
+                ('is_active', models.BooleanField(default=False, help_text='If class room is deactivated, professors can only read class room and all related with class room!')),
+            ],
+            options={
+                'unique_together': {('name', 'school_year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SchoolSubject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_active', models.BooleanField(default=False, help_text="If school subject is deactivated then that school subject can't be chosen in school class subjects!")),
+                ('name', models.CharField(help_text='This field is required!', max_length=50, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('first_login', models.DateTimeField(blank=True, help_text='This field will fill automatically after first login! Non-required!', null=True)),
+                ('last_login', models.DateTimeField(blank=True, help_text='This field will fill automatically after every login! Non-required!', null=True)),
+                ('first_name', models.CharField(help_text='This field is required!', max_length=50)),
+                ('last_name', models.CharField(help_text='This field is required!', max_length=50)),
+                ('email', models.EmailField(blank=True, help_text='This field is required only if role is not a Student!', max_length=50, null=True)),
+                ('address', models.CharField(help_text='This field is required!', max_length=100)),
+                ('city', models.CharField(help_text='This field is required!', max_length=50)),
+                ('phone', models.CharField(blank=True, help_text='This field is required only if role is not a Student!', max_length=50, null=True)),
+                ('salt', models.CharField(blank=True, default=school_book.helper.new_salt, help_text='This field is self generated! Do not change it through Django Admin. Required!', max_length=255, null=True)),
+                ('admin_password', models.CharField(blank=True, help_text='This password will be encrypted through Django Admin! This field is required!', max_length=255, null=True)),
+                ('password', models.CharField(blank=True, help_text="This field shouldn't be used through Django Admin! Non-required!", max_length=255, null=True)),
+                ('is_active', models.BooleanField(default=False)),
+                ('birth_date', models.DateField(help_text='This field is required!')),
+                ('activation_code', models.CharField(blank=True, help_text='This field will fill automatically when user become deactivated! Field will be deleted when user become activated! Non-required!', max_length=10, null=True)),
+                ('expired_activation_code', models.DateTimeField(blank=True, help_text='This field will fill automatically! Activation code will not be valid if user uses activation code after one hour! Non-required!', null=True)),
+                ('newsletter', models.BooleanField(default=False)),
+                ('gender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='school_book.Gender')),
+                ('parent_father', models.ForeignKey(blank=True, help_text='This field is required if role is a Student! Optional if parent_mother is filled!', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='User.parent_father+', to='school_book.User')),
+                ('parent_mother', models.ForeignKey(blank=True, help_text='This field is required if role is a Student! Optional if parent_father is filled!', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='User.parent_mother+', to='school_book.User')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='school_book.Role')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Grade',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('grade', models.IntegerField(help_text='Professor can enter grades in range 1-5. Required!')),
+                ('grade_type', models.CharField(help_text='Professor can enter some type e.g exam. Required!', max_length=50)),
+                ('comment', models.CharField(blank=True, help_text="This is additional field to set some notes e.g Student didn't learn last lesion! Not required!", max_length=128, null=True)),
+                ('professor', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, related_name='User.professor+', to='school_book.User')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('school_subject', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolSubject')),
+                ('student', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, related_name='User.student+', to='school_book.User')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('title', models.CharField(help_text='Professor will use this field to set title of event, e.g exam, excursion etc. This field is required!', max_length=64)),
+                ('comment', models.CharField(help_text='Here professors add new events that parents could see and motivate their children to get better results! E.g. Math exam in 13.02.2020 in 13:00:00 or Math exam will benext friday or this field could be as some school events like excursion etc. This field is required!', max_length=128)),
+                ('date', models.DateTimeField(help_text='This field is required!')),
+                ('professor', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.User')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('school_subject', models.ForeignKey(help_text='This field is optional! This field will help parents to know if event is exam andwhich school subject is about.', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolSubject')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Absence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('title', models.CharField(blank=True, help_text='This filed will help parents to have a better view. Not required!', max_length=64, null=True)),
+                ('comment', models.CharField(help_text='Professor needs enter a reason of absence. E.g. student did not show up. Required!', max_length=128)),
+                ('is_justified', models.BooleanField(default=False, help_text='This field will help professors and parents to see is some absence justified. Not required!')),
+                ('professor', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, related_name='User.professor+', to='school_book.User')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('school_subject', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolSubject')),
+                ('student', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, related_name='User.student+', to='school_book.User')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchoolClassStudent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_active', models.BooleanField(default=False, help_text='If student is deactivated then professor can see only read student information!')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('student', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.User')),
+            ],
+            options={
+                'unique_together': {('student', 'school_class')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SchoolClassProfessor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_active', models.BooleanField(default=False, help_text='If professor is deactivated then professor can only read student information!')),
+                ('professor', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.User')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+            ],
+            options={
+                'unique_together': {('professor', 'school_class')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassRoomSchoolSubject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_active', models.BooleanField(default=False, help_text='If school subject is deactivated then that school subject can be readable only!')),
+                ('professor', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.User')),
+                ('school_class', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('school_subject', models.ForeignKey(help_text='This field is required!', on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolSubject')),
+            ],
+            options={
+                'unique_together': {('professor', 'school_subject', 'school_class')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_book', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='parent_father',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='This field is required if role is a Student! Optional if parent_mother is filled!', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='User.parent_father+', to='school_book.User'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='parent_mother',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='This field is required if role is a Student! Optional if parent_father is filled!', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='User.parent_mother+', to='school_book.User'),
+        ),
+        migrations.AddIndex(
+            model_name='absence',
+            index=models.Index(fields=['student', 'school_class', 'school_subject', 'is_justified'], name='absence_student_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='absence',
+            index=models.Index(condition=models.Q(is_justified=False), fields=['school_class', 'school_subject'], name='absence_unjustified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['school_class', '-id'], name='event_school_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['professor', '-id'], name='event_professor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['student', 'school_class', 'school_subject'], name='grade_student_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(email__isnull=False), fields=['email'], name='user_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(parent_mother__isnull=False), fields=['parent_mother'], name='user_parent_mother_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(parent_father__isnull=False), fields=['parent_father'], name='user_parent_father_idx'),
+        ),
+    ]
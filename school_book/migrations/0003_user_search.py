@@ -0,0 +1,39 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from school_book.search import (
+    build_search_text,
+    create_search_index,
+    drop_search_index
+)
+
+
+def fill_search_text(apps, schema_editor):
+    User = apps.get_model('school_book', 'User')
+    for user in User.objects.all().iterator():
+        User.objects.filter(id=user.id).update(search_text=build_search_text(user))
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_book', '0002_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='This field is self generated from the names, email, phone and address for the search!'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
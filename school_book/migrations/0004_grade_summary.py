@@ -0,0 +1,60 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import (
+    Count,
+    Sum,
+    Min,
+    Max
+)
+
+
+def fill_grade_summaries(apps, schema_editor):
+    Grade = apps.get_model('school_book', 'Grade')
+    GradeSummary = apps.get_model('school_book', 'GradeSummary')
+    grades = Grade.objects.values('student_id', 'school_class_id', 'school_subject_id').annotate(
+        grades_number=Count('id'),
+        grades_sum=Sum('grade'),
+        min_grade=Min('grade'),
+        max_grade=Max('grade'),
+        last_grade_date=Max('created')
+    ).order_by()
+    GradeSummary.objects.bulk_create(
+        [GradeSummary(grades_average=grade['grades_sum'] / grade['grades_number'], **grade) for grade in grades.iterator()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_book', '0003_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grades_number', models.IntegerField(default=0)),
+                ('grades_sum', models.IntegerField(default=0)),
+                ('grades_average', models.FloatField(default=0)),
+                ('min_grade', models.IntegerField(null=True)),
+                ('max_grade', models.IntegerField(null=True)),
+                ('last_grade_date', models.DateTimeField(null=True)),
+                ('school_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolClass')),
+                ('school_subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='school_book.SchoolSubject')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='User.grade_summary+', to='school_book.User')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gradesummary',
+            index=models.Index(fields=['school_class', 'school_subject'], name='grade_summary_class_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gradesummary',
+            unique_together={('student', 'school_class', 'school_subject')},
+        ),
+        migrations.RunPython(fill_grade_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_book', '0004_grade_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='This field is required!', max_length=64, unique=True)),
+                ('version', models.BigIntegerField(default=1)),
+            ],
+        ),
+    ]
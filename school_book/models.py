@@ -4,11 +4,25 @@ from datetime import (
     datetime,
     timedelta
 )
+from hashlib import sha1
 import django
-from django.db import models
-from django.db.models import Q
+from django.db import (
+    models,
+    transaction,
+    IntegrityError
+)
+from django.db.models import (
+    F,
+    Q,
+    Exists,
+    OuterRef,
+    Subquery,
+    Count,
+    Sum,
+    Min,
+    Max
+)
 from django.core.validators import ValidationError
-from django.core.mail import send_mail
 from jose import jwt
 from .helper import (
     new_salt,
@@ -20,6 +34,93 @@ from .constants import (
     secret_key_word,
     roles
 )
+from .token_cache import security_token_cache
+from .reference_data import reference_data
+from .search import (
+    build_search_text,
+    search_users
+)
+
+MEMBER_ACTIONS = ['enroll', 'activate', 'deactivate', 'remove']
+# Aggregates of the grades of one student, school class and school subject
+GRADE_SUMMARY_AGGREGATES = {
+    'grades_number': Count('id'),
+    'grades_sum': Sum('grade'),
+    'min_grade': Min('grade'),
+    'max_grade': Max('grade'),
+    'last_grade_date': Max('created'),
+}
+
+
+def load_related_state(user_ids, school_class_id=None, school_subject_id=None, memberships=False):
+    """
+    This method will read the role and the active state of the users and the active state of the school class and the
+    school subject with one query (the school class and the school subject are subqueries of the users query and the
+    role names come from the reference data cache), so the saved rows are validated without loading every relation and
+    the user roles one by one
+    :param user_ids: list of user ids
+    :param school_class_id:
+    :param school_subject_id:
+    :param memberships: also read the parents of the users and whether the users are professors or students of the
+    school class (is_school_class_professor, is_school_class_student)
+    :return: dict (users by id with is_active and role__name, school_class_is_active, school_subject_is_active), the
+    state of a missing row is None (also the school class and the school subject states when no user exists)
+    """
+    annotations = {}
+    fields = []
+    if memberships:
+        annotations['is_school_class_professor'] = Exists(SchoolClassProfessor.objects.filter(
+            professor_id=OuterRef('id'),
+            school_class_id=school_class_id
+        ))
+        annotations['is_school_class_student'] = Exists(SchoolClassStudent.objects.filter(
+            student_id=OuterRef('id'),
+            school_class_id=school_class_id
+        ))
+        fields = ['parent_mother_id', 'parent_father_id']
+    if school_class_id:
+        annotations['school_class_is_active'] = Subquery(
+            SchoolClass.objects.filter(id=school_class_id).values('is_active')[:1]
+        )
+    if school_subject_id:
+        annotations['school_subject_is_active'] = Subquery(
+            SchoolSubject.objects.filter(id=school_subject_id).values('is_active')[:1]
+        )
+    users = list(User.objects.filter(id__in=set(user_ids)).annotate(**annotations).values(
+        'id',
+        'is_active',
+        'role_id',
+        *fields,
+        *annotations
+    ))
+    for user in users:
+        user['role__name'] = reference_data.get_role_name(user['role_id'])
+    return {
+        'users': {user['id']: user for user in users},
+        'school_class_is_active': users[0].get('school_class_is_active') if users else None,
+        'school_subject_is_active': users[0].get('school_subject_is_active') if users else None,
+    }
+
+
+def get_related_user(state, user_id, name):
+    """
+    This method will get the state of the user from load_related_state
+    :param state:
+    :param user_id:
+    :param name: name of the relation for the error message e.g. Professor
+    :return: dict (id, is_active, role__name)
+    """
+    user = state['users'].get(user_id)
+    if not user:
+        raise ValueError(f"{name} doesn't exist!")
+    return user
+
+
+def check_related_school_class_and_subject(state, school_class_id=None, school_subject_id=None):
+    if school_class_id and state['school_class_is_active'] is None:
+        raise ValueError(f"School class doesn't exist!")
+    if school_subject_id and state['school_subject_is_active'] is None:
+        raise ValueError(f"School subject doesn't exist!")
 
 
 class Role(models.Model):
@@ -34,13 +135,12 @@ class Role(models.Model):
         return self.name
 
     @staticmethod
-    def get_all_roles(limit, offset):
-        roles = Role.objects.filter().order_by('id').all()
-        if offset and limit and limit > offset:
-            roles = roles[offset*limit:(offset*limit)+limit]
-        elif not offset and limit and limit > offset:
-            roles = roles[:offset+limit]
-        return roles
+    def get_all_roles():
+        """
+        This method will get all the roles from the reference data cache
+        :return: list of serialized roles ordered by id
+        """
+        return reference_data.get('roles')
 
     @staticmethod
     def count_roles():
@@ -88,7 +188,11 @@ class Gender(models.Model):
 
     @staticmethod
     def get_all_genders():
-        return Gender.objects.filter().all()
+        """
+        This method will get all the genders from the reference data cache
+        :return: list of serialized genders ordered by id
+        """
+        return reference_data.get('genders')
 
 
 class User(models.Model):
@@ -137,7 +241,7 @@ class User(models.Model):
     )
     salt = models.CharField(
         max_length=255,
-        default=new_salt(),
+        default=new_salt,
         null=True,
         blank=True,
         help_text=f'This field is self generated! Do not change it through Django Admin. Required!'
@@ -174,6 +278,12 @@ class User(models.Model):
     newsletter = models.BooleanField(
         default=False
     )
+    search_text = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        help_text=f'This field is self generated from the names, email, phone and address for the search!'
+    )
 
     # Relationships
     gender = models.ForeignKey(
@@ -190,6 +300,7 @@ class User(models.Model):
         related_name='User.parent_mother+',
         null=True,
         blank=True,
+        db_index=False,
         help_text=f'This field is required if role is a Student! Optional if parent_father is filled!'
     )
     parent_father = models.ForeignKey(
@@ -198,9 +309,18 @@ class User(models.Model):
         related_name='User.parent_father+',
         null=True,
         blank=True,
+        db_index=False,
         help_text=f'This field is required if role is a Student! Optional if parent_mother is filled!'
     )
 
+    class Meta:
+        indexes = [
+            # Only the students have parents and only the other roles have emails, so the indexes are partial
+            models.Index(fields=['email'], name='user_email_idx', condition=Q(email__isnull=False)),
+            models.Index(fields=['parent_mother'], name='user_parent_mother_idx', condition=Q(parent_mother__isnull=False)),
+            models.Index(fields=['parent_father'], name='user_parent_father_idx', condition=Q(parent_father__isnull=False)),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} {self.email if self.email else None} {self.role.name if self.role else ''}"
 
@@ -267,12 +387,14 @@ class User(models.Model):
                     self.password = new_psw(self.salt, self.admin_password) if self.admin_password else self.password
                     self.admin_password = None
                     changing_password = True
-        super(User, self).save(*args, **kwargs)
-        if not existing_id or (existing_id and changing_password) and not self.role.name == 'Student':
-            if self.send_activation_code_on_email():
-                return ok_response(message=f'Mail sent successfully!')
-            else:
-                return error_handler(error_status=502, message=f"Mail didn't send!")
+        self.search_text = build_search_text(self)
+        with transaction.atomic():
+            super(User, self).save(*args, **kwargs)
+            if not existing_id or (existing_id and changing_password) and not self.role.name == 'Student':
+                if self.send_activation_code_on_email():
+                    return ok_response(message=f'Mail queued successfully!')
+                else:
+                    return error_handler(error_status=502, message=f"Mail didn't queue!")
 
     @staticmethod
     def check_user_unique_email(email):
@@ -293,6 +415,7 @@ class User(models.Model):
             self.activation_code = self.create_activation_code(10)
             self.expired_activation_code = django.utils.timezone.now() + timedelta(hours=2)
             self.save()
+            security_token_cache.evict_user(self.id)
             return True
         except Exception as ex:
             print(ex)
@@ -363,7 +486,7 @@ class User(models.Model):
         if requester not in ['Administrator', 'Professor', 'Parent']:
             return None
         if requester == 'Professor':
-            user = user.filter(role__name__in=['Professor', 'Student', 'Parent'])
+            user = user.filter(role_id__in=reference_data.get_role_ids(['Professor', 'Student', 'Parent']))
         if requester == 'Parent' and parent_id:
             user = user.filter(Q(parent_mother=parent_id) | Q(parent_father=parent_id))
         return user.first()
@@ -371,11 +494,10 @@ class User(models.Model):
     @staticmethod
     def get_all_users(data, requester):
         """
-        This method will get all users depends on filters, is user is deleted, deactivated etc.
-        :return: user_list
+        This method will compile the query string filters (is_active, roleId, genderId, birthDate, search) and the
+        requester scope into one queryset, the paging (limit, cursor) is done by the CursorPaginator
+        :return: users queryset
         """
-        limit = 0
-        offset = 0
         filters = []
         if data:
             for k, v in data.items():
@@ -409,84 +531,26 @@ class User(models.Model):
             except ValueError as ex:
                 print(ex)
         if requester not in ['Administrator', 'Professor']:
-            return []
+            return User.objects.none()
         if requester == 'Professor':
-            users = users.filter(role__name__in=['Professor', 'Student', 'Parent'])
-        if 'offset' in filters:
-            try:
-                offset = int(data['offset'])
-            except ValueError as ex:
-                print(ex)
-        if 'limit' in filters:
-            try:
-                limit = int(data['limit'])
-            except ValueError as ex:
-                print(ex)
+            users = users.filter(role_id__in=reference_data.get_role_ids(['Professor', 'Student', 'Parent']))
         if 'search' in filters:
-            search = data['search']
-            users = users.filter(
-                Q(phone__icontains=search) |
-                Q(address__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search)
-            )
-        users = users.order_by('id')
-        if offset and limit:
-            users = users[offset*limit:(offset*limit)+limit]
-        elif not offset and limit and limit > offset:
-            users = users[:offset+limit]
-        return users.all()
+            users = search_users(users=users, search=data['search'])
+            return users.order_by('-search_rank', 'id').all()
+        return users.order_by('id').all()
 
     @staticmethod
-    def count_all_users(data, requester):
-        filters = []
-        search = ''
-        if data:
-            for k, v in data.items():
-                filters.append(k)
-        users = User.objects.filter()
-        if 'is_active' in filters:
-            try:
-                int(data['is_active'])
-                if int(data['is_active']) in [0, 1]:
-                    users = users.filter(is_active=data['is_active'])
-            except ValueError as ex:
-                print(ex)
-        if 'roleId' in filters:
-            try:
-                int(data['roleId'])
-                if int(data['roleId']) > 0:
-                    users = users.filter(role=data['roleId'])
-            except ValueError as ex:
-                print(ex)
-        if 'genderId' in filters:
-            try:
-                int(data['genderId'])
-                if int(data['genderId']) > 0:
-                    users = users.filter(gender=data['genderId'])
-            except ValueError as ex:
-                print(ex)
-        if 'birthDate' in filters and data['birthDate'] != '':
-            try:
-                datetime.strptime(data['birthDate'], "%Y-%m-%d").strftime("%Y-%m-%d")
-                users = users.filter(birth_date=data['birthDate'])
-            except ValueError as ex:
-                print(ex)
-        if requester not in ['Administrator', 'Professor']:
-            return []
-        if requester == 'Professor':
-            users = users.filter(role__name__in=['Professor', 'Student', 'Parent'])
-        if 'search' in filters:
-            search = data['search']
-            users = users.filter(
-                Q(phone__icontains=search) |
-                Q(address__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search)
-            )
-        return users.count()
+    def get_users_number_cache_key(users):
+        """
+        This method will get the cache key of the users number, the key is the signature of the compiled filters and
+        the version of the users (the resource version users, read with one query), so every saved or deleted user
+        invalidates all the cached numbers in every process
+        :param users: queryset from get_all_users
+        :return: cache key
+        """
+        version = ResourceVersion.get_versions(keys=['users'])[0]
+        signature = sha1(str(users.query).encode('utf-8', 'ignore')).hexdigest()
+        return f'users_number:{version}:{signature}'
 
     def activate_user(self):
         """
@@ -516,11 +580,21 @@ class User(models.Model):
         self.expired_activation_code = django.utils.timezone.now() + timedelta(hours=2)
         try:
             self.save()
+            security_token_cache.evict_user(self.id)
             return True
         except Exception as ex:
             print(ex)
             return False
 
+    def delete_user(self):
+        """
+        This method will delete user
+        :return:
+        """
+        user_id = self.id
+        self.delete()
+        security_token_cache.evict_user(user_id)
+
     @staticmethod
     def get_user_by_email(email):
         user = User.objects.filter(email=email).first()
@@ -555,32 +629,37 @@ class User(models.Model):
     def create_activation_code(size):
         return ''.join([random.choice(string.ascii_letters + string.digits) for n in range(size)])
 
+    def activation_code_email(self):
+        """
+        This method will build the activation code mail of the user
+        :return: dict of subject, message, from_email, to_email
+        """
+        return {
+            'subject': f'Activation code',
+            'message': f'Activation code: {self.activation_code}. This code will expire in 1 hour!',
+            'from_email': f'mihael.peric@hotmail.com',
+            'to_email': f'{self.email}'
+        }
+
     def send_activation_code_on_email(self):
         """
-        This method will (try) send activation code on user email, activation code will expire in 1 hour.
+        This method will queue activation code mail into the email outbox, activation code will expire in 1 hour.
+        The mail is sent by the send_outbox_emails command, so the request doesn't wait for the mail server.
         If user didn't activate an account, user need ask another activation code.
-        :return: True if mail has sent False if mail has not sent
+        :return: True if mail has queued False if mail has not queued
         """
-        subject = f'Activation code'
-        activation_code = self.activation_code
-        message = f'Activation code: {activation_code}. This code will expire in 1 hour!'
-        from_email = f'mihael.peric@hotmail.com'
-        to_email = f'{self.email}'
+        if not self.email:
+            return False
         try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=from_email,
-                recipient_list=[to_email],
-                fail_silently=False
-            )
+            EmailOutbox.queue_email(**self.activation_code_email())
             return True
         except Exception as ex:
             print(ex)
             return False
 
-    def get_children_by_parent_id(self):
-        children = User.objects.filter(Q(parent_mother=self.id) | Q(parent_father=self.id))
+    @staticmethod
+    def get_children_by_parent_id(parent_id):
+        children = User.objects.filter(Q(parent_mother=parent_id) | Q(parent_father=parent_id))
         return children.all()
 
 
@@ -606,28 +685,111 @@ class SchoolClass(models.Model):
         return f'{self.name} {self.school_year}'
 
     @staticmethod
-    def get_all_school_classes(limit, offset):
-        school_classes = SchoolClass.objects.filter().order_by('-id').all()
-        if offset and limit and limit > offset:
-            school_classes = school_classes[offset * limit:(offset * limit) + limit]
-        elif not offset and limit and limit > offset:
-            school_classes = school_classes[:offset + limit]
-        return school_classes
+    def get_all_school_classes():
+        return SchoolClass.objects.filter().order_by('-id').all()
 
     @staticmethod
     def count_school_classes():
         return SchoolClass.objects.filter().count()
 
     @staticmethod
-    def get_members_by_school_class_id(school_class_id, limit, offset):
-        professors = SchoolClassProfessor.objects.prefetch_related('professor').filter(
-            school_class_id=school_class_id
-        ).all()
-        students = SchoolClassStudent.objects.prefetch_related('student').filter(
-            school_class_id=school_class_id
-        ).all()
+    def get_members_by_school_class_id(school_class_id):
+        professors = SchoolClassProfessor.objects.filter(school_class_id=school_class_id).all()
+        students = SchoolClassStudent.objects.filter(school_class_id=school_class_id).all()
         return professors, students
 
+    @staticmethod
+    def update_members(school_class_id, action, professor_ids=None, student_ids=None, is_active=False):
+        """
+        This method will enroll, activate, deactivate or remove many professors and students of the school class in one
+        transaction. All the users and their memberships are validated with one query and the members are written with
+        one bulk insert, update or delete per table, the users which can't be changed are returned as errors.
+        :param school_class_id:
+        :param action: enroll, activate, deactivate or remove
+        :param professor_ids: user ids of the professors
+        :param student_ids: user ids of the students
+        :param is_active: state of the enrolled members
+        :return: number of changed members, list of errors
+        """
+        if action not in MEMBER_ACTIONS:
+            raise ValueError(f'Unknown action {action}!')
+        if not school_class_id:
+            raise ValueError(f"School class doesn't exist!")
+        errors = []
+        requested = []
+        for role_name, user_ids in [('Professor', professor_ids or []), ('Student', student_ids or [])]:
+            for user_id in user_ids:
+                try:
+                    requested.append((role_name, int(user_id)))
+                except (TypeError, ValueError) as ex:
+                    print(ex)
+                    errors.append({'role_name': role_name, 'user_id': user_id, 'message': f'Wrong data!'})
+        state = load_related_state(
+            user_ids=[user_id for role_name, user_id in requested],
+            school_class_id=school_class_id,
+            memberships=True
+        )
+        if state['users']:
+            check_related_school_class_and_subject(state=state, school_class_id=school_class_id)
+        elif not SchoolClass.objects.filter(id=school_class_id).exists():
+            raise ValueError(f"School class doesn't exist!")
+        changed = {'Professor': [], 'Student': []}
+        changed_ids = set()
+        for role_name, user_id in requested:
+            try:
+                user = get_related_user(state=state, user_id=user_id, name=role_name)
+                if user['role__name'] != role_name:
+                    raise ValueError(f"{role_name} hasn't {role_name} role, role is {user['role__name']}!")
+                if (role_name, user_id) in changed_ids:
+                    raise ValueError(f'{role_name} is repeated!')
+                is_member = user['is_school_class_professor' if role_name == 'Professor' else 'is_school_class_student']
+                if action == 'enroll' and is_member:
+                    raise ValueError(f'{role_name} is already a member of this school class!')
+                if action != 'enroll' and not is_member:
+                    raise ValueError(f"{role_name} isn't a member of this school class!")
+            except ValueError as ex:
+                errors.append({'role_name': role_name, 'user_id': user_id, 'message': str(ex)})
+                continue
+            changed[role_name].append(user)
+            changed_ids.add((role_name, user_id))
+        created = django.utils.timezone.now()
+        with transaction.atomic():
+            for role_name, model, field in [
+                ('Professor', SchoolClassProfessor, 'professor'),
+                ('Student', SchoolClassStudent, 'student')
+            ]:
+                user_ids = [user['id'] for user in changed[role_name]]
+                if not user_ids:
+                    continue
+                if action == 'enroll':
+                    model.objects.bulk_create([
+                        model(created=created, is_active=is_active, school_class_id=school_class_id, **{
+                            f'{field}_id': user_id
+                        }) for user_id in user_ids
+                    ])
+                    continue
+                members = model.objects.filter(school_class_id=school_class_id, **{f'{field}_id__in': user_ids})
+                if action == 'remove':
+                    # The members have no delete signals, so this is one DELETE
+                    members.delete()
+                else:
+                    members.update(is_active=action == 'activate')
+            if changed['Professor'] or changed['Student']:
+                # The members are written without save(), so the signals don't bump the versions
+                from .signals import members_changed
+                members_changed(
+                    school_class_ids=[school_class_id],
+                    professor_ids=[user['id'] for user in changed['Professor']],
+                    student_ids=[user['id'] for user in changed['Student']],
+                    parent_ids=[
+                        parent_id for user in changed['Student'] for parent_id in [
+                            user['parent_mother_id'],
+                            user['parent_father_id']
+                        ]
+                    ]
+                )
+        return len(changed['Professor']) + len(changed['Student']), errors
+
     @staticmethod
     def count_members_by_school_class_id(school_class_id):
         professors_number = SchoolClassProfessor.objects.filter(school_class_id=school_class_id).count()
@@ -694,12 +856,21 @@ class SchoolClassProfessor(models.Model):
         return f'{self.professor.first_name} {self.professor.last_name}'
 
     def save(self, *args, **kwargs):
-        if not self.professor or not self.school_class:
+        if not self.professor_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, school_subject, school_class')
-        if self.professor.role.name != 'Professor':
-            raise ValueError(f"Professor hasn't Professor role, role is {self.professor.role.name}!")
+        state = load_related_state(user_ids=[self.professor_id], school_class_id=self.school_class_id)
+        professor = get_related_user(state=state, user_id=self.professor_id, name='Professor')
+        check_related_school_class_and_subject(state=state, school_class_id=self.school_class_id)
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        from .signals import members_changed
+        result = super().delete(*args, **kwargs)
+        members_changed(school_class_ids=[self.school_class_id], professor_ids=[self.professor_id])
+        return result
+
     @staticmethod
     def find_member_by_member_id(member_id):
         return SchoolClassProfessor.objects.filter(id=member_id).first()
@@ -756,12 +927,21 @@ class SchoolClassStudent(models.Model):
         return f'{self.student.first_name} {self.student.last_name}'
 
     def save(self, *args, **kwargs):
-        if not self.student or not self.school_class:
+        if not self.student_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, school_subject, school_class')
-        if self.student.role.name != 'Student':
-            raise ValueError(f"Student hasn't Student role, role is {self.student.role.name}!")
+        state = load_related_state(user_ids=[self.student_id], school_class_id=self.school_class_id)
+        student = get_related_user(state=state, user_id=self.student_id, name='Student')
+        check_related_school_class_and_subject(state=state, school_class_id=self.school_class_id)
+        if student['role__name'] != 'Student':
+            raise ValueError(f"Student hasn't Student role, role is {student['role__name']}!")
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        from .signals import members_changed
+        result = super().delete(*args, **kwargs)
+        members_changed(school_class_ids=[self.school_class_id], student_ids=[self.student_id])
+        return result
+
     @staticmethod
     def find_member_by_member_id(member_id):
         return SchoolClassStudent.objects.filter(id=member_id).first()
@@ -814,13 +994,12 @@ class SchoolSubject(models.Model):
         return f"{self.name} {'(Activated)' if self.is_active else '(Deactivated)'}"
 
     @staticmethod
-    def get_all_school_subjects(limit, offset):
-        school_subjects = SchoolSubject.objects.filter().order_by('id').all()
-        if offset and limit and limit > offset:
-            school_subjects = school_subjects[offset*limit:(offset*limit)+limit]
-        elif not offset and limit and limit > offset:
-            school_subjects = school_subjects[:offset+limit]
-        return school_subjects
+    def get_all_school_subjects():
+        """
+        This method will get all the school subjects from the reference data cache
+        :return: list of serialized school subjects ordered by id
+        """
+        return reference_data.get('school_subjects')
 
     @staticmethod
     def count_school_subject():
@@ -890,13 +1069,24 @@ class ClassRoomSchoolSubject(models.Model):
         return f"{self.school_subject.name} {'(Activated)' if self.is_active else '(Deactivated)'}"
 
     def save(self, *args, **kwargs):
-        if not self.professor or not self.school_subject or not self.school_class:
+        if not self.professor_id or not self.school_subject_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, school_subject, school_class')
-        if self.professor.role.name != 'Professor':
-            raise ValueError(f"Professor hasn't Professor role, role is {self.professor.role.name}!")
-        if not self.school_subject.is_active:
+        state = load_related_state(
+            user_ids=[self.professor_id],
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        professor = get_related_user(state=state, user_id=self.professor_id, name='Professor')
+        check_related_school_class_and_subject(
+            state=state,
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if not state['school_subject_is_active']:
             raise ValueError(f'This school subject is deactivated!')
-        if not self.school_class.is_active:
+        if not state['school_class_is_active']:
             raise ValueError(f'This school class is deactivated!')
         super().save(*args, **kwargs)
 
@@ -905,13 +1095,8 @@ class ClassRoomSchoolSubject(models.Model):
         return ClassRoomSchoolSubject.objects.filter(id=school_subject_id).first()
 
     @staticmethod
-    def get_all_school_subjects_by_school_class_id(school_class_id, limit, offset):
-        school_classes = ClassRoomSchoolSubject.objects.filter(school_class_id=school_class_id).all()
-        if offset and limit and limit > offset:
-            school_classes = school_classes[offset * limit:(offset * limit) + limit]
-        elif not offset and limit and limit > offset:
-            school_classes = school_classes[:offset + limit]
-        return school_classes
+    def get_all_school_subjects_by_school_class_id(school_class_id):
+        return ClassRoomSchoolSubject.objects.filter(school_class_id=school_class_id).order_by('id').all()
 
     @staticmethod
     def count_all_school_subjects_by_school_class_id(school_class_id):
@@ -985,27 +1170,55 @@ class Grade(models.Model):
         help_text=f'This field is required!'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'school_class', 'school_subject'], name='grade_student_class_idx'),
+        ]
+
     def __str__(self):
         return f"{self.school_subject.name} {self.grade} {self.student.first_name} {self.student.last_name}"
 
     def save(self, *args, **kwargs):
-        if not self.professor or not self.student or not self.school_subject or not self.school_class:
+        if not self.professor_id or not self.student_id or not self.school_subject_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, student, school_subject, school_class')
-        if self.professor.role.name != 'Professor':
-            raise ValueError(f"Professor hasn't Professor role, role is {self.professor.role.name}!")
-        if self.student.role.name != 'Student':
-            raise ValueError(f"Student hasn't Student role, role is {self.student.role.name}!")
-        if self.grade < 0 or self.grade > 5:
+        state = load_related_state(
+            user_ids=[self.professor_id, self.student_id],
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        professor = get_related_user(state=state, user_id=self.professor_id, name='Professor')
+        student = get_related_user(state=state, user_id=self.student_id, name='Student')
+        check_related_school_class_and_subject(
+            state=state,
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if student['role__name'] != 'Student':
+            raise ValueError(f"Student hasn't Student role, role is {student['role__name']}!")
+        if int(self.grade) < 0 or int(self.grade) > 5:
             raise ValueError(f'The grade is not in range 1-5, grade is {self.grade}!')
-        if not self.school_subject.is_active:
+        if not state['school_subject_is_active']:
             raise ValueError(f'This school subject is deactivated!')
-        if not self.professor.is_active:
+        if not professor['is_active']:
             raise ValueError(f'This professor is deactivated!')
-        if not self.student.is_active:
+        if not student['is_active']:
             raise ValueError(f'This student is deactivated!')
-        if not self.school_class.is_active:
+        if not state['school_class_is_active']:
             raise ValueError(f'The school class is deactivated!')
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous_key = Grade.objects.filter(id=self.id).values_list(
+                'student_id',
+                'school_class_id',
+                'school_subject_id'
+            ).first() if self.id else None
+            super().save(*args, **kwargs)
+            if previous_key:
+                # The minimum and the maximum of a changed grade can't be updated incrementally
+                GradeSummary.refresh_grade_summaries(keys=[previous_key, GradeSummary.get_key(self)])
+            else:
+                GradeSummary.add_grades(grades=[self])
 
     @staticmethod
     def get_all_grades_by_student_id_and_school_class_id_or_school_subject(
@@ -1016,13 +1229,13 @@ class Grade(models.Model):
         grades = Grade.objects.filter(student_id=student_id, school_class_id=school_class_id)
         if school_subject_id > 0:
             grades = grades.filter(school_subject_id=school_subject_id)
-        return grades.all()
+        return grades.order_by('id').all()
 
     @staticmethod
     def add_new_grade(data, professor_id):
         try:
             grade = Grade()
-            grade.created = django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S")
+            grade.created = django.utils.timezone.now()
             grade.grade = data['grade']
             grade.grade_type = data['grade_type']
             grade.comment = data['comment']
@@ -1036,6 +1249,297 @@ class Grade(models.Model):
             print(ex)
             return False
 
+    @staticmethod
+    def add_new_grades(data, professor_id):
+        """
+        This method will add the grades of many students for one school class and school subject.
+        The whole batch is validated with one query for the school class, the school subject and all the students (roles
+        and active flags) and the valid grades are inserted with one bulk insert, the invalid grades are returned as
+        errors.
+        :param data: school_class_id, school_subject_id, grades (student_id, grade, grade_type, comment)
+        :param professor_id:
+        :return: number of added grades, list of errors
+        """
+        student_ids = []
+        for row in data['grades']:
+            try:
+                student_ids.append(int(row['student_id']))
+            except (KeyError, TypeError, ValueError) as ex:
+                print(ex)
+        state = load_related_state(
+            user_ids=student_ids + [professor_id],
+            school_class_id=data['school_class_id'],
+            school_subject_id=data['school_subject_id']
+        )
+        users = state['users']
+        professor = get_related_user(state=state, user_id=professor_id, name='Professor')
+        check_related_school_class_and_subject(
+            state=state,
+            school_class_id=data['school_class_id'],
+            school_subject_id=data['school_subject_id']
+        )
+        if not state['school_subject_is_active']:
+            raise ValueError(f'This school subject is deactivated!')
+        if not state['school_class_is_active']:
+            raise ValueError(f'The school class is deactivated!')
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if not professor['is_active']:
+            raise ValueError(f'This professor is deactivated!')
+        grades = []
+        errors = []
+        created = django.utils.timezone.now()
+        for index, row in enumerate(data['grades']):
+            try:
+                student = users.get(int(row['student_id']))
+                if not student:
+                    raise ValueError(f"Student doesn't exist!")
+                if student['role__name'] != 'Student':
+                    raise ValueError(f"Student hasn't Student role, role is {student['role__name']}!")
+                if int(row['grade']) < 0 or int(row['grade']) > 5:
+                    raise ValueError(f"The grade is not in range 1-5, grade is {row['grade']}!")
+                if not row['grade_type']:
+                    raise ValueError(f'Fields required grade, grade_type!')
+                if not student['is_active']:
+                    raise ValueError(f'This student is deactivated!')
+            except (KeyError, TypeError, ValueError) as ex:
+                errors.append({
+                    'index': index,
+                    'student_id': row.get('student_id') if isinstance(row, dict) else None,
+                    'message': str(ex) if isinstance(ex, ValueError) else f'Wrong data!'
+                })
+                continue
+            grades.append(Grade(
+                created=created,
+                grade=int(row['grade']),
+                grade_type=row['grade_type'],
+                comment=row.get('comment'),
+                professor_id=professor_id,
+                student_id=student['id'],
+                school_class_id=data['school_class_id'],
+                school_subject_id=data['school_subject_id']
+            ))
+        with transaction.atomic():
+            Grade.objects.bulk_create(grades)
+            GradeSummary.add_grades(grades=grades)
+            if grades:
+                ResourceVersion.bump(
+                    keys=[f"school_class:{data['school_class_id']}"] + [f'student:{grade.student_id}' for grade in grades]
+                )
+        return len(grades), errors
+
+
+class GradeSummary(models.Model):
+    """
+    Summary of the grades of one student in one school subject of one school class. The summaries are kept in sync
+    with the grades in the same transaction (Grade.save, the bulk grades and the deleted grades), so the averages are
+    read without reading the grades. They can be rebuilt with the rebuild_grade_summaries command.
+    """
+    grades_number = models.IntegerField(default=0)
+    grades_sum = models.IntegerField(default=0)
+    grades_average = models.FloatField(default=0)
+    min_grade = models.IntegerField(null=True)
+    max_grade = models.IntegerField(null=True)
+    last_grade_date = models.DateTimeField(null=True)
+
+    # Relationships
+    student = models.ForeignKey(
+        User,
+        related_name='User.grade_summary+',
+        on_delete=models.CASCADE
+    )
+    school_subject = models.ForeignKey(
+        SchoolSubject,
+        on_delete=models.CASCADE
+    )
+    school_class = models.ForeignKey(
+        SchoolClass,
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        unique_together = ('student', 'school_class', 'school_subject')
+        indexes = [
+            models.Index(fields=['school_class', 'school_subject'], name='grade_summary_class_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.student_id} {self.school_class_id} {self.school_subject_id} {self.grades_average}'
+
+    @staticmethod
+    def get_key(grade):
+        return grade.student_id, grade.school_class_id, grade.school_subject_id
+
+    @staticmethod
+    def get_keys_filter(keys):
+        """
+        This method will get the filter of exactly the keys (not of every combination of their ids)
+        :param keys: set of (student_id, school_class_id, school_subject_id)
+        :return: Q
+        """
+        keys_filter = Q()
+        for student_id, school_class_id, school_subject_id in keys:
+            keys_filter |= Q(student_id=student_id, school_class_id=school_class_id, school_subject_id=school_subject_id)
+        return keys_filter
+
+    @staticmethod
+    def get_summaries_by_keys(keys):
+        """
+        This method will get and lock the summaries of the keys with one query (the callers are in a transaction), so
+        the concurrent updates of a summary wait for each other instead of overwriting each other
+        :param keys: set of (student_id, school_class_id, school_subject_id)
+        :return: dict key: summary
+        """
+        summaries = GradeSummary.objects.select_for_update().filter(GradeSummary.get_keys_filter(keys=keys))
+        return {GradeSummary.get_key(summary): summary for summary in summaries}
+
+    @staticmethod
+    def create_summaries(summaries):
+        """
+        This method will insert the new summaries with one bulk insert in a savepoint
+        :param summaries: list of GradeSummary
+        :return: keys of the summaries if another transaction has inserted some of them first, otherwise empty list
+        """
+        if not summaries:
+            return []
+        try:
+            with transaction.atomic():
+                GradeSummary.objects.bulk_create(summaries)
+        except IntegrityError as ex:
+            print(ex)
+            return [GradeSummary.get_key(summary) for summary in summaries]
+        return []
+
+    @staticmethod
+    def add_grades(grades):
+        """
+        This method will add the new grades to the summaries, the existing summaries are read and locked with one
+        query and updated with one bulk update and the missing summaries are created with one bulk insert (the grades
+        of the summaries which another transaction has inserted first are added again to the inserted summaries)
+        :param grades: saved Grade instances (created is a datetime)
+        :return:
+        """
+        new_grades = {}
+        for grade in grades:
+            new_grades.setdefault(GradeSummary.get_key(grade), []).append(grade)
+        if not new_grades:
+            return
+        summaries = GradeSummary.get_summaries_by_keys(keys=set(new_grades))
+        created_summaries = []
+        for key, key_grades in new_grades.items():
+            summary = summaries.get(key)
+            if not summary:
+                summary = GradeSummary(student_id=key[0], school_class_id=key[1], school_subject_id=key[2])
+                created_summaries.append(summary)
+            values = [grade.grade for grade in key_grades]
+            summary.grades_number += len(values)
+            summary.grades_sum += sum(values)
+            summary.grades_average = summary.grades_sum / summary.grades_number
+            summary.min_grade = min(values + ([summary.min_grade] if summary.min_grade is not None else []))
+            summary.max_grade = max(values + ([summary.max_grade] if summary.max_grade is not None else []))
+            last_grade_date = max(grade.created for grade in key_grades)
+            if summary.last_grade_date is None or last_grade_date > summary.last_grade_date:
+                summary.last_grade_date = last_grade_date
+        GradeSummary.objects.bulk_update(
+            [summary for summary in summaries.values()],
+            ['grades_number', 'grades_sum', 'grades_average', 'min_grade', 'max_grade', 'last_grade_date']
+        )
+        conflicted_keys = GradeSummary.create_summaries(summaries=created_summaries)
+        if conflicted_keys:
+            GradeSummary.add_grades(grades=[grade for key in conflicted_keys for grade in new_grades[key]])
+
+    @staticmethod
+    def refresh_grade_summaries(keys):
+        """
+        This method will compute the summaries of the keys again from the grades (after a changed or a deleted grade,
+        when the minimum and the maximum can't be updated incrementally), the summaries are locked before the grades
+        are read with one grouped query
+        :param keys: list of (student_id, school_class_id, school_subject_id), None is skipped
+        :return:
+        """
+        keys = set(key for key in keys if key)
+        if not keys:
+            return
+        summaries = GradeSummary.get_summaries_by_keys(keys=keys)
+        grades = Grade.objects.filter(GradeSummary.get_keys_filter(keys=keys)).values('student_id', 'school_class_id', 'school_subject_id').annotate(**GRADE_SUMMARY_AGGREGATES).order_by()
+        grades = {
+            (grade['student_id'], grade['school_class_id'], grade['school_subject_id']): grade for grade in grades
+        }
+        deleted_ids = []
+        created_summaries = []
+        for key in keys:
+            summary = summaries.get(key)
+            if key not in grades:
+                if summary:
+                    deleted_ids.append(summary.id)
+                    del summaries[key]
+                continue
+            if not summary:
+                summary = GradeSummary(student_id=key[0], school_class_id=key[1], school_subject_id=key[2])
+                created_summaries.append(summary)
+            GradeSummary.set_aggregates(summary=summary, aggregates=grades[key])
+        if deleted_ids:
+            GradeSummary.objects.filter(id__in=deleted_ids).delete()
+        GradeSummary.objects.bulk_update(
+            [summary for summary in summaries.values()],
+            ['grades_number', 'grades_sum', 'grades_average', 'min_grade', 'max_grade', 'last_grade_date']
+        )
+        conflicted_keys = GradeSummary.create_summaries(summaries=created_summaries)
+        if conflicted_keys:
+            GradeSummary.refresh_grade_summaries(keys=conflicted_keys)
+
+    @staticmethod
+    def set_aggregates(summary, aggregates):
+        summary.grades_number = aggregates['grades_number']
+        summary.grades_sum = aggregates['grades_sum']
+        summary.grades_average = aggregates['grades_sum'] / aggregates['grades_number']
+        summary.min_grade = aggregates['min_grade']
+        summary.max_grade = aggregates['max_grade']
+        summary.last_grade_date = aggregates['last_grade_date']
+
+    @staticmethod
+    def rebuild_grade_summaries(batch_size=2000):
+        """
+        This method will delete all the summaries and build them again from the grades with one grouped query
+        :param batch_size: number of the summaries per insert
+        :return: number of the summaries
+        """
+        with transaction.atomic():
+            GradeSummary.objects.all().delete()
+            grades = Grade.objects.values('student_id', 'school_class_id', 'school_subject_id').annotate(
+                **GRADE_SUMMARY_AGGREGATES
+            ).order_by()
+            summaries = []
+            summaries_number = 0
+            for aggregates in grades.iterator(chunk_size=batch_size):
+                summary = GradeSummary(
+                    student_id=aggregates['student_id'],
+                    school_class_id=aggregates['school_class_id'],
+                    school_subject_id=aggregates['school_subject_id']
+                )
+                GradeSummary.set_aggregates(summary=summary, aggregates=aggregates)
+                summaries.append(summary)
+                if len(summaries) >= batch_size:
+                    GradeSummary.objects.bulk_create(summaries)
+                    summaries_number += len(summaries)
+                    summaries = []
+            GradeSummary.objects.bulk_create(summaries)
+            summaries_number += len(summaries)
+        return summaries_number
+
+    @staticmethod
+    def get_grade_summaries(school_class_id, student_id=0):
+        """
+        This method will get the grade summaries of the school class
+        :param school_class_id:
+        :param student_id: 0 for all the students
+        :return: summaries queryset
+        """
+        summaries = GradeSummary.objects.filter(school_class_id=school_class_id)
+        if student_id > 0:
+            summaries = summaries.filter(student_id=student_id)
+        return summaries.order_by('student_id', 'school_subject_id')
+
 
 class Event(models.Model):
     created = models.DateTimeField(default=django.utils.timezone.now)
@@ -1080,33 +1584,78 @@ class Event(models.Model):
         f'which school subject is about.'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['school_class', '-id'], name='event_school_class_idx'),
+            models.Index(fields=['professor', '-id'], name='event_professor_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} {self.date}"
 
     def save(self, *args, **kwargs):
-        if not self.professor or not self.school_class:
+        if not self.professor_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, school_class')
-        if self.professor.role.name not in ['Professor', 'Administrator']:
-            raise ValueError(f"Professor hasn't Professor role, role is {self.professor.role.name}!")
-        if not self.professor.is_active:
+        state = load_related_state(user_ids=[self.professor_id], school_class_id=self.school_class_id)
+        professor = get_related_user(state=state, user_id=self.professor_id, name='Professor')
+        check_related_school_class_and_subject(state=state, school_class_id=self.school_class_id)
+        if professor['role__name'] not in ['Professor', 'Administrator']:
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if not professor['is_active']:
             raise ValueError(f'This professor is deactivated!')
-        if not self.school_class.is_active:
+        if not state['school_class_is_active']:
             raise ValueError(f'The school class is deactivated!')
         super().save(*args, **kwargs)
 
     @staticmethod
     def get_all_events_by_parent_id(parent_id):
-        children = User.objects.filter(Q(parent_father=parent_id) | Q(parent_mother=parent_id)).all()
-        if not children:
-            return []
-        children_ids = [child.id for child in children]
-        children_school_classes = SchoolClassStudent.objects.filter(
-            student_id__in=children_ids,
+        """
+        This method will get the events of the school classes of the parent children, the children and their school
+        classes are a subquery, so the feed is read with one query
+        :param parent_id:
+        :return: events queryset
+        """
+        school_class_ids = SchoolClassStudent.objects.filter(
+            Q(student__parent_mother=parent_id) | Q(student__parent_father=parent_id),
             is_active=True
-        ).all()
-        school_class_ids = list(set([school_class.school_class_id for school_class in children_school_classes]))
-        events = Event.objects.filter(school_class_id__in=school_class_ids).order_by('-id').all()
-        return events
+        ).values('school_class_id')
+        return Event.objects.filter(school_class_id__in=school_class_ids).order_by('-id')
+
+    @staticmethod
+    def get_parent_events_cache_key(parent_id, query_string):
+        """
+        This method will get the cache key of the parent events page, the key contains the version of the parent feed
+        (the resource version parent:<id>, read with one query before the events), so a bumped version invalidates all
+        the cached pages of the parent in every process
+        :param parent_id:
+        :param query_string: request.GET
+        :return: cache key
+        """
+        version = ResourceVersion.get_versions(keys=[f'parent:{parent_id}'])[0]
+        page = '|'.join(str(query_string.get(name) or '') for name in ['limit', 'cursor', 'include'])
+        signature = sha1(page.encode('utf-8', 'ignore')).hexdigest()
+        return f'parent_events:{parent_id}:{version}:{signature}'
+
+    @staticmethod
+    def bump_parent_events_version(parent_ids=None, school_class_ids=None):
+        """
+        This method will invalidate the cached event feeds of the parents by bumping the versions of the parent feeds,
+        the parents can be given directly or as the parents of the students of the school classes
+        :param parent_ids:
+        :param school_class_ids:
+        :return: ids of the parents
+        """
+        parent_ids = set(parent_ids or [])
+        if school_class_ids:
+            parents = SchoolClassStudent.objects.filter(school_class_id__in=school_class_ids).values_list(
+                'student__parent_mother_id',
+                'student__parent_father_id'
+            )
+            for parent_mother_id, parent_father_id in parents:
+                parent_ids.update([parent_mother_id, parent_father_id])
+        parent_ids.discard(None)
+        ResourceVersion.bump(keys=[f'parent:{parent_id}' for parent_id in parent_ids])
+        return parent_ids
 
     @staticmethod
     def get_all_events_by_professor_id(professor_id):
@@ -1185,24 +1734,49 @@ class Absence(models.Model):
         help_text=f'This field is required!'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['student', 'school_class', 'school_subject', 'is_justified'],
+                name='absence_student_class_idx'
+            ),
+            models.Index(
+                fields=['school_class', 'school_subject'],
+                name='absence_unjustified_idx',
+                condition=Q(is_justified=False)
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} {self.student.first_name} {self.student.last_name} " \
             f"{'(Justified)' if self.is_justified else '(Unjustified)'}"
 
     def save(self, *args, **kwargs):
-        if not self.professor or not self.student or not self.school_subject or not self.school_class:
+        if not self.professor_id or not self.student_id or not self.school_subject_id or not self.school_class_id:
             raise ValueError(f'Fields required professor, student, school_subject, school_class')
-        if self.professor.role.name != 'Professor':
-            raise ValueError(f"Professor hasn't Professor role, role is {self.professor.role.name}!")
-        if self.student.role.name != 'Student':
-            raise ValueError(f"Student hasn't Student role, role is {self.student.role.name}!")
-        if not self.school_subject.is_active:
+        state = load_related_state(
+            user_ids=[self.professor_id, self.student_id],
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        professor = get_related_user(state=state, user_id=self.professor_id, name='Professor')
+        student = get_related_user(state=state, user_id=self.student_id, name='Student')
+        check_related_school_class_and_subject(
+            state=state,
+            school_class_id=self.school_class_id,
+            school_subject_id=self.school_subject_id
+        )
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if student['role__name'] != 'Student':
+            raise ValueError(f"Student hasn't Student role, role is {student['role__name']}!")
+        if not state['school_subject_is_active']:
             raise ValueError(f'This school subject is deactivated!')
-        if not self.professor.is_active:
+        if not professor['is_active']:
             raise ValueError(f'This professor is deactivated!')
-        if not self.student.is_active:
+        if not student['is_active']:
             raise ValueError(f'This student is deactivated!')
-        if not self.school_class.is_active:
+        if not state['school_class_is_active']:
             raise ValueError(f'The school class is deactivated!')
         super().save(*args, **kwargs)
 
@@ -1230,35 +1804,50 @@ class Absence(models.Model):
 
     @staticmethod
     def count_all_absences_by_justified(school_class_id, student_id, school_subject_id):
-        justified_absences = Absence.objects.filter(
-            student_id=student_id,
-            student__is_active=True,
-            is_justified=True
-        )
-        unjustified_absences = Absence.objects.filter(
+        """
+        This method will count the justified and the unjustified absences of the student with one aggregate query
+        :param school_class_id: 0 for all the school classes
+        :param student_id:
+        :param school_subject_id: 0 for all the school subjects
+        :return: number of justified absences, number of unjustified absences
+        """
+        absences = Absence.objects.filter(
             student_id=student_id,
-            student__is_active=True,
-            is_justified=False
+            student__is_active=True
         )
         if school_subject_id > 0:
-            justified_absences = justified_absences.filter(
-                school_subject_id=school_subject_id,
-                school_subject__is_active=True
-            )
-            unjustified_absences = unjustified_absences.filter(
+            absences = absences.filter(
                 school_subject_id=school_subject_id,
                 school_subject__is_active=True
             )
         if school_class_id > 0:
-            justified_absences = justified_absences.filter(
-                school_class_id=school_class_id,
-                school_class__is_active=True
-            )
-            unjustified_absences = unjustified_absences.filter(
+            absences = absences.filter(
                 school_class_id=school_class_id,
                 school_class__is_active=True
             )
-        return justified_absences.count(), unjustified_absences.count()
+        absences_number = absences.aggregate(
+            justified_absences=Count('id', filter=Q(is_justified=True)),
+            unjustified_absences=Count('id', filter=Q(is_justified=False))
+        )
+        return absences_number['justified_absences'], absences_number['unjustified_absences']
+
+    @staticmethod
+    def count_all_absences_by_school_class_id(school_class_id):
+        """
+        This method will count the justified and the unjustified absences of every student and school subject of the
+        school class with one grouped query, the student and school subject pairs without absences are not returned
+        :param school_class_id:
+        :return: list of dicts (student_id, school_subject_id, justified_absences, unjustified_absences)
+        """
+        return list(Absence.objects.filter(
+            school_class_id=school_class_id,
+            school_class__is_active=True,
+            student__is_active=True,
+            school_subject__is_active=True
+        ).values('student_id', 'school_subject_id').annotate(
+            justified_absences=Count('id', filter=Q(is_justified=True)),
+            unjustified_absences=Count('id', filter=Q(is_justified=False))
+        ).order_by('student_id', 'school_subject_id'))
 
     @staticmethod
     def get_absence_by_id(absence_id):
@@ -1292,3 +1881,265 @@ class Absence(models.Model):
         except Exception as ex:
             print(ex)
             return False
+
+    @staticmethod
+    def add_new_absences(data, professor_id):
+        """
+        This method will add the absences of many students for one lesson (school class and school subject), e.g. the
+        morning roll call. The whole batch is validated against the school class roster with one query and the valid
+        absences are inserted with one bulk insert, the invalid absences are returned as errors.
+        :param data: school_class_id, school_subject_id, absences (student_id, title, comment, is_justified)
+        :param professor_id:
+        :return: number of added absences, list of errors
+        """
+        state = load_related_state(
+            user_ids=[professor_id],
+            school_class_id=data['school_class_id'],
+            school_subject_id=data['school_subject_id']
+        )
+        professor = get_related_user(state=state, user_id=professor_id, name='Professor')
+        check_related_school_class_and_subject(
+            state=state,
+            school_class_id=data['school_class_id'],
+            school_subject_id=data['school_subject_id']
+        )
+        if professor['role__name'] != 'Professor':
+            raise ValueError(f"Professor hasn't Professor role, role is {professor['role__name']}!")
+        if not state['school_subject_is_active']:
+            raise ValueError(f'This school subject is deactivated!')
+        if not professor['is_active']:
+            raise ValueError(f'This professor is deactivated!')
+        if not state['school_class_is_active']:
+            raise ValueError(f'The school class is deactivated!')
+        student_ids = []
+        for row in data['absences']:
+            try:
+                student_ids.append(int(row['student_id']))
+            except (KeyError, TypeError, ValueError) as ex:
+                print(ex)
+        roster = {
+            member['student_id']: member for member in SchoolClassStudent.objects.filter(
+                school_class_id=data['school_class_id'],
+                student_id__in=set(student_ids)
+            ).values('student_id', 'is_active', 'student__is_active', 'student__role_id')
+        }
+        for member in roster.values():
+            member['student__role__name'] = reference_data.get_role_name(member['student__role_id'])
+        absences = []
+        errors = []
+        created = django.utils.timezone.now()
+        for index, row in enumerate(data['absences']):
+            try:
+                member = roster.get(int(row['student_id']))
+                if not member:
+                    raise ValueError(f"Student isn't a member of this school class!")
+                if member['student__role__name'] != 'Student':
+                    raise ValueError(f"Student hasn't Student role, role is {member['student__role__name']}!")
+                if not member['student__is_active'] or not member['is_active']:
+                    raise ValueError(f'This student is deactivated!')
+                if not row['comment']:
+                    raise ValueError(f'Fields required comment!')
+                if not isinstance(row.get('is_justified', False), bool):
+                    raise ValueError(f'Field is_justified should be true or false!')
+            except (KeyError, TypeError, ValueError) as ex:
+                errors.append({
+                    'index': index,
+                    'student_id': row.get('student_id') if isinstance(row, dict) else None,
+                    'message': str(ex) if isinstance(ex, ValueError) else f'Wrong data!'
+                })
+                continue
+            absences.append(Absence(
+                created=created,
+                title=row.get('title'),
+                comment=row['comment'],
+                is_justified=row.get('is_justified', False),
+                professor_id=professor_id,
+                student_id=member['student_id'],
+                school_class_id=data['school_class_id'],
+                school_subject_id=data['school_subject_id']
+            ))
+        with transaction.atomic():
+            Absence.objects.bulk_create(absences)
+            if absences:
+                ResourceVersion.bump(
+                    keys=[f"school_class:{data['school_class_id']}"] +
+                    [f'student:{absence.student_id}' for absence in absences]
+                )
+        return len(absences), errors
+
+    @staticmethod
+    def justify_absences(absence_ids, is_justified):
+        """
+        This method will justify (or unjustify) many absences with one update
+        :param absence_ids:
+        :param is_justified:
+        :return: number of changed absences
+        """
+        with transaction.atomic():
+            absences = Absence.objects.filter(id__in=absence_ids)
+            keys = set()
+            for school_class_id, student_id in absences.values_list('school_class_id', 'student_id').distinct():
+                keys.update([f'school_class:{school_class_id}', f'student:{student_id}'])
+            ResourceVersion.bump(keys=keys)
+            return absences.update(is_justified=is_justified)
+
+
+class ResourceVersion(models.Model):
+    """
+    Version of a resource which the read endpoints are built from (e.g. student:1, school_class:2, users,
+    reference:roles). The version is bumped in the same transaction as the write, so the ETag of a response changes
+    together with the data and an unchanged resource can be answered with 304 Not Modified.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text=f'This field is required!'
+    )
+    version = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f'{self.key} {self.version}'
+
+    @staticmethod
+    def bump(keys):
+        """
+        This method will bump the versions of the resources, the missing versions are inserted with version 0 and
+        bumped by the same update as the existing ones, so a version which is inserted at the same time by another
+        transaction is still bumped
+        :param keys: list of resource keys
+        :return:
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        with transaction.atomic(savepoint=False):
+            existing = set(ResourceVersion.objects.filter(key__in=keys).values_list('key', flat=True))
+            if existing != keys:
+                ResourceVersion.objects.bulk_create(
+                    [ResourceVersion(key=key, version=0) for key in keys - existing],
+                    ignore_conflicts=True
+                )
+            ResourceVersion.objects.filter(key__in=keys).update(version=F('version') + 1)
+
+    @staticmethod
+    def get_versions(keys):
+        """
+        This method will get the versions of the resources with one query
+        :param keys: list of resource keys
+        :return: list of versions in the order of the keys, 0 for the resources without a version
+        """
+        versions = dict(ResourceVersion.objects.filter(key__in=set(keys)).values_list('key', 'version'))
+        return [versions.get(key, 0) for key in keys]
+
+
+class EmailOutbox(models.Model):
+    created = models.DateTimeField(default=django.utils.timezone.now)
+    subject = models.CharField(
+        max_length=128,
+        help_text=f'This field is required!'
+    )
+    message = models.TextField(
+        help_text=f'This field is required!'
+    )
+    from_email = models.CharField(
+        max_length=128,
+        help_text=f'This field is required!'
+    )
+    to_email = models.CharField(
+        max_length=254,
+        help_text=f'This field is required!'
+    )
+    attempts = models.IntegerField(
+        default=0,
+        help_text=f'This field will fill automatically after every failed sending! Non-required!'
+    )
+    next_attempt = models.DateTimeField(
+        default=django.utils.timezone.now,
+        help_text=f'The mail will not be sent before this time! This field will fill automatically after every failed '
+        f'sending! Non-required!'
+    )
+    sent = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=f'This field will fill automatically when the mail is sent! Non-required!'
+    )
+    is_failed = models.BooleanField(
+        default=False,
+        help_text=f'If sending fails too many times the mail will not be sent anymore!'
+    )
+    last_error = models.TextField(
+        null=True,
+        blank=True,
+        help_text=f'This field will fill automatically after every failed sending! Non-required!'
+    )
+
+    def __str__(self):
+        return f"{self.subject} {self.to_email} {'(Sent)' if self.sent else '(Failed)' if self.is_failed else '(Queued)'}"
+
+    @staticmethod
+    def new_email(subject, message, from_email, to_email):
+        email = EmailOutbox()
+        email.subject = subject
+        email.message = message
+        email.from_email = from_email
+        email.to_email = to_email
+        return email
+
+    @staticmethod
+    def queue_email(subject, message, from_email, to_email):
+        email = EmailOutbox.new_email(subject=subject, message=message, from_email=from_email, to_email=to_email)
+        email.save()
+        return email
+
+    @staticmethod
+    def get_pending_emails(limit):
+        """
+        This method will get (and lock) the oldest mails which should be sent now
+        :param limit:
+        :return: list of mails
+        """
+        emails = EmailOutbox.objects.filter(
+            sent__isnull=True,
+            is_failed=False,
+            next_attempt__lte=django.utils.timezone.now()
+        ).select_for_update(skip_locked=True).order_by('next_attempt', 'id')
+        return list(emails[:limit])
+
+    @staticmethod
+    def claim_pending_emails(limit, lease):
+        """
+        This method will claim the oldest mails which should be sent now in a short transaction, the next attempt of
+        the claimed mails is moved lease seconds ahead, so the other workers skip them while they are sent without a
+        lock and they are sent again if the worker stops before it marks them
+        :param limit:
+        :param lease: seconds
+        :return: list of mails
+        """
+        with transaction.atomic():
+            emails = EmailOutbox.get_pending_emails(limit=limit)
+            if emails:
+                EmailOutbox.objects.filter(id__in=[email.id for email in emails]).update(
+                    next_attempt=django.utils.timezone.now() + timedelta(seconds=lease)
+                )
+        return emails
+
+    @staticmethod
+    def mark_as_sent(email_ids):
+        return EmailOutbox.objects.filter(id__in=email_ids).update(sent=django.utils.timezone.now())
+
+    def schedule_retry(self, error, max_attempts, retry_delay):
+        """
+        This method will schedule the next sending with exponential backoff (retry_delay, 2 * retry_delay,
+        4 * retry_delay...) or give up when the mail failed max_attempts times
+        :param error:
+        :param max_attempts:
+        :param retry_delay: seconds
+        :return:
+        """
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= max_attempts:
+            self.is_failed = True
+        else:
+            self.next_attempt = django.utils.timezone.now() + timedelta(seconds=retry_delay * 2 ** (self.attempts - 1))
+        self.save()
@@ -0,0 +1,215 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import (
+    Q,
+    Count,
+    Window
+)
+
+PAGE_SIZE = getattr(settings, 'PAGE_SIZE', 50)
+MAX_PAGE_SIZE = getattr(settings, 'MAX_PAGE_SIZE', 200)
+COUNT_CACHE_TTL = getattr(settings, 'PAGE_COUNT_CACHE_TTL', 300)
+
+
+class Page(namedtuple('Page', ['results', 'next', 'prev', 'total'])):
+    """
+    One page of the list, next and prev are the opaque cursors of the next and the previous page (None if there is no
+    such page) and total is the number of the rows in the whole list.
+    """
+    __slots__ = ()
+
+
+class CursorPaginator:
+    """
+    Keyset (cursor) pagination. The rows are ordered by the order key and the id, and the cursor is the (order key, id)
+    of the last (or the first) row of the page, so every page is read with an index range scan instead of OFFSET.
+    More querysets can be chained (e.g. the professors and then the students of a school class), then the cursor also
+    carries the index of the queryset.
+    The total of the first page is read with a window count in the same query as the rows, the next pages can take it
+    from the cache (count_cache_key) instead of counting the whole list again.
+    """
+
+    def __init__(self, queryset, ordering=('id',), page_size=PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+        self.querysets = list(queryset) if isinstance(queryset, (list, tuple)) else [queryset]
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        if 'id' not in [field for field, descending in self.ordering]:
+            self.ordering.append(('id', self.ordering[0][1]))
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def paginate(self, query_string, total=None, count_cache_key=None):
+        """
+        This method will get the page by the limit and the cursor from the query string
+        :param query_string: request.GET
+        :param total: number of the rows if it's already known, otherwise the rows are counted
+        :param count_cache_key: cache key of the total, it needs to change when the list changes (e.g. a version)
+        :return: Page
+        """
+        limit = self.get_limit(query_string.get('limit'))
+        cursor = query_string.get('cursor')
+        if cursor:
+            direction, key = self.decode_cursor(cursor)
+        else:
+            direction, key = 'next', None
+        backwards = direction == 'prev'
+        if total is None and count_cache_key:
+            total = cache.get(count_cache_key)
+        count_cache_key = count_cache_key if total is None else None
+        window_count = total is None and not key and len(self.querysets) == 1 and \
+            connection.features.supports_over_clause
+        rows = []
+        for section, values in self.sections(key=key, backwards=backwards):
+            queryset = self.querysets[section]
+            if window_count:
+                queryset = queryset.annotate(cursor_total=Window(expression=Count('id')))
+            if values:
+                queryset = queryset.filter(self.keyset_filter(values=values, backwards=backwards))
+            ordering = [f"{'-' if descending != backwards else ''}{field}" for field, descending in self.ordering]
+            rows += [(section, row) for row in queryset.order_by(*ordering)[:limit + 1 - len(rows)]]
+            if len(rows) > limit:
+                break
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        if backwards:
+            next_cursor = self.encode_cursor('next', *rows[-1]) if rows else None
+            prev_cursor = self.encode_cursor('prev', *rows[0]) if has_more else None
+        else:
+            next_cursor = self.encode_cursor('next', *rows[-1]) if has_more else None
+            prev_cursor = self.encode_cursor('prev', *rows[0]) if key and rows else None
+        if window_count:
+            total = rows[0][1].cursor_total if rows else 0
+        if total is None:
+            total = sum(queryset.count() for queryset in self.querysets)
+        if count_cache_key:
+            cache.set(count_cache_key, total, COUNT_CACHE_TTL)
+        return Page(results=[row for section, row in rows], next=next_cursor, prev=prev_cursor, total=total)
+
+    def get_limit(self, limit):
+        if limit in [None, '']:
+            return self.page_size
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError('Limit is not valid!')
+        if limit < 1:
+            raise ValueError('Limit is not valid!')
+        return min(limit, self.max_page_size)
+
+    def sections(self, key, backwards):
+        """
+        This method will get the querysets which are read for the page, starting with the queryset of the cursor
+        :param key: (section, order key values) of the cursor or None
+        :param backwards:
+        :return: list of (section, order key values), the values are None for the querysets which are read from start
+        """
+        if not key:
+            return [(section, None) for section in range(len(self.querysets))]
+        section, values = key
+        if backwards:
+            return [(section, values)] + [(previous, None) for previous in range(section - 1, -1, -1)]
+        return [(section, values)] + [(following, None) for following in range(section + 1, len(self.querysets))]
+
+    def keyset_filter(self, values, backwards):
+        """
+        This method will build the row comparison (order key, id) > (cursor order key, cursor id) as an OR of ANDs,
+        so it works on every database backend and for mixed ascending and descending order keys
+        :param values:
+        :param backwards:
+        :return: Q
+        """
+        keyset_filter = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            keyset_filter |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return keyset_filter
+
+    @staticmethod
+    def get_value(row, field):
+        return getattr(row, field)
+
+    def encode_cursor(self, direction, section, row):
+        values = [self.get_value(row, field) for field, descending in self.ordering]
+        cursor = json.dumps({'d': direction, 's': section, 'k': values}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            direction, section, values = cursor['d'], cursor['s'], cursor['k']
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as ex:
+            print(ex)
+            raise ValueError('Cursor is not valid!')
+        if direction not in ['next', 'prev'] or section not in range(len(self.querysets)) or \
+                not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError('Cursor is not valid!')
+        return direction, (section, values)
+
+
+class ListCursorPaginator(CursorPaginator):
+    """
+    The same cursors as the CursorPaginator for a list of dicts which is already in memory (e.g. the reference data),
+    the rows are sorted and filtered by the order key in Python instead of the database.
+    """
+
+    def __init__(self, rows, ordering=('id',), page_size=PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+        super().__init__(queryset=[rows], ordering=ordering, page_size=page_size, max_page_size=max_page_size)
+        self.rows = rows
+
+    @staticmethod
+    def get_value(row, field):
+        return row[field]
+
+    def paginate(self, query_string, total=None, count_cache_key=None):
+        """
+        This method will get the page by the limit and the cursor from the query string
+        :param query_string: request.GET
+        :param total: not used, the total is the length of the list
+        :param count_cache_key: not used
+        :return: Page
+        """
+        limit = self.get_limit(query_string.get('limit'))
+        cursor = query_string.get('cursor')
+        if cursor:
+            direction, (section, values) = self.decode_cursor(cursor)
+        else:
+            direction, values = 'next', None
+        backwards = direction == 'prev'
+        rows = self.rows
+        for field, descending in reversed(self.ordering):
+            rows = sorted(rows, key=lambda row: row[field], reverse=descending != backwards)
+        if values:
+            rows = [row for row in rows if self.is_after(row=row, values=values, backwards=backwards)]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+            next_cursor = self.encode_cursor('next', 0, rows[-1]) if rows else None
+            prev_cursor = self.encode_cursor('prev', 0, rows[0]) if has_more else None
+        else:
+            next_cursor = self.encode_cursor('next', 0, rows[-1]) if has_more else None
+            prev_cursor = self.encode_cursor('prev', 0, rows[0]) if values and rows else None
+        return Page(results=rows, next=next_cursor, prev=prev_cursor, total=len(self.rows))
+
+    def is_after(self, row, values, backwards):
+        """
+        This method will compare the order key of the row with the cursor, the same comparison as the keyset_filter
+        :param row:
+        :param values: order key values of the cursor
+        :param backwards:
+        :return: True if the row comes after the cursor in the direction of the page
+        """
+        for (field, descending), value in zip(self.ordering, values):
+            if row[field] == value:
+                continue
+            return (row[field] < value) if descending != backwards else (row[field] > value)
+        return False
@@ -0,0 +1,156 @@
+import heapq
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import connection
+
+SLOWEST_QUERIES = getattr(settings, 'QUERY_METRICS_SLOWEST', 5)
+RECENT_REQUESTS = getattr(settings, 'QUERY_METRICS_RECENT', 100)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper which counts the queries, sums their time and keeps the slowest statements
+    """
+
+    def __init__(self, slowest=SLOWEST_QUERIES):
+        self.slowest_number = slowest
+        self.queries = 0
+        self.time = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.time += duration
+            entry = (duration, self.queries, sql)
+            if len(self.slowest) < self.slowest_number:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest_number:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slowest_queries(self):
+        return [
+            {'sql': sql, 'time_ms': round(duration * 1000, 3)}
+            for duration, number, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+class QueryMetrics:
+    """
+    In-process metrics of the database queries per URL pattern (number of requests, queries, database time, the most
+    queries of one request, the slowest statements and the exceeded query budgets) and of the recent requests.
+    """
+
+    def __init__(self, slowest=SLOWEST_QUERIES, recent=RECENT_REQUESTS):
+        self.slowest_number = slowest
+        self.routes = {}
+        self.recent = deque(maxlen=recent)
+        self.lock = threading.Lock()
+
+    def record(self, route, method, path, status, recorder):
+        """
+        This method will add the queries of one request to the metrics
+        :param route: URL pattern e.g. school_book/users/user/<int:user_id>
+        :param method:
+        :param path:
+        :param status: response status code
+        :param recorder: QueryRecorder of the request
+        :return:
+        """
+        slowest = recorder.slowest_queries()
+        with self.lock:
+            metrics = self.get_route_metrics(route)
+            metrics['requests'] += 1
+            metrics['queries'] += recorder.queries
+            metrics['max_queries'] = max(metrics['max_queries'], recorder.queries)
+            metrics['db_time_ms'] += recorder.time * 1000
+            metrics['slowest'] = sorted(
+                metrics['slowest'] + slowest,
+                key=lambda query: query['time_ms'],
+                reverse=True
+            )[:self.slowest_number]
+            self.recent.append({
+                'route': route,
+                'method': method,
+                'path': path,
+                'status': status,
+                'queries': recorder.queries,
+                'db_time_ms': round(recorder.time * 1000, 3),
+                'slowest': slowest,
+            })
+
+    def record_budget_exceeded(self, route):
+        with self.lock:
+            self.get_route_metrics(route)['budget_exceeded'] += 1
+
+    def get_route_metrics(self, route):
+        return self.routes.setdefault(route, {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_time_ms': 0.0,
+            'budget_exceeded': 0,
+            'slowest': [],
+        })
+
+    def snapshot(self):
+        """
+        This method will get the metrics
+        :return: dict of the routes (with the average queries and database time per request) and the recent requests
+        """
+        with self.lock:
+            routes = {}
+            for route, metrics in self.routes.items():
+                routes[route] = dict(
+                    metrics,
+                    db_time_ms=round(metrics['db_time_ms'], 3),
+                    avg_queries=round(metrics['queries'] / max(metrics['requests'], 1), 2),
+                    avg_db_time_ms=round(metrics['db_time_ms'] / max(metrics['requests'], 1), 3),
+                    slowest=list(metrics['slowest'])
+                )
+            return {'routes': routes, 'recent': list(self.recent)}
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+            self.recent.clear()
+
+
+def query_budget(max_queries):
+    """
+    Query budget decorator of a view (the innermost decorator, so only the queries of the view are counted). When the
+    view runs more queries the budget is reported in the metrics, and with the QUERY_BUDGET_STRICT setting (the test
+    runner turns it on) QueryBudgetExceeded is raised, so the test fails.
+    :param max_queries:
+    :return:
+    """
+    def decorator(func):
+        def wrapper(request, *args, **kwargs):
+            recorder = QueryRecorder(slowest=0)
+            with connection.execute_wrapper(recorder):
+                response = func(request, *args, **kwargs)
+            if recorder.queries > max_queries:
+                resolver_match = getattr(request, 'resolver_match', None)
+                route = resolver_match.route if resolver_match else request.path
+                query_metrics.record_budget_exceeded(route)
+                message = f'{func.__name__} ran {recorder.queries} queries, the budget is {max_queries}!'
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                print(message)
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+query_metrics = QueryMetrics()
@@ -0,0 +1,146 @@
+import threading
+import time
+from django.conf import settings
+
+# Seconds a process serves the reference data before it checks the version in the database again
+REFERENCE_DATA_TTL = getattr(settings, 'REFERENCE_DATA_TTL', 5)
+REFERENCE_DATA_KINDS = ['roles', 'genders', 'school_subjects']
+
+
+class ReferenceDataCache:
+    """
+    In-process cache of the reference data (roles, genders and school subjects) as serialized rows, and the role
+    name and id mappings which the filters use instead of joining the roles.
+    Every kind of the reference data has a version in the database (the resource version reference:<kind>, bumped by
+    the signals on save and delete), a process keeps the rows with the version they were loaded with and checks the
+    version again with one query once they are older than REFERENCE_DATA_TTL, so a change saved by one process is seen
+    by the other processes within the TTL. The conditional GET passes the versions it reads to check_version, so the
+    rows of a response are never older than its ETag.
+    """
+
+    def __init__(self, ttl=REFERENCE_DATA_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        # Unknown role ids with the version of the roles they were missing in
+        self.missing_role_ids = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def resource_key(kind):
+        return f'reference:{kind}'
+
+    @staticmethod
+    def get_version(kind):
+        from .models import ResourceVersion
+        return ResourceVersion.get_versions(keys=[ReferenceDataCache.resource_key(kind)])[0]
+
+    def get(self, kind):
+        """
+        This method will get the rows of the reference data kind, the rows are read from the database only when the
+        kind isn't loaded yet or its version has changed
+        :param kind: roles, genders or school_subjects
+        :return: list of dicts (shared, they shouldn't be changed)
+        """
+        entry = self.entries.get(kind)
+        if entry and entry[1] is None:
+            # Only the version is known (from check_version)
+            return self.load(kind=kind, version=entry[0])
+        if entry and time.monotonic() < entry[2]:
+            return entry[1]
+        version = self.get_version(kind)
+        if entry and entry[0] == version:
+            with self.lock:
+                if self.entries.get(kind) is entry:
+                    self.entries[kind] = (version, entry[1], time.monotonic() + self.ttl)
+            return entry[1]
+        return self.load(kind=kind, version=version)
+
+    def check_version(self, kind, version):
+        """
+        This method will check the rows of the reference data kind against the version which was read from the
+        database, older rows are dropped and the version is kept, so the next read loads the rows without reading the
+        version again
+        :param kind:
+        :param version:
+        :return:
+        """
+        with self.lock:
+            entry = self.entries.get(kind)
+            if not entry or entry[0] != version:
+                self.entries[kind] = (version, None, 0)
+            elif entry[1] is not None:
+                self.entries[kind] = (version, entry[1], time.monotonic() + self.ttl)
+
+    def load(self, kind, version=None):
+        from .flat_serializers import FlatSerializer
+        from .models import (
+            Role,
+            Gender,
+            SchoolSubject
+        )
+        from .serializers import (
+            RoleSerializer,
+            GenderSerializer,
+            SchoolSubjectSerializer
+        )
+        model, serializer_class = {
+            'roles': (Role, RoleSerializer),
+            'genders': (Gender, GenderSerializer),
+            'school_subjects': (SchoolSubject, SchoolSubjectSerializer),
+        }[kind]
+        if version is None:
+            # The version is read before the rows, so a change saved during the load bumps it again
+            version = self.get_version(kind)
+        rows = FlatSerializer.for_serializer(serializer_class).serialize(model.objects.order_by('id'))
+        with self.lock:
+            self.entries[kind] = (version, rows, time.monotonic() + self.ttl)
+        return rows
+
+    def load_all(self):
+        for kind in REFERENCE_DATA_KINDS:
+            self.get(kind)
+
+    def invalidate(self, kind):
+        """
+        This method will drop the rows of the reference data kind in this process, the other processes load it again
+        when they check the bumped version
+        :param kind:
+        :return:
+        """
+        with self.lock:
+            self.entries.pop(kind, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.missing_role_ids.clear()
+
+    def get_role_ids(self, role_names):
+        """
+        This method will get the ids of the roles by their names
+        :param role_names: e.g. ['Professor', 'Student']
+        :return: list of role ids (the unknown names are skipped)
+        """
+        return [role['id'] for role in self.get('roles') if role['name'] in role_names]
+
+    def get_role_name(self, role_id):
+        """
+        This method will get the name of the role by its id, the roles are loaded again if the id is unknown, an id which
+        is still unknown isn't loaded again until the version of the roles changes
+        :param role_id:
+        :return: role name or None
+        """
+        role_names = {role['id']: role['name'] for role in self.get('roles')}
+        if role_id in role_names:
+            return role_names[role_id]
+        entry = self.entries.get('roles')
+        if entry and role_id in self.missing_role_ids and self.missing_role_ids[role_id] == entry[0]:
+            return None
+        role_names = {role['id']: role['name'] for role in self.load('roles')}
+        if role_id not in role_names:
+            with self.lock:
+                self.missing_role_ids[role_id] = self.entries['roles'][0]
+        return role_names.get(role_id)
+
+
+reference_data = ReferenceDataCache()
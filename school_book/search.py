@@ -0,0 +1,119 @@
+import re
+import unicodedata
+from django.db import connection
+from django.db.models import (
+    Func,
+    Value,
+    FloatField
+)
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ['first_name', 'last_name', 'email', 'phone', 'address']
+SEARCH_TABLE = 'school_book_user_search'
+
+
+class Similarity(Func):
+    """
+    pg_trgm similarity of the search text and the searched text (0-1)
+    """
+    function = 'SIMILARITY'
+    output_field = FloatField()
+
+
+def normalize(text):
+    """
+    This method will normalize the text for the search, the accents are removed, the text is lower case and every
+    symbol which is not a letter or a digit splits the tokens (e.g. the email parts)
+    :param text:
+    :return: tokens separated with one space
+    """
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def build_search_text(user):
+    """
+    This method will build the search text of the user which is saved in the search_text column
+    :param user:
+    :return: normalized tokens of the searchable fields
+    """
+    return normalize(' '.join(str(getattr(user, field) or '') for field in SEARCH_FIELDS))
+
+
+def search_users(users, search):
+    """
+    This method will filter the users by the search and annotate the rank (search_rank, higher is better).
+    Every search token needs to match, a token matches a prefix of a word (SQLite FTS5) or any part of the search text
+    (PostgreSQL pg_trgm GIN index). The search is added to the same query as the other filters, so the role scope is
+    applied inside the indexed query.
+    :param users: users queryset
+    :param search: text from the query string
+    :return: users queryset
+    """
+    tokens = normalize(search).split()
+    if not tokens:
+        return users.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        table = users.model._meta.db_table
+        return users.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({SEARCH_TABLE}) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND {SEARCH_TABLE}.rowid = {table}.id',
+            [match],
+            output_field=FloatField()
+        ))
+    for token in tokens:
+        users = users.filter(search_text__contains=token)
+    if connection.vendor == 'postgresql':
+        return users.annotate(search_rank=Similarity('search_text', Value(' '.join(tokens))))
+    return users.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def create_search_index(schema_editor):
+    """
+    This method will create the search index of the users, the pg_trgm GIN index on PostgreSQL or the FTS5 table
+    (kept in sync by the triggers) on SQLite. On SQLite the triggers need to be created again after every migration
+    which rebuilds the user table.
+    :param schema_editor:
+    :return:
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS user_search_text_trgm_idx ON school_book_user '
+            'USING gin (search_text gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        drop_search_index(schema_editor)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(search_text, content='school_book_user', "
+            f"content_rowid='id', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON school_book_user BEGIN '
+            f'INSERT INTO {SEARCH_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON school_book_user BEGIN '
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+            f'END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE ON school_book_user BEGIN '
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+            f'INSERT INTO {SEARCH_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END'
+        )
+        schema_editor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS user_search_text_trgm_idx')
+    elif vendor == 'sqlite':
+        for trigger in ['insert', 'delete', 'update']:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
@@ -0,0 +1,286 @@
+import random
+from datetime import (
+    date,
+    datetime,
+    timedelta
+)
+from django.core.management.color import no_style
+from django.db import (
+    connection,
+    transaction
+)
+from django.db.models import Max
+from django.utils import timezone
+from .helper import (
+    new_salt,
+    new_psw
+)
+from .constants import roles
+from .search import build_search_text
+from .models import (
+    Role,
+    Gender,
+    User,
+    SchoolClass,
+    SchoolClassProfessor,
+    SchoolClassStudent,
+    SchoolSubject,
+    ClassRoomSchoolSubject,
+    Grade,
+    GradeSummary,
+    Event,
+    Absence,
+    ResourceVersion
+)
+
+FIRST_NAMES = ['Ana', 'Ivan', 'Marko', 'Petra', 'Luka', 'Maja', 'Josip', 'Iva', 'Tomislav', 'Lucija', 'Filip', 'Sara']
+LAST_NAMES = ['Horvat', 'Kovacic', 'Babic', 'Maric', 'Juric', 'Novak', 'Knezevic', 'Vukovic', 'Peric', 'Matic']
+CITIES = ['Zagreb', 'Split', 'Rijeka', 'Osijek', 'Zadar']
+GRADE_TYPES = ['exam', 'oral exam', 'homework', 'test']
+EVENT_TITLES = ['Exam', 'Test', 'Excursion', 'Parents meeting']
+SEED_PASSWORD = 'Seed.Password1'
+
+
+class SchoolSeeder:
+    """
+    Deterministic generator of a whole school (school years, school classes, professors, parents, students, grades,
+    absences and events). The same seed always generates the same school.
+    The rows are inserted with bulk_create in batches and with the primary keys set up front, so per-row save()
+    validation and activation mails are skipped and the relations don't need to be read back (the users search text
+    is built here because save() is skipped).
+    """
+
+    def __init__(self, seed=2020, first_school_year=2019, school_years=1, classes_per_year=4, students_per_class=25,
+                 school_subjects=12, subjects_per_class=8, professors_per_subject=2, grades_per_subject=6,
+                 absences_per_student=10, events_per_class=20, batch_size=2000):
+        self.random = random.Random(seed)
+        self.first_school_year = first_school_year
+        self.school_years = school_years
+        self.classes_per_year = classes_per_year
+        self.students_per_class = students_per_class
+        self.school_subjects_number = school_subjects
+        self.subjects_per_class = min(subjects_per_class, school_subjects)
+        self.professors_per_subject = max(professors_per_subject, 1)
+        self.grades_per_subject = grades_per_subject
+        self.absences_per_student = absences_per_student
+        self.events_per_class = events_per_class
+        self.batch_size = batch_size
+        self.next_ids = {}
+        self.pending = {}
+        self.counts = {}
+        self.salt = new_salt()
+        self.password = new_psw(self.salt, SEED_PASSWORD)
+
+    def seed(self):
+        """
+        This method will generate the school
+        :return: number of created rows per model name
+        """
+        with transaction.atomic():
+            self.seed_reference_data()
+            self.seed_school_subjects()
+            self.seed_professors()
+            for year in range(self.first_school_year, self.first_school_year + self.school_years):
+                self.seed_school_year(school_year=f'{year}/{year + 1}', first_day=date(year, 9, 1))
+            self.flush()
+            # The rows are inserted without save(), so the signals don't bump the versions of the lists
+            ResourceVersion.bump(keys=['users', 'school_classes'])
+        self.reset_sequences()
+        return self.counts
+
+    def new_id(self, model):
+        if model not in self.next_ids:
+            self.next_ids[model] = (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+        new_id = self.next_ids[model]
+        self.next_ids[model] += 1
+        return new_id
+
+    def add(self, instance):
+        model = type(instance)
+        if not instance.id:
+            instance.id = self.new_id(model)
+        self.pending.setdefault(model, []).append(instance)
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush()
+        return instance
+
+    def flush(self):
+        # The parents are flushed before the models which reference them
+        for model in [User, SchoolClass, SchoolClassProfessor, SchoolClassStudent, ClassRoomSchoolSubject, Grade, Event,
+                      Absence]:
+            instances = self.pending.pop(model, [])
+            if instances:
+                model.objects.bulk_create(instances)
+                if model is Grade:
+                    GradeSummary.add_grades(grades=instances)
+                self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(instances)
+
+    def reset_sequences(self):
+        models = [User, SchoolClass, SchoolClassProfessor, SchoolClassStudent, ClassRoomSchoolSubject, Grade, Event,
+                  Absence, SchoolSubject]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def seed_reference_data(self):
+        self.roles = {}
+        for name in roles:
+            self.roles[name] = Role.objects.get_or_create(name=name)[0].id
+        self.gender_ids = [Gender.objects.get_or_create(name=name)[0].id for name in ['Male', 'Female']]
+
+    def seed_school_subjects(self):
+        existing = set(SchoolSubject.objects.values_list('name', flat=True))
+        for number in range(1, self.school_subjects_number + 1):
+            name = f'School subject {number}'
+            if name not in existing:
+                SchoolSubject.objects.create(name=name, is_active=True)
+        self.school_subject_ids = list(SchoolSubject.objects.filter(
+            name__in=[f'School subject {number}' for number in range(1, self.school_subjects_number + 1)]
+        ).order_by('id').values_list('id', flat=True))
+
+    def new_user(self, role, birth_date, email_prefix=None, **kwargs):
+        user = User(
+            first_name=self.random.choice(FIRST_NAMES),
+            last_name=kwargs.pop('last_name', None) or self.random.choice(LAST_NAMES),
+            address=f'Street {self.random.randint(1, 200)}',
+            city=self.random.choice(CITIES),
+            is_active=True,
+            birth_date=birth_date,
+            gender_id=self.random.choice(self.gender_ids),
+            role_id=self.roles[role],
+            newsletter=False,
+            **kwargs
+        )
+        user.id = self.new_id(User)
+        if email_prefix:
+            user.email = f'{email_prefix}.{user.id}@seed.school.book'
+            user.phone = f'091{user.id:07d}'
+            user.salt = self.salt
+            user.password = self.password
+        else:
+            user.salt = None
+        user.search_text = build_search_text(user)
+        return self.add(user)
+
+    def seed_professors(self):
+        # Each professor teaches one school subject
+        self.professors = {school_subject_id: [] for school_subject_id in self.school_subject_ids}
+        for index in range(len(self.school_subject_ids) * self.professors_per_subject):
+            professor = self.new_user(
+                role='Professor',
+                birth_date=date(1960, 1, 1) + timedelta(days=self.random.randint(0, 9000)),
+                email_prefix='professor'
+            )
+            self.professors[self.school_subject_ids[index % len(self.school_subject_ids)]].append(professor.id)
+        self.flush()
+
+    def seed_families(self, students_number, first_day):
+        """
+        This method will create the parents of the school year students, every family has 1-3 children
+        :return: list of (parent_mother_id, parent_father_id, last_name) for every student
+        """
+        families = []
+        while len(families) < students_number:
+            last_name = self.random.choice(LAST_NAMES)
+            mother = self.new_user(
+                role='Parent',
+                birth_date=first_day - timedelta(days=self.random.randint(9000, 18000)),
+                email_prefix='parent',
+                last_name=last_name
+            )
+            father = None
+            if self.random.random() < 0.8:
+                father = self.new_user(
+                    role='Parent',
+                    birth_date=first_day - timedelta(days=self.random.randint(9000, 18000)),
+                    email_prefix='parent',
+                    last_name=last_name
+                )
+            for _ in range(self.random.randint(1, 3)):
+                families.append((mother.id, father.id if father else None, last_name))
+        self.random.shuffle(families)
+        return families[:students_number]
+
+    def random_datetime(self, first_day, days=280):
+        moment = datetime.combine(first_day, datetime.min.time()) + timedelta(
+            days=self.random.randint(0, days),
+            hours=self.random.randint(8, 14),
+            minutes=self.random.randint(0, 59)
+        )
+        return timezone.make_aware(moment, timezone.utc)
+
+    def seed_school_year(self, school_year, first_day):
+        if SchoolClass.objects.filter(school_year=school_year).exists():
+            raise ValueError(f'School year {school_year} already exists!')
+        families = self.seed_families(self.students_per_class * self.classes_per_year, first_day)
+        for class_number in range(self.classes_per_year):
+            school_class = self.add(SchoolClass(
+                name=f"{class_number // 4 + 1}.{'abcd'[class_number % 4]}",
+                school_year=school_year,
+                is_active=True
+            ))
+            school_subject_ids = self.random.sample(self.school_subject_ids, self.subjects_per_class)
+            class_subjects = []
+            for school_subject_id in school_subject_ids:
+                professors = self.professors[school_subject_id]
+                professor_id = professors[class_number % len(professors)]
+                class_subjects.append((school_subject_id, professor_id))
+                self.add(ClassRoomSchoolSubject(
+                    is_active=True,
+                    professor_id=professor_id,
+                    school_subject_id=school_subject_id,
+                    school_class_id=school_class.id
+                ))
+            for professor_id in sorted(set(professor_id for _, professor_id in class_subjects)):
+                self.add(SchoolClassProfessor(is_active=True, professor_id=professor_id, school_class_id=school_class.id))
+            first_student = class_number * self.students_per_class
+            for parent_mother_id, parent_father_id, last_name in families[first_student:first_student + self.students_per_class]:
+                student = self.new_user(
+                    role='Student',
+                    birth_date=first_day - timedelta(days=self.random.randint(2500, 6500)),
+                    parent_mother_id=parent_mother_id,
+                    parent_father_id=parent_father_id,
+                    last_name=last_name
+                )
+                self.add(SchoolClassStudent(is_active=True, student_id=student.id, school_class_id=school_class.id))
+                self.seed_student(student.id, school_class.id, class_subjects, first_day)
+            for _ in range(self.events_per_class):
+                school_subject_id, professor_id = self.random.choice(class_subjects)
+                self.add(Event(
+                    created=self.random_datetime(first_day),
+                    title=self.random.choice(EVENT_TITLES),
+                    comment=f'Event of school class {school_class.name}',
+                    date=self.random_datetime(first_day),
+                    professor_id=professor_id,
+                    school_class_id=school_class.id,
+                    school_subject_id=school_subject_id
+                ))
+
+    def seed_student(self, student_id, school_class_id, class_subjects, first_day):
+        for school_subject_id, professor_id in class_subjects:
+            grades_number = max(0, self.grades_per_subject + self.random.randint(-2, 2))
+            for _ in range(grades_number):
+                self.add(Grade(
+                    created=self.random_datetime(first_day),
+                    grade=self.random.choices([1, 2, 3, 4, 5], weights=[1, 3, 5, 6, 5])[0],
+                    grade_type=self.random.choice(GRADE_TYPES),
+                    comment=None,
+                    professor_id=professor_id,
+                    student_id=student_id,
+                    school_subject_id=school_subject_id,
+                    school_class_id=school_class_id
+                ))
+        absences_number = max(0, self.absences_per_student + self.random.randint(-self.absences_per_student // 2,
+                                                                                 self.absences_per_student // 2))
+        for _ in range(absences_number):
+            school_subject_id, professor_id = self.random.choice(class_subjects)
+            self.add(Absence(
+                created=self.random_datetime(first_day),
+                title='Absence',
+                comment='Student did not show up',
+                is_justified=self.random.random() < 0.7,
+                professor_id=professor_id,
+                student_id=student_id,
+                school_subject_id=school_subject_id,
+                school_class_id=school_class_id
+            ))
@@ -6,6 +6,7 @@ from .models import (
     SchoolSubject,
     SchoolClass,
     Grade,
+    GradeSummary,
     Event,
     Absence,
     SchoolClassStudent,
@@ -124,6 +125,26 @@ class GradeSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
+class GradeSummarySerializer(serializers.HyperlinkedModelSerializer):
+    student_id = serializers.IntegerField()
+    school_class_id = serializers.IntegerField()
+    school_subject = SchoolSubjectSerializer(many=False)
+
+    class Meta:
+        model = GradeSummary
+        fields = [
+            'student_id',
+            'school_class_id',
+            'school_subject',
+            'grades_number',
+            'grades_sum',
+            'grades_average',
+            'min_grade',
+            'max_grade',
+            'last_grade_date'
+        ]
+
+
 class EventSerializer(serializers.HyperlinkedModelSerializer):
     professor = UserSerializer(many=False)
     school_subject = SchoolSubjectSerializer(many=False)
@@ -0,0 +1,205 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import (
+    pre_save,
+    post_save,
+    pre_delete,
+    post_delete
+)
+from django.dispatch import receiver
+from .reference_data import reference_data
+from .models import (
+    Role,
+    Gender,
+    SchoolSubject,
+    User,
+    Grade,
+    GradeSummary,
+    Event,
+    Absence,
+    SchoolClass,
+    SchoolClassStudent,
+    SchoolClassProfessor,
+    ClassRoomSchoolSubject,
+    ResourceVersion
+)
+
+# Resources (ETag versions) which are changed by a saved or deleted row
+RESOURCE_KEYS = {
+    Role: lambda instance: ['reference:roles'],
+    Gender: lambda instance: ['reference:genders'],
+    SchoolSubject: lambda instance: ['reference:school_subjects'],
+    User: lambda instance: ['users'],
+    SchoolClass: lambda instance: ['school_classes', f'school_class:{instance.id}'],
+    SchoolClassStudent: lambda instance: [f'school_class:{instance.school_class_id}', f'student:{instance.student_id}'],
+    SchoolClassProfessor: lambda instance: [
+        f'school_class:{instance.school_class_id}',
+        f'professor:{instance.professor_id}'
+    ],
+    ClassRoomSchoolSubject: lambda instance: [
+        f'school_class:{instance.school_class_id}',
+        f'professor:{instance.professor_id}'
+    ],
+    Grade: lambda instance: [f'school_class:{instance.school_class_id}', f'student:{instance.student_id}'],
+    Absence: lambda instance: [f'school_class:{instance.school_class_id}', f'student:{instance.student_id}'],
+    Event: lambda instance: [
+        f'school_class:{instance.school_class_id}',
+        f'school_class:{getattr(instance, "previous_school_class_id", None) or instance.school_class_id}',
+        f'professor:{instance.professor_id}'
+    ],
+}
+# Keys of the grade summaries of the grades which are being deleted in this thread (grade id: key)
+deleted_grades = threading.local()
+# The members are deleted without the delete signals (removed in bulk with one DELETE), their deletes are invalidated
+# by members_changed
+FAST_DELETE_MODELS = [SchoolClassStudent, SchoolClassProfessor]
+
+
+def get_deleted_grade_keys():
+    if not hasattr(deleted_grades, 'keys'):
+        deleted_grades.keys = {}
+    return deleted_grades.keys
+
+
+def invalidate_parent_events(parent_ids=None, school_class_ids=None):
+    """
+    This method will invalidate the cached event feeds of the parents, the versions of the parent feeds are bumped in
+    the same transaction as the write, so a feed which is read while the transaction is still open is cached under the
+    old version
+    :param parent_ids:
+    :param school_class_ids:
+    :return:
+    """
+    Event.bump_parent_events_version(parent_ids=parent_ids, school_class_ids=set(school_class_ids or []))
+
+
+def members_changed(school_class_ids, professor_ids=None, student_ids=None, parent_ids=None):
+    """
+    This method will bump the versions of the school classes and of the members and invalidate the event feeds of the
+    parents of the students, for the members which are written or deleted without the signals
+    :param school_class_ids:
+    :param professor_ids:
+    :param student_ids:
+    :param parent_ids: parents of the students, read from the students if None
+    :return:
+    """
+    professor_ids = set(professor_ids or [])
+    student_ids = set(student_ids or [])
+    ResourceVersion.bump(
+        keys=[f'school_class:{school_class_id}' for school_class_id in set(school_class_ids)] +
+        [f'professor:{professor_id}' for professor_id in professor_ids] +
+        [f'student:{student_id}' for student_id in student_ids]
+    )
+    if parent_ids is None and student_ids:
+        parent_ids = set(
+            parent_id for parents in User.objects.filter(id__in=student_ids).values_list(
+                'parent_mother_id',
+                'parent_father_id'
+            ) for parent_id in parents
+        )
+    parent_ids = set(parent_ids or [])
+    parent_ids.discard(None)
+    if parent_ids:
+        invalidate_parent_events(parent_ids=parent_ids)
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_school_class(sender, instance, **kwargs):
+    instance.previous_school_class_id = Event.objects.filter(id=instance.id).values_list(
+        'school_class_id',
+        flat=True
+    ).first() if instance.id else None
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, instance, **kwargs):
+    school_class_ids = {instance.school_class_id, getattr(instance, 'previous_school_class_id', None)}
+    school_class_ids.discard(None)
+    invalidate_parent_events(school_class_ids=school_class_ids)
+
+
+@receiver(pre_delete, sender=SchoolClass)
+def school_class_deleted(sender, instance, **kwargs):
+    # The students of the school class are deleted by the cascade without the delete signals (before the events), so
+    # the parents are resolved before the delete
+    invalidate_parent_events(school_class_ids=[instance.id])
+
+
+@receiver(post_save, sender=SchoolClassStudent)
+def enrollment_changed(sender, instance, **kwargs):
+    parents = User.objects.filter(id=instance.student_id).values_list('parent_mother_id', 'parent_father_id').first()
+    if parents:
+        invalidate_parent_events(parent_ids=parents)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_parents(sender, instance, **kwargs):
+    instance.previous_parent_ids = User.objects.filter(id=instance.id).values_list(
+        'parent_mother_id',
+        'parent_father_id'
+    ).first() if instance.id else None
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # The memberships of the user are deleted by the cascade without the delete signals
+    school_class_ids = set(SchoolClassStudent.objects.filter(student_id=instance.id).values_list(
+        'school_class_id',
+        flat=True
+    )) | set(SchoolClassProfessor.objects.filter(professor_id=instance.id).values_list('school_class_id', flat=True))
+    if school_class_ids:
+        members_changed(
+            school_class_ids=school_class_ids,
+            parent_ids=[instance.parent_mother_id, instance.parent_father_id]
+        )
+
+
+@receiver(post_save, sender=User)
+def user_parents_changed(sender, instance, **kwargs):
+    parent_ids = {instance.parent_mother_id, instance.parent_father_id}
+    previous_parent_ids = set(getattr(instance, 'previous_parent_ids', None) or [])
+    if previous_parent_ids and previous_parent_ids != parent_ids:
+        invalidate_parent_events(parent_ids=parent_ids | previous_parent_ids)
+
+
+@receiver(pre_delete, sender=Grade)
+def grade_deleting(sender, instance, **kwargs):
+    get_deleted_grade_keys()[instance.id] = GradeSummary.get_key(instance)
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, **kwargs):
+    # The pre_delete signals of a delete (with its cascade) are sent before any row is deleted and the post_delete
+    # signals of the grades after all the grades are deleted, so the summaries of all the deleted grades are refreshed
+    # together at the first post_delete and the other grades of the same delete are skipped
+    deleted_grade_keys = get_deleted_grade_keys()
+    if instance.id not in deleted_grade_keys:
+        return
+    keys = set(deleted_grade_keys.values())
+    deleted_grade_keys.clear()
+    GradeSummary.refresh_grade_summaries(keys=keys)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Gender)
+@receiver(post_delete, sender=Gender)
+@receiver(post_save, sender=SchoolSubject)
+@receiver(post_delete, sender=SchoolSubject)
+def reference_data_changed(sender, instance, **kwargs):
+    kind = {Role: 'roles', Gender: 'genders', SchoolSubject: 'school_subjects'}[sender]
+    reference_data.invalidate(kind)
+    transaction.on_commit(lambda: reference_data.invalidate(kind))
+
+
+def resource_changed(sender, instance, **kwargs):
+    ResourceVersion.bump(keys=RESOURCE_KEYS[sender](instance))
+
+
+# The receiver is connected only to the models of RESOURCE_KEYS, a delete receiver without a sender would disable the
+# fast deletes of every other model
+for model in RESOURCE_KEYS:
+    post_save.connect(resource_changed, sender=model, dispatch_uid=f'resource_changed_save_{model.__name__}')
+    if model not in FAST_DELETE_MODELS:
+        post_delete.connect(resource_changed, sender=model, dispatch_uid=f'resource_changed_delete_{model.__name__}')
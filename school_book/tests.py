@@ -1,3 +1,1456 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+import django
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test import (
+    TestCase,
+    RequestFactory,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    Role,
+    Gender,
+    User,
+    SchoolClass,
+    SchoolClassStudent,
+    SchoolSubject,
+    ClassRoomSchoolSubject,
+    Grade,
+    GradeSummary,
+    Event,
+    Absence,
+    EmailOutbox,
+    SchoolClassProfessor,
+    ResourceVersion
+)
+from .benchmark import compare_results
+from .user_import import hash_passwords
+from .gradebook import Gradebook
+from .dashboard import ParentDashboard
+from .middleware import SecurityTokenMiddleware
+from .reference_data import (
+    ReferenceDataCache,
+    reference_data
+)
+from .pagination import CursorPaginator
+from .query_metrics import (
+    QueryBudgetExceeded,
+    query_budget,
+    query_metrics
+)
+from .flat_serializers import FlatSerializer
+from .serializers import (
+    UserSerializer,
+    GradeSerializer,
+    SchoolCLassStudentsSerializer
+)
+from .token_cache import (
+    SecurityTokenCache,
+    security_token_cache
+)
 
-# Create your tests here.
+
+class SchoolBookTestCase(TestCase):
+
+    def setUp(self):
+        security_token_cache.clear()
+        cache.clear()
+        reference_data.clear()
+        self.roles = {name: Role.objects.create(name=name) for name in ['Administrator', 'Professor', 'Parent', 'Student']}
+        self.gender = Gender.objects.create(name='Female')
+        self.parent = self.create_user(role='Parent', email='parent@school.book')
+        self.professor = self.create_user(role='Professor', email='professor@school.book')
+        self.school_class = SchoolClass.objects.create(name='1.a', school_year='2019/2020', is_active=True)
+        reference_data.load_all()
+
+    def create_user(self, role, email=None, **kwargs):
+        user = User(
+            first_name=kwargs.pop('first_name', role),
+            last_name=kwargs.pop('last_name', 'Test'),
+            email=email,
+            phone='0911234567' if email else None,
+            address='Address 1',
+            city='Split',
+            is_active=True,
+            birth_date=datetime.date(2000, 1, 1),
+            gender=self.gender,
+            role=self.roles[role],
+            password='password' if email else None,
+            **kwargs
+        )
+        user.save()
+        return user
+
+    def create_student(self, school_class=None):
+        student = self.create_user(role='Student', parent_mother=self.parent)
+        SchoolClassStudent.objects.create(student=student, school_class=school_class or self.school_class, is_active=True)
+        return student
+
+    def create_school_class_subject(self, name):
+        school_subject = SchoolSubject.objects.create(name=name, is_active=True)
+        ClassRoomSchoolSubject.objects.create(
+            professor=self.professor,
+            school_subject=school_subject,
+            school_class=self.school_class,
+            is_active=True
+        )
+        return school_subject
+
+    def create_grade(self, student, school_subject, grade=5):
+        return Grade.objects.create(
+            grade=grade,
+            grade_type='exam',
+            professor=self.professor,
+            student=student,
+            school_subject=school_subject,
+            school_class=self.school_class
+        )
+
+
+class GradebookTestCase(SchoolBookTestCase):
+
+    def fill_school_class(self, students_number, subjects_number):
+        students = [self.create_student() for _ in range(students_number)]
+        offset = SchoolSubject.objects.count()
+        subjects = [self.create_school_class_subject(name=f'Subject {offset + n}') for n in range(subjects_number)]
+        for student in students:
+            for school_subject in subjects:
+                self.create_grade(student=student, school_subject=school_subject, grade=4)
+                self.create_grade(student=student, school_subject=school_subject, grade=5)
+        return students, subjects
+
+    def test_gradebook_groups_grades_by_student_and_subject(self):
+        students, subjects = self.fill_school_class(students_number=2, subjects_number=2)
+        results = Gradebook(school_class_id=self.school_class.id).load().results()
+        self.assertEqual([student.id for student in students], [student['id'] for student in results])
+        for student in results:
+            self.assertEqual(len(subjects), len(student['school_subjects']))
+            for subject in student['school_subjects']:
+                self.assertEqual([4, 5], subject['school_subject']['grades'])
+                for grade in subject['school_subject']['grades_info']:
+                    self.assertEqual(student['id'], grade['student']['id'])
+                    self.assertEqual(subject['school_subject']['school_subject']['id'], grade['school_subject']['id'])
+
+    def test_gradebook_query_count_does_not_depend_on_school_class_size(self):
+        self.fill_school_class(students_number=1, subjects_number=1)
+        with self.assertNumQueries(3):
+            Gradebook(school_class_id=self.school_class.id).load().results()
+        self.fill_school_class(students_number=5, subjects_number=4)
+        with self.assertNumQueries(3):
+            Gradebook(school_class_id=self.school_class.id).load().results()
+
+
+class SecurityTokenMiddlewareTestCase(SchoolBookTestCase):
+
+    def test_principal_is_resolved_with_one_query(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=self.parent.security_token())
+        with self.assertNumQueries(1):
+            principal = SecurityTokenMiddleware.get_principal(request)
+        self.assertEqual(self.parent.id, principal.user_id)
+        self.assertTrue(principal.has_role('Parent'))
+        self.assertTrue(principal.is_token_current)
+        self.assertTrue(principal.is_token_of(self.parent))
+        self.assertFalse(principal.is_token_of(self.professor))
+        with self.assertRaises(AttributeError):
+            principal.role = 'Administrator'
+
+    def test_stale_token_is_not_current(self):
+        security_token = self.professor.security_token()
+        User.objects.filter(id=self.professor.id).update(role=self.roles['Parent'])
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=security_token)
+        principal = SecurityTokenMiddleware.get_principal(request)
+        self.assertEqual('Parent', principal.role)
+        self.assertFalse(principal.is_token_current)
+
+    def test_missing_or_invalid_token(self):
+        response = self.client.get('/school_book/parent/children')
+        self.assertEqual(401, response.status_code)
+        response = self.client.get('/school_book/parent/children', HTTP_AUTHORIZATION='invalid')
+        self.assertEqual(401, response.status_code)
+
+    def test_view_uses_principal(self):
+        student = self.create_student()
+        response = self.client.get('/school_book/parent/children', HTTP_AUTHORIZATION=self.parent.security_token())
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([student.id], [child['id'] for child in response.json()['results']])
+        response = self.client.get('/school_book/parent/children', HTTP_AUTHORIZATION=self.professor.security_token())
+        self.assertEqual(403, response.status_code)
+
+
+class SecurityTokenCacheTestCase(SchoolBookTestCase):
+
+    def test_lru_and_ttl_eviction(self):
+        cache = SecurityTokenCache(max_size=2, ttl=300)
+        cache.set('token-1', claims={'user_id': 1}, user_id=1)
+        cache.set('token-2', claims={'user_id': 2}, user_id=2)
+        self.assertEqual(({'user_id': 1}, 1), cache.get('token-1'))
+        cache.set('token-3', claims={'user_id': 3}, user_id=3)
+        self.assertIsNone(cache.get('token-2'))
+        self.assertIsNotNone(cache.get('token-1'))
+        expired_cache = SecurityTokenCache(max_size=2, ttl=-1)
+        expired_cache.set('token-1', claims={'user_id': 1}, user_id=1)
+        self.assertIsNone(expired_cache.get('token-1'))
+        self.assertEqual({'size': 2, 'max_size': 2, 'ttl': 300, 'hits': 2, 'misses': 1, 'evictions': 1}, cache.stats())
+
+    def test_token_is_verified_once_and_evicted_on_deactivation(self):
+        security_token = self.parent.security_token()
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=security_token)
+        SecurityTokenMiddleware.get_principal(request)
+        hits = security_token_cache.stats()['hits']
+        with mock.patch.object(User, 'check_security_token') as check_security_token:
+            principal = SecurityTokenMiddleware.get_principal(request)
+            check_security_token.assert_not_called()
+        self.assertEqual(self.parent.id, principal.user_id)
+        self.assertEqual(hits + 1, security_token_cache.stats()['hits'])
+        self.assertTrue(self.parent.deactivate_user())
+        self.assertIsNone(security_token_cache.get(security_token))
+
+
+class EmailOutboxTestCase(SchoolBookTestCase):
+
+    def test_activation_mail_is_queued_and_sent_by_the_worker(self):
+        EmailOutbox.objects.all().delete()
+        self.create_user(role='Professor', email='new.professor@school.book')
+        self.assertEqual([], mail.outbox)
+        email = EmailOutbox.objects.get()
+        self.assertEqual('new.professor@school.book', email.to_email)
+        call_command('send_outbox_emails', stdout=io.StringIO())
+        self.assertEqual(['new.professor@school.book'], mail.outbox[0].to)
+        email.refresh_from_db()
+        self.assertIsNotNone(email.sent)
+        call_command('send_outbox_emails', stdout=io.StringIO())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_failed_mail_is_retried_with_backoff(self):
+        with mock.patch('school_book.management.commands.send_outbox_emails.EmailMessage.send') as send:
+            send.side_effect = ConnectionError('Mail server is down')
+            call_command('send_outbox_emails', '--max-attempts=2', stdout=io.StringIO())
+            emails = list(EmailOutbox.objects.all())
+            self.assertTrue(emails)
+            for email in emails:
+                self.assertEqual(1, email.attempts)
+                self.assertGreater(email.next_attempt, django.utils.timezone.now())
+                self.assertIsNone(email.sent)
+            EmailOutbox.objects.update(next_attempt=django.utils.timezone.now())
+            call_command('send_outbox_emails', '--max-attempts=2', stdout=io.StringIO())
+        self.assertEqual(len(emails), EmailOutbox.objects.filter(is_failed=True).count())
+        self.assertEqual([], mail.outbox)
+
+    def test_claimed_mails_are_skipped_by_the_other_workers(self):
+        EmailOutbox.objects.all().delete()
+        for number in range(2):
+            EmailOutbox.queue_email(subject='Hello', message='Hello', from_email='school@school.book',
+                                    to_email=f'parent.{number}@school.book')
+        claims = []
+
+        def send():
+            # Another worker which runs while the batch is sent
+            claims.append(EmailOutbox.claim_pending_emails(limit=10, lease=300))
+            if len(claims) == 2:
+                raise ConnectionError('Mail server is down')
+
+        with mock.patch('school_book.management.commands.send_outbox_emails.EmailMessage.send', side_effect=send):
+            call_command('send_outbox_emails', stdout=io.StringIO())
+        self.assertEqual([[], []], claims)
+        self.assertEqual(
+            [(0, False), (1, True)],
+            [(email.attempts, email.sent is None) for email in EmailOutbox.objects.order_by('id')]
+        )
+
+
+class BulkGradesTestCase(SchoolBookTestCase):
+
+    def test_valid_grades_are_added_and_invalid_rows_are_reported(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        students = [self.create_student() for _ in range(3)]
+        inactive_student = self.create_student()
+        User.objects.filter(id=inactive_student.id).update(is_active=False)
+        grades = [{'student_id': student.id, 'grade': 5, 'grade_type': 'exam', 'comment': ''} for student in students]
+        grades += [
+            {'student_id': inactive_student.id, 'grade': 4, 'grade_type': 'exam', 'comment': ''},
+            {'student_id': self.parent.id, 'grade': 4, 'grade_type': 'exam', 'comment': ''},
+            {'student_id': students[0].id, 'grade': 7, 'grade_type': 'exam', 'comment': ''},
+            {'grade': 3},
+        ]
+        response = self.client.post(
+            '/school_book/school_classes/grades/bulk',
+            data={'school_class_id': self.school_class.id, 'school_subject_id': school_subject.id, 'grades': grades},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.professor.security_token()
+        )
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(3, response.json()['grades_number'])
+        self.assertEqual([
+            {'index': 3, 'student_id': inactive_student.id, 'message': 'This student is deactivated!'},
+            {'index': 4, 'student_id': self.parent.id, 'message': "Student hasn't Student role, role is Parent!"},
+            {'index': 5, 'student_id': students[0].id, 'message': 'The grade is not in range 1-5, grade is 7!'},
+            {'index': 6, 'student_id': None, 'message': 'Wrong data!'},
+        ], response.json()['errors'])
+        self.assertEqual(3, Grade.objects.filter(school_subject=school_subject).count())
+
+    def test_validation_query_count_does_not_depend_on_batch_size(self):
+        students = [self.create_student() for _ in range(10)]
+        for number in [2, 10]:
+            school_subject = self.create_school_class_subject(name=f'Math {number}')
+            data = {'school_class_id': self.school_class.id, 'school_subject_id': school_subject.id}
+            data['grades'] = [{'student_id': student.id, 'grade': 5, 'grade_type': 'exam'} for student in students[:number]]
+            # users with the class and the subject, savepoint, insert, grade summaries, insert grade summaries (in a
+            # savepoint), resource versions (select, update), release savepoint
+            with self.assertNumQueries(10):
+                self.assertEqual((number, []), Grade.add_new_grades(data=data, professor_id=self.professor.id))
+
+
+class RollCallTestCase(SchoolBookTestCase):
+
+    def test_roll_call_is_validated_against_the_roster(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        students = [self.create_student() for _ in range(3)]
+        other_school_class = SchoolClass.objects.create(name='1.b', school_year='2019/2020', is_active=True)
+        other_student = self.create_student(school_class=other_school_class)
+        absences = [{'student_id': student.id, 'title': 'Late', 'comment': 'Missed the lesson'} for student in students]
+        absences.append({'student_id': other_student.id, 'title': 'Late', 'comment': 'Missed the lesson'})
+        data = {'school_class_id': self.school_class.id, 'school_subject_id': school_subject.id, 'absences': absences}
+        # professor with the class and the subject, roster, savepoint, insert, resource versions (select, update),
+        # release savepoint
+        with self.assertNumQueries(7):
+            absences_number, errors = Absence.add_new_absences(data=data, professor_id=self.professor.id)
+        self.assertEqual(3, absences_number)
+        self.assertEqual(
+            [{'index': 3, 'student_id': other_student.id, 'message': "Student isn't a member of this school class!"}],
+            errors
+        )
+
+    def test_roll_call_accepts_only_boolean_is_justified(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        students = [self.create_student() for _ in range(4)]
+        absences = [
+            {'student_id': student.id, 'comment': 'Missed the lesson', 'is_justified': is_justified}
+            for student, is_justified in zip(students, ['false', '0', 1, True])
+        ]
+        response = self.client.post(
+            '/school_book/school_classes/absences/roll_call',
+            data={'school_class_id': self.school_class.id, 'school_subject_id': school_subject.id,
+                  'absences': absences},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.professor.security_token()
+        )
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(1, response.json()['absences_number'])
+        self.assertEqual([
+            {'index': index, 'student_id': students[index].id, 'message': 'Field is_justified should be true or false!'}
+            for index in range(3)
+        ], response.json()['errors'])
+        self.assertEqual([(students[3].id, True)], list(Absence.objects.values_list('student_id', 'is_justified')))
+
+    def test_justify_absences_with_one_update(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        students = [self.create_student() for _ in range(3)]
+        data = {
+            'school_class_id': self.school_class.id,
+            'school_subject_id': school_subject.id,
+            'absences': [{'student_id': student.id, 'comment': 'Missed the lesson'} for student in students]
+        }
+        Absence.add_new_absences(data=data, professor_id=self.professor.id)
+        absence_ids = list(Absence.objects.values_list('id', flat=True))
+        response = self.client.patch(
+            '/school_book/school_classes/absences/justify',
+            data={'absence_ids': absence_ids, 'is_justified': True},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.professor.security_token()
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json()['absences_number'])
+        self.assertEqual(3, Absence.objects.filter(is_justified=True).count())
+        for is_justified in ['false', 0, None]:
+            response = self.client.patch(
+                '/school_book/school_classes/absences/justify',
+                data={'absence_ids': absence_ids, 'is_justified': is_justified},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.professor.security_token()
+            )
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(3, Absence.objects.filter(is_justified=True).count())
+
+
+class CursorPaginationTestCase(SchoolBookTestCase):
+
+    def get_pages(self, url, security_token, direction='next', cursor=None):
+        pages = []
+        while True:
+            data = {'limit': 2}
+            if cursor:
+                data['cursor'] = cursor
+            response = self.client.get(url, data=data, HTTP_AUTHORIZATION=security_token)
+            self.assertEqual(200, response.status_code)
+            pages.append(response.json())
+            cursor = pages[-1][direction]
+            if not cursor:
+                return pages
+
+    def test_pages_are_walked_forward_and_backward(self):
+        administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        security_token = administrator.security_token()
+        for number in range(3):
+            SchoolClass.objects.create(name=f'{number + 2}.a', school_year='2019/2020', is_active=True)
+        pages = self.get_pages('/school_book/school_classes', security_token)
+        school_class_ids = [school_class['id'] for page in pages for school_class in page['results']]
+        self.assertEqual(list(SchoolClass.objects.order_by('-id').values_list('id', flat=True)), school_class_ids)
+        self.assertEqual([4, 4], [page['total'] for page in pages])
+        self.assertIsNone(pages[0]['prev'])
+        pages = self.get_pages('/school_book/school_classes', security_token, direction='prev', cursor=pages[-1]['prev'])
+        self.assertEqual(school_class_ids[:2], [school_class['id'] for school_class in pages[-1]['results']])
+
+    def test_members_of_both_roles_are_paged_with_one_cursor(self):
+        students = [self.create_student() for _ in range(3)]
+        self.school_class.schoolclassprofessor_set.create(professor=self.professor, is_active=True)
+        pages = self.get_pages(
+            f'/school_book/school_classes/school_class/{self.school_class.id}/members',
+            self.professor.security_token()
+        )
+        members = [member.get('professor', member.get('student'))['id'] for page in pages for member in page['results']]
+        self.assertEqual([self.professor.id] + [student.id for student in students], members)
+
+    def test_page_is_read_without_offset(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        grades = [self.create_grade(student=student, school_subject=school_subject) for _ in range(5)]
+        paginator = CursorPaginator(queryset=Grade.objects.all(), ordering=['id'])
+        page = paginator.paginate({'limit': '2'})
+        page = paginator.paginate({'limit': '2', 'cursor': page.next}, total=page.total)
+        self.assertEqual([grade.id for grade in grades[2:4]], [grade.id for grade in page.results])
+        with self.assertRaisesMessage(ValueError, 'Cursor is not valid!'):
+            paginator.paginate({'cursor': 'not a cursor'})
+        with self.assertRaisesMessage(ValueError, 'Limit is not valid!'):
+            paginator.paginate({'limit': '-1'})
+        self.assertEqual(1, len(paginator.paginate({'limit': '1'}).results))
+        self.assertEqual(5, len(CursorPaginator(queryset=Grade.objects.all(), max_page_size=10).paginate({}).results))
+
+
+class UsersListTestCase(SchoolBookTestCase):
+
+    def test_page_and_total_are_read_in_one_query(self):
+        for number in range(4):
+            self.create_user(role='Professor', email=f'professor.{number}@school.book')
+        data = {'roleId': str(self.roles['Professor'].id), 'limit': '2'}
+        users = User.get_all_users(data=data, requester='Administrator')
+        paginator = CursorPaginator(queryset=users, ordering=['id'])
+        # users version, page with the total
+        with self.assertNumQueries(2):
+            page = paginator.paginate(data, count_cache_key=User.get_users_number_cache_key(users))
+        self.assertEqual(5, page.total)
+        # users version, page
+        with self.assertNumQueries(2):
+            page = paginator.paginate(
+                dict(data, cursor=page.next),
+                count_cache_key=User.get_users_number_cache_key(users)
+            )
+        self.assertEqual(5, page.total)
+        self.create_user(role='Professor', email='new.professor@school.book')
+        # users version, page, total
+        with self.assertNumQueries(3):
+            page = paginator.paginate(
+                dict(data, cursor=page.next),
+                count_cache_key=User.get_users_number_cache_key(users)
+            )
+        self.assertEqual(6, page.total)
+
+    def test_total_is_in_the_envelope(self):
+        administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        response = self.client.get(
+            '/school_book/users/',
+            data={'search': 'school.book', 'limit': 2},
+            HTTP_AUTHORIZATION=administrator.security_token()
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json()['total'])
+        self.assertEqual(2, len(response.json()['results']))
+        self.assertNotIn('users_number', response.json()['results'][0])
+        next_page = self.client.get(
+            '/school_book/users/',
+            data={'search': 'school.book', 'limit': 2, 'cursor': response.json()['next']},
+            HTTP_AUTHORIZATION=administrator.security_token()
+        )
+        user_ids = [user['id'] for user in response.json()['results'] + next_page.json()['results']]
+        self.assertEqual(sorted([self.parent.id, self.professor.id, administrator.id]), sorted(user_ids))
+
+
+class UserSearchTestCase(SchoolBookTestCase):
+
+    def search(self, search, requester='Administrator'):
+        users = User.get_all_users(data={'search': search}, requester=requester)
+        return [user.id for user in users]
+
+    def test_search_matches_word_prefixes_of_all_tokens(self):
+        ivana = self.create_user(role='Parent', email='ivana.horvat@school.book', first_name='Ivana', last_name='Horvat')
+        ivan = self.create_user(role='Parent', email='ivan@school.book', first_name='Ivan', last_name='Babić')
+        self.assertEqual({ivana.id, ivan.id}, set(self.search('iva')))
+        self.assertEqual([ivana.id], self.search('IVA horv'))
+        self.assertEqual([ivan.id], self.search('babic'))
+        self.assertEqual([], self.search('vana'))
+        ivan.last_name = 'Kovač'
+        ivan.save()
+        self.assertEqual([], self.search('babic'))
+        self.assertEqual([ivan.id], self.search('kovac'))
+
+    def test_better_match_is_ranked_first(self):
+        split = self.create_user(role='Parent', email='ana@school.book', first_name='Ana', last_name='Split')
+        split_split = self.create_user(role='Parent', email='split@school.book', first_name='Split', last_name='Split')
+        self.assertEqual([split_split.id, split.id], self.search('split'))
+
+    def test_role_scope_is_applied_to_the_search(self):
+        administrator = self.create_user(role='Administrator', email='admin@school.book', first_name='Marko')
+        professor = self.create_user(role='Professor', email='marko@school.book', first_name='Marko')
+        self.assertEqual({administrator.id, professor.id}, set(self.search('marko')))
+        self.assertEqual([professor.id], self.search('marko', requester='Professor'))
+
+
+class FlatSerializerTestCase(SchoolBookTestCase):
+
+    def test_flat_serializer_keeps_the_drf_json_shape(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        self.create_grade(student=student, school_subject=school_subject)
+        for serializer_class, queryset in [
+            (UserSerializer, User.objects.order_by('id')),
+            (GradeSerializer, Grade.objects.order_by('id')),
+            (SchoolCLassStudentsSerializer, SchoolClassStudent.objects.order_by('id')),
+        ]:
+            flat_serializer = FlatSerializer.for_serializer(serializer_class)
+            expected = json.loads(json.dumps(serializer_class(many=True, instance=queryset).data))
+            self.assertEqual(expected, flat_serializer.serialize(flat_serializer.prepare(queryset)))
+            self.assertEqual(expected, flat_serializer.serialize_values(queryset))
+        self.assertIs(FlatSerializer.for_serializer(GradeSerializer), FlatSerializer.for_serializer(GradeSerializer))
+
+    def test_grades_page_is_read_with_one_query(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        for _ in range(5):
+            self.create_grade(student=student, school_subject=school_subject)
+        flat_serializer = FlatSerializer.for_serializer(GradeSerializer)
+        with self.assertNumQueries(1):
+            page = CursorPaginator(queryset=flat_serializer.prepare(Grade.objects.all())).paginate({})
+            grades = flat_serializer.serialize(page.results)
+        self.assertEqual(self.parent.email, grades[0]['student']['parent_mother']['email'])
+        self.assertIsNone(grades[0]['student']['parent_father'])
+
+
+class SideloadTestCase(SchoolBookTestCase):
+
+    def test_nested_objects_are_included_once(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        for _ in range(10):
+            self.create_grade(student=student, school_subject=school_subject)
+        url = f'/school_book/school_class/{self.school_class.id}/child/{student.id}/school_subject/{school_subject.id}/grades'
+        inline = self.client.get(url, HTTP_AUTHORIZATION=self.parent.security_token())
+        sideloaded = self.client.get(url, data={'include': 'sideload'}, HTTP_AUTHORIZATION=self.parent.security_token())
+        self.assertEqual(200, sideloaded.status_code)
+        self.assertNotIn('included', inline.json())
+        grade = sideloaded.json()['results'][0]
+        self.assertEqual([self.professor.id, student.id, school_subject.id, self.school_class.id],
+                         [grade['professor'], grade['student'], grade['school_subject'], grade['school_class']])
+        included = sideloaded.json()['included']
+        self.assertEqual({str(self.professor.id), str(student.id)}, set(included['users']))
+        self.assertEqual(inline.json()['results'][0]['student'], included['users'][str(student.id)])
+        self.assertEqual(inline.json()['results'][0]['school_subject'], included['school_subjects'][str(school_subject.id)])
+        self.assertEqual([str(self.school_class.id)], list(included['school_classes']))
+        self.assertLess(len(sideloaded.content) * 3, len(inline.content))
+
+    def test_included_objects_are_read_with_one_query_per_model(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        for _ in range(3):
+            self.create_grade(student=self.create_student(), school_subject=school_subject)
+        flat_serializer = FlatSerializer.for_serializer(GradeSerializer)
+        grades = list(Grade.objects.all())
+        # users, school subjects and school classes
+        with self.assertNumQueries(3):
+            results, included = flat_serializer.serialize_sideloaded(grades)
+        self.assertEqual(4, len(included['users']))
+
+
+class ParentDashboardTestCase(SchoolBookTestCase):
+
+    def fill_dashboard(self, children_number):
+        school_subject = self.create_school_class_subject(name=f'Subject {SchoolSubject.objects.count()}')
+        children = [self.create_student() for _ in range(children_number)]
+        for child in children:
+            self.create_grade(student=child, school_subject=school_subject, grade=4)
+            self.create_grade(student=child, school_subject=school_subject, grade=5)
+            for is_justified in [True, False, False]:
+                Absence.objects.create(
+                    title='Absence',
+                    comment='Missed the lesson',
+                    is_justified=is_justified,
+                    professor=self.professor,
+                    student=child,
+                    school_subject=school_subject,
+                    school_class=self.school_class
+                )
+        Event.objects.create(
+            title='Exam',
+            comment='Exam',
+            date=django.utils.timezone.now() + datetime.timedelta(days=1),
+            professor=self.professor,
+            school_subject=school_subject,
+            school_class=self.school_class
+        )
+        return children, school_subject
+
+    def test_dashboard_summarizes_every_child(self):
+        children, school_subject = self.fill_dashboard(children_number=2)
+        response = self.client.get('/school_book/parent/dashboard', HTTP_AUTHORIZATION=self.parent.security_token())
+        self.assertEqual(200, response.status_code)
+        results = response.json()['results']
+        self.assertEqual([child.id for child in children], [child['id'] for child in results])
+        school_class = results[0]['school_classes'][0]
+        self.assertEqual(self.school_class.id, school_class['id'])
+        self.assertEqual((1, 2), (school_class['justified_absences'], school_class['unjustified_absences']))
+        self.assertEqual(
+            {'id': school_subject.id, 'grades_number': 2, 'grades_average': 4.5, 'justified_absences': 1,
+             'unjustified_absences': 2},
+            {key: school_class['school_subjects'][0][key] for key in
+             ['id', 'grades_number', 'grades_average', 'justified_absences', 'unjustified_absences']}
+        )
+        self.assertEqual(['Exam'], [event['title'] for event in response.json()['events']])
+        response = self.client.get('/school_book/parent/dashboard', HTTP_AUTHORIZATION=self.professor.security_token())
+        self.assertEqual(403, response.status_code)
+
+    def test_query_count_does_not_depend_on_the_children(self):
+        self.fill_dashboard(children_number=1)
+        with self.assertNumQueries(6):
+            ParentDashboard(parent_id=self.parent.id).load().results()
+        self.fill_dashboard(children_number=4)
+        with self.assertNumQueries(6):
+            ParentDashboard(parent_id=self.parent.id).load().results()
+
+
+class ParentEventsTestCase(SchoolBookTestCase):
+
+    def create_event(self, title, school_class=None):
+        return Event.objects.create(
+            title=title,
+            comment=title,
+            date=django.utils.timezone.now() + datetime.timedelta(days=1),
+            professor=self.professor,
+            school_subject=self.create_school_class_subject(name=title),
+            school_class=school_class or self.school_class
+        )
+
+    def get_titles(self):
+        response = self.client.get('/school_book/parent/events', HTTP_AUTHORIZATION=self.parent.security_token())
+        self.assertEqual(200, response.status_code)
+        return [event['title'] for event in response.json()['results']]
+
+    def test_feed_is_read_with_one_query(self):
+        self.create_student()
+        other_school_class = SchoolClass.objects.create(name='1.b', school_year='2019/2020', is_active=True)
+        self.create_event(title='Exam')
+        self.create_event(title='Trip', school_class=other_school_class)
+        with self.assertNumQueries(1):
+            events = list(Event.get_all_events_by_parent_id(parent_id=self.parent.id))
+        self.assertEqual(['Exam'], [event.title for event in events])
+
+    def test_feed_is_cached_and_invalidated_by_events(self):
+        self.create_student()
+        self.create_event(title='Exam')
+        self.assertEqual(['Exam'], self.get_titles())
+        # version of the parent feed
+        with self.assertNumQueries(1):
+            cache_key = Event.get_parent_events_cache_key(parent_id=self.parent.id, query_string={})
+            self.assertIsNotNone(cache.get(cache_key))
+        event = self.create_event(title='Trip')
+        self.assertEqual(['Trip', 'Exam'], self.get_titles())
+        event.delete_event()
+        self.assertEqual(['Exam'], self.get_titles())
+
+    def test_feed_is_invalidated_by_enrollment_changes(self):
+        other_school_class = SchoolClass.objects.create(name='1.b', school_year='2019/2020', is_active=True)
+        self.create_event(title='Trip', school_class=other_school_class)
+        student = self.create_student()
+        self.assertEqual([], self.get_titles())
+        member = SchoolClassStudent.objects.create(student=student, school_class=other_school_class, is_active=True)
+        self.assertEqual(['Trip'], self.get_titles())
+        member.activate_or_deactivate_member(is_active=False)
+        self.assertEqual([], self.get_titles())
+
+    def test_feed_is_invalidated_by_removed_students_and_deleted_school_classes(self):
+        other_school_class = SchoolClass.objects.create(name='1.b', school_year='2019/2020', is_active=True)
+        self.create_event(title='Trip', school_class=other_school_class)
+        students = [self.create_student(school_class=other_school_class) for _ in range(2)]
+        self.assertEqual(['Trip'], self.get_titles())
+        SchoolClass.update_members(school_class_id=other_school_class.id, action='remove', student_ids=[students[0].id])
+        self.assertEqual(['Trip'], self.get_titles())
+        SchoolClassStudent.objects.get(student=students[1]).delete()
+        self.assertEqual([], self.get_titles())
+        SchoolClassStudent.objects.create(student=students[0], school_class=other_school_class, is_active=True)
+        self.assertEqual(['Trip'], self.get_titles())
+        other_school_class.delete()
+        self.assertFalse(Event.objects.filter(title='Trip').exists())
+        self.assertEqual([], self.get_titles())
+
+
+class AbsencesNumberTestCase(SchoolBookTestCase):
+
+    def create_absence(self, student, school_subject, is_justified):
+        return Absence.objects.create(
+            title='Absence',
+            comment='Missed the lesson',
+            is_justified=is_justified,
+            professor=self.professor,
+            student=student,
+            school_subject=school_subject,
+            school_class=self.school_class
+        )
+
+    def test_student_absences_are_counted_with_one_query(self):
+        student = self.create_student()
+        school_subject = self.create_school_class_subject(name='Math')
+        for is_justified in [True, False, False]:
+            self.create_absence(student=student, school_subject=school_subject, is_justified=is_justified)
+        with self.assertNumQueries(1):
+            absences_number = Absence.count_all_absences_by_justified(
+                school_class_id=self.school_class.id,
+                student_id=student.id,
+                school_subject_id=school_subject.id
+            )
+        self.assertEqual((1, 2), absences_number)
+        self.assertEqual((0, 0), Absence.count_all_absences_by_justified(
+            school_class_id=0,
+            student_id=self.parent.id,
+            school_subject_id=0
+        ))
+
+    def test_school_class_absences_are_counted_with_one_query(self):
+        students = [self.create_student() for _ in range(2)]
+        school_subjects = [self.create_school_class_subject(name=name) for name in ['Math', 'Art']]
+        self.create_absence(student=students[0], school_subject=school_subjects[0], is_justified=True)
+        self.create_absence(student=students[0], school_subject=school_subjects[1], is_justified=False)
+        self.create_absence(student=students[1], school_subject=school_subjects[1], is_justified=False)
+        self.create_absence(student=students[1], school_subject=school_subjects[1], is_justified=False)
+        with self.assertNumQueries(1):
+            absences = Absence.count_all_absences_by_school_class_id(school_class_id=self.school_class.id)
+        self.assertEqual([
+            (students[0].id, school_subjects[0].id, 1, 0),
+            (students[0].id, school_subjects[1].id, 0, 1),
+            (students[1].id, school_subjects[1].id, 0, 2),
+        ], [(absence['student_id'], absence['school_subject_id'], absence['justified_absences'],
+             absence['unjustified_absences']) for absence in absences])
+        response = self.client.get(
+            f'/school_book/school_class/{self.school_class.id}/absences',
+            HTTP_AUTHORIZATION=self.professor.security_token()
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(response.json()['results']))
+        response = self.client.get(
+            f'/school_book/school_class/{self.school_class.id}/absences',
+            HTTP_AUTHORIZATION=self.parent.security_token()
+        )
+        self.assertEqual(403, response.status_code)
+
+
+class GradeSummaryTestCase(SchoolBookTestCase):
+
+    def get_summary(self, student, school_subject):
+        summary = GradeSummary.objects.get(student=student, school_class=self.school_class, school_subject=school_subject)
+        return summary.grades_number, summary.grades_sum, summary.min_grade, summary.max_grade
+
+    def test_summary_follows_saved_and_deleted_grades(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        grades = [self.create_grade(student=student, school_subject=school_subject, grade=grade) for grade in [2, 5, 4]]
+        self.assertEqual((3, 11, 2, 5), self.get_summary(student=student, school_subject=school_subject))
+        grades[0].grade = 3
+        grades[0].save()
+        self.assertEqual((3, 12, 3, 5), self.get_summary(student=student, school_subject=school_subject))
+        grades[1].delete()
+        self.assertEqual((2, 7, 3, 4), self.get_summary(student=student, school_subject=school_subject))
+        data = {
+            'school_class_id': self.school_class.id,
+            'school_subject_id': school_subject.id,
+            'grades': [{'student_id': student.id, 'grade': 1, 'grade_type': 'exam'}]
+        }
+        Grade.add_new_grades(data=data, professor_id=self.professor.id)
+        self.assertEqual((3, 8, 1, 4), self.get_summary(student=student, school_subject=school_subject))
+        for grade in Grade.objects.filter(student=student):
+            grade.delete()
+        self.assertFalse(GradeSummary.objects.exists())
+
+    def test_rebuild_matches_the_maintained_summaries(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        students = [self.create_student() for _ in range(3)]
+        for index, student in enumerate(students):
+            for grade in range(1, index + 3):
+                self.create_grade(student=student, school_subject=school_subject, grade=grade)
+        fields = ['student_id', 'school_subject_id', 'grades_number', 'grades_sum', 'grades_average', 'min_grade',
+                  'max_grade', 'last_grade_date']
+        maintained = list(GradeSummary.objects.order_by('student_id').values(*fields))
+        self.assertEqual(3, GradeSummary.rebuild_grade_summaries())
+        self.assertEqual(maintained, list(GradeSummary.objects.order_by('student_id').values(*fields)))
+        response = self.client.get(
+            f'/school_book/school_class/{self.school_class.id}/child/{students[1].id}/grade_summaries',
+            HTTP_AUTHORIZATION=self.parent.security_token()
+        )
+        self.assertEqual(200, response.status_code)
+        summary = response.json()['results'][0]
+        self.assertEqual((3, 2.0, 'Math'), (summary['grades_number'], summary['grades_average'],
+                                            summary['school_subject']['name']))
+        response = self.client.get(
+            f'/school_book/school_class/{self.school_class.id}/grade_summaries',
+            HTTP_AUTHORIZATION=self.parent.security_token()
+        )
+        self.assertEqual(403, response.status_code)
+
+    def test_only_the_summaries_of_the_keys_are_locked(self):
+        school_subjects = [self.create_school_class_subject(name=name) for name in ['Math', 'Art']]
+        students = [self.create_student() for _ in range(2)]
+        for student in students:
+            for school_subject in school_subjects:
+                self.create_grade(student=student, school_subject=school_subject)
+        keys = {
+            (students[0].id, self.school_class.id, school_subjects[0].id),
+            (students[1].id, self.school_class.id, school_subjects[1].id)
+        }
+        self.assertEqual(keys, set(GradeSummary.get_summaries_by_keys(keys=keys)))
+
+    def test_deleted_grades_are_refreshed_together(self):
+        school_subjects = [self.create_school_class_subject(name=name) for name in ['Math', 'Art']]
+        students = [self.create_student() for _ in range(2)]
+        for student in students:
+            for school_subject in school_subjects:
+                for grade in [2, 5]:
+                    self.create_grade(student=student, school_subject=school_subject, grade=grade)
+        with CaptureQueriesContext(connection) as context:
+            Grade.objects.filter(grade=5).delete()
+        self.assertEqual(1, len([query for query in context.captured_queries if 'COUNT(' in query['sql']]))
+        self.assertEqual(
+            {(1, 2, 2, 2)},
+            set(GradeSummary.objects.values_list('grades_number', 'grades_sum', 'min_grade', 'max_grade'))
+        )
+        self.assertEqual(4, GradeSummary.objects.count())
+        self.school_class.delete()
+        self.assertFalse(GradeSummary.objects.exists())
+
+    def test_summary_inserted_by_another_transaction_is_updated(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        self.create_grade(student=student, school_subject=school_subject, grade=5)
+        grade = Grade(grade=3, grade_type='exam', professor=self.professor, student=student,
+                      school_subject=school_subject, school_class=self.school_class,
+                      created=django.utils.timezone.now())
+        Grade.objects.bulk_create([grade])
+        get_summaries_by_keys = GradeSummary.get_summaries_by_keys
+        reads = []
+
+        def get_summaries_after_another_insert(keys):
+            # The first read doesn't see the summary, as if another transaction inserted it after the read
+            reads.append(keys)
+            return {} if len(reads) == 1 else get_summaries_by_keys(keys=keys)
+
+        with mock.patch.object(GradeSummary, 'get_summaries_by_keys', side_effect=get_summaries_after_another_insert):
+            GradeSummary.add_grades(grades=[grade])
+        self.assertEqual((2, 8, 3, 5), self.get_summary(student=student, school_subject=school_subject))
+
+
+class RelatedStateTestCase(SchoolBookTestCase):
+
+    def test_save_is_validated_with_one_query(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        grade = Grade(grade=5, grade_type='exam', professor_id=self.professor.id, student_id=student.id,
+                      school_subject_id=school_subject.id, school_class_id=self.school_class.id)
+        # related state, savepoint, insert, resource versions (select, update), grade summary (summaries, insert in a
+        # savepoint), release savepoint
+        with self.assertNumQueries(10):
+            grade.save()
+        absence = Absence(title='Late', comment='Missed the lesson', professor_id=self.professor.id,
+                          student_id=student.id, school_subject_id=school_subject.id,
+                          school_class_id=self.school_class.id)
+        # related state, insert, resource versions (select, update)
+        with self.assertNumQueries(4):
+            absence.save()
+
+    def test_error_messages_are_kept(self):
+        school_subject = self.create_school_class_subject(name='Math')
+        student = self.create_student()
+        grade = Grade(grade=5, grade_type='exam', professor_id=student.id, student_id=student.id,
+                      school_subject_id=school_subject.id, school_class_id=self.school_class.id)
+        with self.assertRaisesMessage(ValueError, "Professor hasn't Professor role, role is Student!"):
+            grade.save()
+        grade.professor_id = self.professor.id
+        SchoolSubject.objects.filter(id=school_subject.id).update(is_active=False)
+        with self.assertRaisesMessage(ValueError, 'This school subject is deactivated!'):
+            grade.save()
+        grade.school_subject_id = school_subject.id + 100
+        with self.assertRaisesMessage(ValueError, "School subject doesn't exist!"):
+            grade.save()
+        event = Event(title='Exam', comment='Exam', date=django.utils.timezone.now(), professor_id=self.professor.id,
+                      school_subject_id=school_subject.id, school_class_id=self.school_class.id)
+        SchoolClass.objects.filter(id=self.school_class.id).update(is_active=False)
+        with self.assertRaisesMessage(ValueError, 'The school class is deactivated!'):
+            event.save()
+
+
+class ReferenceDataTestCase(SchoolBookTestCase):
+
+    def test_reference_lists_are_served_from_memory(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(['Administrator', 'Professor', 'Parent', 'Student'], [
+                role['name'] for role in Role.get_all_roles()
+            ])
+            self.assertEqual(['Female'], [gender['name'] for gender in Gender.get_all_genders()])
+            self.assertEqual(self.roles['Student'].id, reference_data.get_role_ids(['Student'])[0])
+        administrator = self.create_user(role='Administrator', email='admin@school.book')
+        token = administrator.security_token()
+        self.client.get('/school_book/admin/roles', HTTP_AUTHORIZATION=token)
+        # principal, resource versions, no roles query
+        with self.assertNumQueries(2):
+            response = self.client.get('/school_book/admin/roles?limit=2', HTTP_AUTHORIZATION=token)
+        self.assertEqual(['Administrator', 'Professor'], [role['name'] for role in response.json()['results']])
+        self.assertEqual(4, response.json()['total'])
+        response = self.client.get(f"/school_book/admin/roles?cursor={response.json()['next']}",
+                                   HTTP_AUTHORIZATION=token)
+        self.assertEqual(['Parent', 'Student'], [role['name'] for role in response.json()['results']])
+        self.assertNotIn('roles_number', Role.get_all_roles()[0])
+
+    def test_reference_data_is_invalidated_on_save_and_delete(self):
+        self.assertEqual([], SchoolSubject.get_all_school_subjects())
+        school_subject = SchoolSubject.objects.create(name='Math', is_active=True)
+        self.assertEqual(['Math'], [row['name'] for row in SchoolSubject.get_all_school_subjects()])
+        school_subject.delete()
+        self.assertEqual([], SchoolSubject.get_all_school_subjects())
+        Gender.objects.create(name='Male')
+        self.assertEqual(['Female', 'Male'], [gender['name'] for gender in Gender.get_all_genders()])
+
+    def test_unknown_role_is_loaded_again_only_after_a_version_bump(self):
+        unknown_role_id = max(role.id for role in self.roles.values()) + 1
+        # roles version, roles
+        with self.assertNumQueries(2):
+            self.assertIsNone(reference_data.get_role_name(unknown_role_id))
+        with self.assertNumQueries(0):
+            self.assertIsNone(reference_data.get_role_name(unknown_role_id))
+            self.assertEqual('Student', reference_data.get_role_name(self.roles['Student'].id))
+        Role.objects.create(name='Guest')
+        self.assertEqual('Guest', reference_data.get_role_name(unknown_role_id))
+
+    def test_reference_data_changed_by_another_process_is_loaded_again(self):
+        # A change saved by another process only bumps the version in the database
+        Gender.objects.filter(id=self.gender.id).update(name='Male')
+        ResourceVersion.bump(keys=['reference:genders'])
+        self.assertEqual(['Female'], [gender['name'] for gender in reference_data.get('genders')])
+        other_process = ReferenceDataCache(ttl=0)
+        other_process.load_all()
+        # reference data version
+        with self.assertNumQueries(1):
+            self.assertEqual(['Male'], [gender['name'] for gender in other_process.get('genders')])
+        Role.objects.filter(id=self.roles['Student'].id).update(name='Pupil')
+        ResourceVersion.bump(keys=['reference:roles'])
+        administrator = self.create_user(role='Administrator', email='admin@school.book')
+        response = self.client.get('/school_book/admin/roles', HTTP_AUTHORIZATION=administrator.security_token())
+        self.assertEqual('Pupil', response.json()['results'][3]['name'])
+
+
+class ConditionalGetTestCase(SchoolBookTestCase):
+
+    def get_members(self, **headers):
+        return self.client.get(
+            f'/school_book/school_classes/school_class/{self.school_class.id}/members',
+            HTTP_AUTHORIZATION=self.professor.security_token(),
+            **headers
+        )
+
+    def test_unchanged_resource_is_not_modified(self):
+        self.create_student()
+        response = self.get_members()
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+        self.get_members(HTTP_IF_NONE_MATCH=etag)
+        # principal, resource versions
+        with self.assertNumQueries(2):
+            response = self.get_members(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+        self.assertEqual(b'', response.content)
+
+    def test_write_changes_the_etag(self):
+        student = self.create_student()
+        school_subject = self.create_school_class_subject(name='Math')
+        etag = self.get_members()['ETag']
+        SchoolClassStudent.objects.filter(student=student).first().activate_or_deactivate_member(is_active=False)
+        response = self.get_members(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+        etag = response['ETag']
+        Absence.justify_absences(absence_ids=[], is_justified=True)
+        self.assertEqual(304, self.get_members(HTTP_IF_NONE_MATCH=etag).status_code)
+        data = {
+            'school_class_id': self.school_class.id,
+            'school_subject_id': school_subject.id,
+            'grades': [{'student_id': student.id, 'grade': 5, 'grade_type': 'exam'}]
+        }
+        Grade.add_new_grades(data=data, professor_id=self.professor.id)
+        self.assertEqual(200, self.get_members(HTTP_IF_NONE_MATCH=etag).status_code)
+        response = self.client.get(
+            f'/school_book/school_classes/school_class/{self.school_class.id}/members',
+            HTTP_AUTHORIZATION=self.parent.security_token(),
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(403, response.status_code)
+
+    def test_resource_receiver_keeps_fast_deletes(self):
+        self.assertFalse(post_delete.has_listeners(EmailOutbox))
+        self.assertTrue(post_delete.has_listeners(SchoolClass))
+        self.assertFalse(post_delete.has_listeners(SchoolClassStudent))
+
+
+class QueryMetricsTestCase(SchoolBookTestCase):
+
+    def setUp(self):
+        super().setUp()
+        query_metrics.clear()
+        self.administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        self.members_url = f'/school_book/school_classes/school_class/{self.school_class.id}/members'
+
+    def test_requests_are_recorded_per_route(self):
+        self.create_student()
+        self.client.get(self.members_url, HTTP_AUTHORIZATION=self.professor.security_token())
+        response = self.client.get('/school_book/metrics', HTTP_AUTHORIZATION=self.professor.security_token())
+        self.assertEqual(403, response.status_code)
+        response = self.client.get('/school_book/metrics', HTTP_AUTHORIZATION=self.administrator.security_token())
+        self.assertEqual(200, response.status_code)
+        routes = response.json()['routes']
+        members = routes['school_book/school_classes/school_class/<int:school_class_id>/members']
+        self.assertEqual(1, members['requests'])
+        self.assertGreater(members['queries'], 0)
+        self.assertEqual(members['queries'], members['max_queries'])
+        self.assertEqual(0, members['budget_exceeded'])
+        self.assertTrue(members['slowest'][0]['sql'])
+        # the forbidden request, the current one is recorded after the response
+        self.assertEqual(1, routes['school_book/metrics']['requests'])
+        token_cache = response.json()['token_cache']
+        self.assertEqual({'size', 'max_size', 'ttl', 'hits', 'misses', 'evictions'}, set(token_cache))
+        self.assertEqual(security_token_cache.max_size, token_cache['max_size'])
+        self.assertGreaterEqual(token_cache['size'], 2)
+        self.assertGreater(token_cache['misses'], 0)
+
+    def test_debug_headers(self):
+        response = self.client.get(self.members_url, HTTP_AUTHORIZATION=self.professor.security_token())
+        self.assertNotIn('X-DB-Queries', response)
+        with override_settings(DEBUG=True):
+            response = self.client.get(self.members_url, HTTP_AUTHORIZATION=self.professor.security_token())
+        self.assertEqual(str(query_metrics.snapshot()['recent'][-1]['queries']), response['X-DB-Queries'])
+        self.assertIn('X-DB-Time-Ms', response)
+        self.assertIn('X-DB-Slowest-Ms', response)
+
+    def test_query_budget(self):
+        @query_budget(1)
+        def view(request):
+            return list(User.objects.all()), list(Role.objects.all())
+
+        request = RequestFactory().get('/school_book/users/')
+        with self.assertRaises(QueryBudgetExceeded):
+            view(request)
+        with override_settings(QUERY_BUDGET_STRICT=False):
+            users, roles = view(request)
+        self.assertEqual(4, len(roles))
+        self.assertEqual(2, query_metrics.snapshot()['routes']['/school_book/users/']['budget_exceeded'])
+        self.assertEqual(1, view.query_budget)
+
+
+class SeedSchoolTestCase(SchoolBookTestCase):
+
+    def seed_school(self, *args):
+        out = io.StringIO()
+        call_command(
+            'seed_school',
+            '--first-school-year=1990',
+            '--classes-per-year=2',
+            '--students-per-class=6',
+            '--school-subjects=3',
+            '--subjects-per-class=2',
+            '--professors-per-subject=1',
+            '--batch-size=10',
+            *args,
+            stdout=out
+        )
+        return out.getvalue()
+
+    def test_seed_school(self):
+        EmailOutbox.objects.all().delete()
+        output = self.seed_school()
+        self.assertIn('Seeded', output)
+        school_classes = SchoolClass.objects.filter(school_year='1990/1991')
+        self.assertEqual(2, school_classes.count())
+        students = SchoolClassStudent.objects.filter(school_class__in=school_classes).values_list('student_id', flat=True)
+        self.assertEqual(12, students.count())
+        self.assertEqual(3, User.objects.filter(email__startswith='professor.').count())
+        self.assertEqual(4, SchoolClassProfessor.objects.filter(school_class__in=school_classes).count())
+        for parent in User.objects.filter(email__startswith='parent.'):
+            self.assertIn(User.get_children_by_parent_id(parent_id=parent.id).count(), [1, 2, 3])
+        self.assertTrue(Grade.objects.filter(school_class__in=school_classes).exists())
+        self.assertTrue(Absence.objects.filter(school_class__in=school_classes).exists())
+        self.assertEqual(40, Event.objects.filter(school_class__in=school_classes).count())
+        self.assertFalse(User.objects.filter(id__in=students, search_text='').exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+        with self.assertRaises(CommandError):
+            self.seed_school()
+
+    def test_same_seed_generates_the_same_school(self):
+        self.seed_school('--seed=7')
+        first = list(Grade.objects.order_by('id').values_list('grade', 'grade_type'))
+        Grade.objects.all().delete()
+        SchoolClass.objects.filter(school_year='1990/1991').delete()
+        self.seed_school('--seed=7')
+        self.assertEqual(first, list(Grade.objects.order_by('id').values_list('grade', 'grade_type')))
+
+
+class BenchmarkEndpointsTestCase(SchoolBookTestCase):
+
+    def test_benchmark_and_compare(self):
+        self.create_student()
+        self.create_school_class_subject(name='Math')
+        SchoolClassProfessor.objects.create(professor=self.professor, school_class=self.school_class, is_active=True)
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            out = io.StringIO()
+            call_command('benchmark_endpoints', '--scales=database', '--requests=2', '--route=login', '--route=members',
+                         f'--output={baseline}', stdout=out)
+            with open(baseline) as baseline_file:
+                results = json.load(baseline_file)
+            # The timings of two requests are noise, compare_results is tested on its own
+            call_command('benchmark_endpoints', '--scales=database', '--requests=2', '--route=login',
+                         '--threshold=10', '--min-ms=1000', f'--compare={baseline}', stdout=out)
+        endpoints = results['scales']['database']['endpoints']
+        self.assertEqual(
+            {'POST school_book/login', 'GET school_book/school_classes/school_class/<int:school_class_id>/members'},
+            set(endpoints)
+        )
+        for metrics in endpoints.values():
+            self.assertEqual(200, metrics['status'])
+            self.assertGreater(metrics['queries'], 0)
+            self.assertGreater(metrics['bytes'], 0)
+        self.assertIn('No regressions', out.getvalue())
+        self.assertFalse(User.objects.filter(email='benchmark.administrator@school.book').exists())
+
+    def test_compare_results(self):
+        baseline = {'scales': {'small': {'endpoints': {'GET users': {
+            'status': 200, 'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries': 3, 'bytes': 1000, 'peak_memory_kb': 100
+        }}}}}
+        results = {'scales': {'small': {'endpoints': {'GET users': {
+            'status': 200, 'p50_ms': 10.5, 'p95_ms': 40, 'p99_ms': 31, 'queries': 4, 'bytes': 1100, 'peak_memory_kb': 100
+        }}}}}
+        self.assertEqual(
+            [('small', 'GET users', 'p95_ms', 20, 40), ('small', 'GET users', 'queries', 3, 4)],
+            compare_results(baseline=baseline, results=results)
+        )
+
+
+class SchoolYearExportTestCase(SchoolBookTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        self.student = self.create_student()
+        self.school_subject = self.create_school_class_subject(name='Math')
+        self.create_grade(self.student, self.school_subject, grade=4)
+        self.create_grade(self.student, self.school_subject, grade=5)
+        Absence.objects.create(
+            title='Absence',
+            comment='Sick',
+            is_justified=True,
+            professor=self.professor,
+            student=self.student,
+            school_subject=self.school_subject,
+            school_class=self.school_class
+        )
+        other_school_class = SchoolClass.objects.create(name='1.a', school_year='2020/2021', is_active=True)
+        Grade.objects.create(grade=1, grade_type='exam', professor=self.professor, student=self.student,
+                             school_subject=self.school_subject, school_class=other_school_class)
+
+    def export(self, kind, user=None, **query_string):
+        return self.client.get(
+            f'/school_book/admin/exports/{kind}',
+            query_string,
+            HTTP_AUTHORIZATION=(user or self.administrator).security_token()
+        )
+
+    def test_grades_csv(self):
+        response = self.export('grades', school_year='2019/2020')
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual('text/csv', response['Content-Type'])
+        self.assertIn('grades_2019-2020.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith('id,created,school_year,school_class_id,school_class,student_id'))
+        self.assertIn(',Student,Test,', lines[1])
+        self.assertIn(',Math,', lines[1])
+        self.assertTrue(lines[2].endswith(',5,exam,'))
+
+    def test_absences_jsonl_of_school_class(self):
+        response = self.export('absences', school_year='2019/2020', school_class_id=self.school_class.id,
+                               output='jsonl')
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(1, len(rows))
+        self.assertEqual(self.student.id, rows[0]['student_id'])
+        self.assertEqual('Professor', rows[0]['professor_first_name'])
+        self.assertTrue(rows[0]['is_justified'])
+        response = self.export('absences', school_year='2019/2020', school_class_id=self.school_class.id + 1,
+                               output='jsonl')
+        self.assertEqual(b'', b''.join(response.streaming_content))
+
+    def test_wrong_export(self):
+        self.assertEqual(403, self.export('grades', user=self.professor, school_year='2019/2020').status_code)
+        self.assertEqual(400, self.export('events', school_year='2019/2020').status_code)
+        self.assertEqual(400, self.export('grades', school_year='2019/2020', output='xml').status_code)
+        self.assertEqual(400, self.export('grades').status_code)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_school_year', 'grades', '--school-year=2020/2021', '--format=jsonl', '--chunk-size=1',
+                     stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([1], [row['grade'] for row in rows])
+
+
+class UserImportTestCase(SchoolBookTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        EmailOutbox.objects.all().delete()
+
+    @staticmethod
+    def user_row(role, email=None, **kwargs):
+        row = {
+            'first_name': kwargs.pop('first_name', role),
+            'last_name': 'Import',
+            'email': email,
+            'phone': '0911234567' if email else None,
+            'address': 'Address 1',
+            'city': 'Split',
+            'birth_date': '2000-01-01',
+            'gender': 'Female',
+            'role': role,
+            'password': 'Password.1' if email else None,
+            'is_active': False,
+        }
+        row.update(kwargs)
+        return row
+
+    def import_users(self, rows):
+        return self.client.post(
+            '/school_book/admin/users/import',
+            json.dumps({'users': rows}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.administrator.security_token()
+        )
+
+    def test_import_students_with_parents(self):
+        rows = [
+            self.user_row('Student', first_name='Ana', parent_mother_email='mother@school.book'),
+            self.user_row('Parent', email='mother@school.book'),
+            self.user_row('Student', first_name='Ivo', parent_mother=self.parent.id,
+                          parent_father_email='mother@school.book'),
+            self.user_row('Professor', email='new.professor@school.book', is_active='true'),
+        ]
+        response = self.import_users(rows)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual({'Student': 2, 'Parent': 1, 'Professor': 1}, response.json()['users_number'])
+        mother = User.objects.get(email='mother@school.book')
+        self.assertIsNone(mother.admin_password)
+        self.assertTrue(User.check_user_login_password(user=mother, password='Password.1'))
+        self.assertFalse(mother.is_active)
+        self.assertTrue(mother.activation_code)
+        self.assertEqual(mother.id, User.objects.get(first_name='Ana').parent_mother_id)
+        ivo = User.objects.get(first_name='Ivo')
+        self.assertEqual((self.parent.id, mother.id), (ivo.parent_mother_id, ivo.parent_father_id))
+        self.assertIsNone(ivo.salt)
+        self.assertIn('ivo', ivo.search_text)
+        self.assertTrue(User.objects.get(email='new.professor@school.book').is_active)
+        # Only the inactive users get the activation code
+        self.assertEqual(['mother@school.book'], list(EmailOutbox.objects.values_list('to_email', flat=True)))
+
+    def test_nothing_is_imported_if_a_row_is_wrong(self):
+        users_number = User.objects.count()
+        rows = [
+            self.user_row('Parent', email='mother@school.book'),
+            self.user_row('Parent', email='mother@school.book'),
+            self.user_row('Professor', email=self.professor.email),
+            self.user_row('Professor', email='weak@school.book', password='weak'),
+            self.user_row('Student', parent_mother_email='unknown@school.book'),
+            self.user_row('Student', parent_mother=self.professor.id),
+            self.user_row('Student'),
+            self.user_row('Pupil', email='pupil@school.book'),
+            self.user_row('Parent', email='date@school.book', birth_date='01.01.2000.'),
+        ]
+        response = self.import_users(rows)
+        self.assertEqual(400, response.status_code)
+        errors = response.json()['errors']
+        self.assertEqual([1, 2, 3, 4, 5, 6, 7, 8], [error['index'] for error in errors])
+        self.assertEqual('Email is repeated!', errors[0]['message'])
+        self.assertEqual(f'User with {self.professor.email} already exists!', errors[1]['message'])
+        self.assertEqual(users_number, User.objects.count())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_import_csv_file(self):
+        content = 'first_name,last_name,email,phone,address,city,birth_date,gender,role,password,is_active,' \
+                  'parent_mother_email\n' \
+                  'Maja,Import,maja@school.book,0911234567,Address 1,Split,1980-01-01,Female,Parent,Password.1,1,\n' \
+                  'Luka,Import,,,Address 1,Split,2010-01-01,Female,Student,,1,maja@school.book\n'
+        upload = io.BytesIO(content.encode())
+        upload.name = 'users.csv'
+        response = self.client.post(
+            '/school_book/admin/users/import',
+            {'file': upload},
+            HTTP_AUTHORIZATION=self.administrator.security_token()
+        )
+        self.assertEqual(201, response.status_code)
+        maja = User.objects.get(email='maja@school.book')
+        self.assertEqual(maja.id, User.objects.get(first_name='Luka').parent_mother_id)
+        response = self.client.post(
+            '/school_book/admin/users/import',
+            json.dumps({'users': []}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.professor.security_token()
+        )
+        self.assertEqual(403, response.status_code)
+
+    def test_hash_passwords_in_process_pool(self):
+        passwords = [(f'salt{number}', f'Password.{number}') for number in range(4)]
+        self.assertEqual(
+            [User.set_password(salt=salt, password=password) for salt, password in passwords],
+            hash_passwords(passwords=passwords, workers=2, threshold=1)
+        )
+
+
+class SchoolClassMembersTestCase(SchoolBookTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.administrator = self.create_user(role='Administrator', email='administrator@school.book')
+        self.students = [self.create_user(role='Student', parent_mother=self.parent) for _ in range(3)]
+        self.other_school_class = SchoolClass.objects.create(name='1.b', school_year='2019/2020', is_active=True)
+        Event.objects.create(
+            title='Trip',
+            comment='Trip',
+            date=django.utils.timezone.now() + datetime.timedelta(days=1),
+            professor=self.professor,
+            school_subject=self.create_school_class_subject(name='Math'),
+            school_class=self.other_school_class
+        )
+
+    def update_members(self, **body):
+        return self.client.post(
+            f'/school_book/admin/school_classes/school_class/{self.other_school_class.id}/members/bulk',
+            json.dumps(body),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.administrator.security_token()
+        )
+
+    def get_event_titles(self):
+        response = self.client.get('/school_book/parent/events', HTTP_AUTHORIZATION=self.parent.security_token())
+        return [event['title'] for event in response.json()['results']]
+
+    def get_members(self):
+        return dict(SchoolClassStudent.objects.filter(
+            school_class=self.other_school_class
+        ).values_list('student_id', 'is_active'))
+
+    def test_enroll_activate_deactivate_and_remove(self):
+        student_ids = [student.id for student in self.students]
+        self.assertEqual([], self.get_event_titles())
+        response = self.update_members(action='enroll', professor_ids=[self.professor.id], student_ids=student_ids,
+                                       is_active=True)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(4, response.json()['members_number'])
+        self.assertEqual({student_id: True for student_id in student_ids}, self.get_members())
+        self.assertTrue(SchoolClassProfessor.objects.filter(school_class=self.other_school_class).exists())
+        self.assertEqual(['Trip'], self.get_event_titles())
+        response = self.update_members(action='deactivate', student_ids=student_ids[:2])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({student_ids[0]: False, student_ids[1]: False, student_ids[2]: True}, self.get_members())
+        self.update_members(action='activate', student_ids=student_ids[:1])
+        self.assertEqual({student_ids[0]: True, student_ids[1]: False, student_ids[2]: True}, self.get_members())
+        response = self.update_members(action='remove', professor_ids=[self.professor.id], student_ids=student_ids)
+        self.assertEqual(4, response.json()['members_number'])
+        self.assertEqual({}, self.get_members())
+        self.assertFalse(SchoolClassProfessor.objects.filter(school_class=self.other_school_class).exists())
+        self.assertEqual([], self.get_event_titles())
+
+    def test_members_are_validated_and_written_in_bulk(self):
+        student_ids = [student.id for student in self.students]
+        # members state, savepoint, insert, resource versions (select, insert, update), parent versions (select, insert,
+        # update), release savepoint, the same number for any number of the members
+        with self.assertNumQueries(10):
+            members_number, errors = SchoolClass.update_members(
+                school_class_id=self.other_school_class.id,
+                action='enroll',
+                student_ids=student_ids + [self.professor.id, student_ids[0], 'x', 0]
+            )
+        self.assertEqual(3, members_number)
+        self.assertEqual(
+            ['Wrong data!', "Student hasn't Student role, role is Professor!", 'Student is repeated!',
+             "Student doesn't exist!"],
+            [error['message'] for error in errors]
+        )
+        members_number, errors = SchoolClass.update_members(
+            school_class_id=self.other_school_class.id,
+            action='remove',
+            professor_ids=[self.professor.id],
+            student_ids=student_ids[:1]
+        )
+        self.assertEqual(1, members_number)
+        self.assertEqual(["Professor isn't a member of this school class!"], [error['message'] for error in errors])
+        for school_class_id in [0, self.other_school_class.id + 1]:
+            with self.assertRaises(ValueError):
+                SchoolClass.update_members(school_class_id=school_class_id, action='enroll', student_ids=student_ids)
+        response = self.update_members(action='enroll', student_ids=student_ids[1:])
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(400, self.update_members(action='enroll').status_code)
+        self.assertEqual(403, self.update_members(action='move', student_ids=student_ids).status_code)
+
+    def test_removed_members_are_deleted_with_one_delete_and_invalidated(self):
+        student_ids = [student.id for student in self.students]
+        SchoolClass.update_members(
+            school_class_id=self.other_school_class.id,
+            action='enroll',
+            student_ids=student_ids,
+            is_active=True
+        )
+        self.assertEqual(['Trip'], self.get_event_titles())
+        with CaptureQueriesContext(connection) as context:
+            SchoolClass.update_members(
+                school_class_id=self.other_school_class.id,
+                action='remove',
+                student_ids=student_ids[:2]
+            )
+        self.assertEqual(1, len([query for query in context.captured_queries if query['sql'].startswith('DELETE')]))
+        self.assertEqual({student_ids[2]: True}, self.get_members())
+        version = ResourceVersion.get_versions(keys=[f'student:{student_ids[2]}'])[0]
+        self.assertEqual(['Trip'], self.get_event_titles())
+        SchoolClassStudent.objects.get(student_id=student_ids[2]).delete()
+        self.assertEqual(version + 1, ResourceVersion.get_versions(keys=[f'student:{student_ids[2]}'])[0])
+        self.assertEqual([], self.get_event_titles())
+        SchoolClass.update_members(
+            school_class_id=self.other_school_class.id,
+            action='enroll',
+            student_ids=student_ids,
+            is_active=True
+        )
+        self.assertEqual(['Trip'], self.get_event_titles())
+        version = ResourceVersion.get_versions(keys=[f'school_class:{self.other_school_class.id}'])[0]
+        for student in self.students:
+            student.delete_user()
+        self.assertLess(version, ResourceVersion.get_versions(keys=[f'school_class:{self.other_school_class.id}'])[0])
+        self.assertEqual([], self.get_event_titles())
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from django.conf import settings
+
+
+class SecurityTokenCache:
+    """
+    Bounded in-process cache of the verified security tokens.
+    The key is the token digest and the value is the decoded token (claims) and the resolved user id, so the same
+    token doesn't need to be verified (HMAC) again until the entry expires (TTL) or it's evicted (LRU, revocation).
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.user_digests = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(security_token):
+        return sha256(security_token.encode('utf-8', 'ignore')).hexdigest()
+
+    def get(self, security_token):
+        """
+        This method will get the cached claims and user id of the security token
+        :param security_token:
+        :return: (claims, user_id) or None
+        """
+        key = self.digest(security_token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] < time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            if not entry:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, security_token, claims, user_id):
+        if not self.max_size:
+            return
+        key = self.digest(security_token)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, claims, user_id)
+            self.user_digests.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def evict_user(self, user_id):
+        """
+        This method will evict all the cached tokens of the user (e.g. user is deactivated, deleted or the password
+        is changed)
+        :param user_id:
+        :return: number of evicted tokens
+        """
+        with self.lock:
+            keys = list(self.user_digests.get(user_id, []))
+            for key in keys:
+                self._remove(key)
+            self.evictions += len(keys)
+            return len(keys)
+
+    def evict(self, security_token):
+        key = self.digest(security_token)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_digests.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _remove(self, key):
+        expires, claims, user_id = self.entries.pop(key)
+        digests = self.user_digests.get(user_id)
+        if digests:
+            digests.discard(key)
+            if not digests:
+                del self.user_digests[user_id]
+
+
+security_token_cache = SecurityTokenCache(
+    max_size=getattr(settings, 'SECURITY_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'SECURITY_TOKEN_CACHE_TTL', 300)
+)
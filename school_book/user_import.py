@@ -0,0 +1,298 @@
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+from datetime import (
+    datetime,
+    timedelta
+)
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .constants import roles
+from .helper import (
+    new_salt,
+    new_psw
+)
+from .models import (
+    User,
+    EmailOutbox,
+    ResourceVersion
+)
+from .reference_data import reference_data
+from .search import build_search_text
+
+USER_IMPORT_CHUNK_SIZE = getattr(settings, 'USER_IMPORT_CHUNK_SIZE', 500)
+USER_IMPORT_HASH_WORKERS = getattr(settings, 'USER_IMPORT_HASH_WORKERS', None)
+# Below this number of passwords the process pool costs more than it saves
+USER_IMPORT_POOL_THRESHOLD = getattr(settings, 'USER_IMPORT_POOL_THRESHOLD', 1000)
+TRUE_VALUES = ['1', 'true', 'yes', 'y']
+FALSE_VALUES = ['', '0', 'false', 'no', 'n']
+
+
+def hash_passwords(passwords, workers=USER_IMPORT_HASH_WORKERS, threshold=USER_IMPORT_POOL_THRESHOLD):
+    """
+    This method will hash the passwords, many passwords are hashed in a process pool
+    :param passwords: list of (salt, password)
+    :param workers: number of processes, the number of the CPUs by default
+    :param threshold: the smallest number of passwords which is hashed in the process pool
+    :return: list of hashed passwords in the same order
+    """
+    salts = [salt for salt, password in passwords]
+    plain_passwords = [password for salt, password in passwords]
+    if len(passwords) < threshold or workers == 1:
+        return list(map(new_psw, salts, plain_passwords))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(new_psw, salts, plain_passwords, chunksize=max(len(passwords) // 64, 1)))
+
+
+def read_users_csv(content):
+    """
+    This method will read the users from the CSV, the first line is the header with the field names
+    :param content: str
+    :return: list of dicts
+    """
+    return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+
+
+class UserImport:
+    """
+    Import of many users at once (e.g. the students of a new school year with their parents).
+    Every row is validated before anything is inserted (the existing emails and parents are read with one query each),
+    and the import is all or nothing. The passwords are hashed in a process pool, the parents are linked by their email
+    (a parent from the same import or an existing parent), the users are inserted with bulk_create in chunks (the
+    parents before the students) and the activation mails are queued into the email outbox.
+    A row has the fields of add_new_user, the role and the gender are given by id (role_id, gender_id) or by name
+    (role, gender) and the parents by id (parent_mother, parent_father) or by email (parent_mother_email,
+    parent_father_email).
+    """
+
+    def __init__(self, rows, chunk_size=USER_IMPORT_CHUNK_SIZE, workers=USER_IMPORT_HASH_WORKERS):
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.users = []
+        self.parent_emails = []
+        self.errors = []
+
+    def validate(self):
+        """
+        This method will validate all the rows and build the users
+        :return: list of errors (index, email, message), empty if every row is valid
+        """
+        role_ids = {role['name']: role['id'] for role in reference_data.get('roles')}
+        role_names = {role_id: name for name, role_id in role_ids.items()}
+        gender_ids = {gender['name']: gender['id'] for gender in reference_data.get('genders')}
+        emails = set()
+        parent_emails = set()
+        parent_ids = set()
+        for row in self.rows:
+            if isinstance(row, dict):
+                emails.add((row.get('email') or '').strip())
+                for field in ['parent_mother', 'parent_father']:
+                    if row.get(f'{field}_email'):
+                        parent_emails.add(row[f'{field}_email'].strip())
+                    elif row.get(field):
+                        parent_ids.add(row[field])
+        emails.discard('')
+        existing_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True)) if emails else set()
+        existing_parents = list(User.objects.filter(
+            email__in=parent_emails
+        ).values_list('id', 'email', 'role_id')) if parent_emails else []
+        existing_parents_by_email = {email: (user_id, role_id) for user_id, email, role_id in existing_parents}
+        existing_parent_ids = self.get_existing_parent_ids(parent_ids)
+        imported_emails = {}
+        self.users = []
+        self.parent_emails = []
+        self.errors = []
+        for index, row in enumerate(self.rows):
+            if isinstance(row, dict) and row.get('email'):
+                email = row['email'].strip()
+                if email in imported_emails:
+                    self.errors.append({'index': index, 'email': row['email'], 'message': 'Email is repeated!'})
+                imported_emails.setdefault(email, (index, row))
+        for index, row in enumerate(self.rows):
+            try:
+                user, parent_emails = self.build_user(
+                    row=row,
+                    role_ids=role_ids,
+                    role_names=role_names,
+                    gender_ids=gender_ids,
+                    existing_emails=existing_emails,
+                    imported_emails=imported_emails,
+                    existing_parents_by_email=existing_parents_by_email,
+                    existing_parent_ids=existing_parent_ids
+                )
+            except (KeyError, TypeError, ValueError) as ex:
+                self.errors.append({
+                    'index': index,
+                    'email': row.get('email') if isinstance(row, dict) else None,
+                    'message': str(ex) if isinstance(ex, ValueError) else f'Wrong data!'
+                })
+                continue
+            self.users.append(user)
+            self.parent_emails.append(parent_emails)
+        self.errors.sort(key=lambda error: error['index'])
+        return self.errors
+
+    @staticmethod
+    def get_existing_parent_ids(parent_ids):
+        ids = set()
+        for parent_id in parent_ids:
+            try:
+                ids.add(int(parent_id))
+            except (TypeError, ValueError) as ex:
+                print(ex)
+        return set(User.objects.filter(
+            id__in=ids,
+            role_id__in=reference_data.get_role_ids(['Parent'])
+        ).values_list('id', flat=True)) if ids else set()
+
+    @staticmethod
+    def get_bool(row, field, default=False):
+        value = row.get(field, default)
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in TRUE_VALUES:
+            return True
+        if str(value).strip().lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f'Field {field} should be true or false!')
+
+    def build_user(self, row, role_ids, role_names, gender_ids, existing_emails, imported_emails,
+                   existing_parents_by_email, existing_parent_ids):
+        """
+        This method will validate one row and build its user (not saved)
+        :return: user, (parent_mother_email, parent_father_email) of the parents from the import
+        """
+        if not isinstance(row, dict):
+            raise ValueError(f'Wrong data!')
+        for field in ['first_name', 'last_name', 'address', 'city', 'birth_date']:
+            if not row.get(field):
+                raise ValueError(f'Field {field} is required!')
+        role_id = int(row['role_id']) if row.get('role_id') else role_ids.get(row.get('role'))
+        if role_names.get(role_id) not in roles:
+            raise ValueError(f"Role {row.get('role_id') or row.get('role')} doesn't exist!")
+        role = role_names[role_id]
+        gender_id = int(row['gender_id']) if row.get('gender_id') else gender_ids.get(row.get('gender'))
+        if gender_id not in gender_ids.values():
+            raise ValueError(f"Gender {row.get('gender_id') or row.get('gender')} doesn't exist!")
+        try:
+            birth_date = datetime.strptime(str(row['birth_date']), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f"Birth date {row['birth_date']} should be YYYY-MM-DD!")
+        is_active = self.get_bool(row, 'is_active')
+        user = User(
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            address=row['address'],
+            city=row['city'],
+            birth_date=birth_date,
+            is_active=is_active,
+            newsletter=self.get_bool(row, 'newsletter'),
+            gender_id=gender_id,
+            role_id=role_id
+        )
+        parent_emails = (None, None)
+        if role == 'Student':
+            user.salt = None
+            parent_emails = (
+                self.get_parent(user, row, 'parent_mother', imported_emails, existing_parents_by_email,
+                                existing_parent_ids, role_ids['Parent']),
+                self.get_parent(user, row, 'parent_father', imported_emails, existing_parents_by_email,
+                                existing_parent_ids, role_ids['Parent'])
+            )
+            if not user.parent_mother_id and not user.parent_father_id and not any(parent_emails):
+                raise ValueError(f'One of the parent fields is required!')
+        else:
+            if not row.get('email') or not row.get('phone'):
+                raise ValueError(f'Fields email and phone are required!')
+            email = row['email'].strip()
+            if email in existing_emails:
+                raise ValueError(f'User with {email} already exists!')
+            user.email = email
+            user.phone = row['phone']
+            user.admin_password = row.get('password')
+            if not user.password_strength():
+                raise ValueError(f'Password is not valid!')
+            user.salt = new_salt()
+            if not is_active:
+                user.activation_code = User.create_activation_code(10)
+                user.expired_activation_code = timezone.now() + timedelta(hours=2)
+        user.search_text = build_search_text(user)
+        return user, parent_emails
+
+    @staticmethod
+    def get_parent(user, row, field, imported_emails, existing_parents_by_email, existing_parent_ids, parent_role_id):
+        """
+        This method will link the parent of the student, a parent from the import is linked after it is inserted
+        :return: email of the parent from the import or None
+        """
+        email = (row.get(f'{field}_email') or '').strip()
+        if email:
+            if email in imported_emails:
+                parent_row = imported_emails[email][1]
+                if str(parent_row.get('role_id') or parent_row.get('role')) not in [str(parent_role_id), 'Parent']:
+                    raise ValueError(f'User with {email} is not a parent!')
+                return email
+            if email not in existing_parents_by_email:
+                raise ValueError(f"Parent with {email} doesn't exist!")
+            parent_id, role_id = existing_parents_by_email[email]
+            if role_id != parent_role_id:
+                raise ValueError(f'User with {email} is not a parent!')
+            setattr(user, f'{field}_id', parent_id)
+        elif row.get(field):
+            if int(row[field]) not in existing_parent_ids:
+                raise ValueError(f"Parent {row[field]} doesn't exist!")
+            setattr(user, f'{field}_id', int(row[field]))
+        return None
+
+    def run(self):
+        """
+        This method will validate and import the users, nothing is imported if any row is not valid
+        :return: number of imported users per role name, list of errors
+        """
+        if self.validate():
+            return {}, self.errors
+        passwords = hash_passwords(
+            passwords=[(user.salt, user.admin_password) for user in self.users if user.admin_password],
+            workers=self.workers
+        )
+        for user, password in zip([user for user in self.users if user.admin_password], passwords):
+            user.password = password
+            user.admin_password = None
+        created = timezone.now()
+        role_names = {role['id']: role['name'] for role in reference_data.get('roles')}
+        # The students are inserted after the other users, so their parents from the import already have ids
+        users = [user for user in self.users if user.email]
+        students = [
+            (user, parent_emails) for user, parent_emails in zip(self.users, self.parent_emails) if not user.email
+        ]
+        with transaction.atomic():
+            for user in self.users:
+                user.created = created
+            for first in range(0, len(users), self.chunk_size):
+                User.objects.bulk_create(users[first:first + self.chunk_size])
+            emails = [user.email for user in users]
+            user_ids = {}
+            for first in range(0, len(emails), self.chunk_size):
+                user_ids.update(dict(User.objects.filter(
+                    email__in=emails[first:first + self.chunk_size]
+                ).values_list('email', 'id')))
+            for student, (parent_mother_email, parent_father_email) in students:
+                if parent_mother_email:
+                    student.parent_mother_id = user_ids[parent_mother_email]
+                if parent_father_email:
+                    student.parent_father_id = user_ids[parent_father_email]
+            students = [student for student, parent_emails in students]
+            for first in range(0, len(students), self.chunk_size):
+                User.objects.bulk_create(students[first:first + self.chunk_size])
+            EmailOutbox.objects.bulk_create(
+                [EmailOutbox.new_email(**user.activation_code_email()) for user in users if user.activation_code],
+                batch_size=self.chunk_size
+            )
+            # The users are inserted without save(), so the signals don't bump the version of the users
+            ResourceVersion.bump(keys=['users'])
+        counts = {}
+        for user in self.users:
+            counts[role_names[user.role_id]] = counts.get(role_names[user.role_id], 0) + 1
+        return counts, []
@@ -114,6 +114,21 @@ class Validation:
             print(ex)
             return False
 
+    @classmethod
+    def school_class_members_validation(cls, data):
+        try:
+            data['action']
+            professor_ids = data.get('professor_ids') or []
+            student_ids = data.get('student_ids') or []
+            if not isinstance(professor_ids, list) or not isinstance(student_ids, list):
+                return False
+            if not professor_ids and not student_ids:
+                return False
+            return True
+        except Exception as ex:
+            print(ex)
+            return False
+
     @classmethod
     def activate_or_deactivate_school_class_member_validation(cls, data):
         try:
@@ -159,6 +174,18 @@ class Validation:
             print(ex)
             return False
 
+    @classmethod
+    def add_grades_validation(cls, data):
+        try:
+            data['school_subject_id']
+            data['school_class_id']
+            if not isinstance(data['grades'], list) or not data['grades']:
+                return False
+            return True
+        except Exception as ex:
+            print(ex)
+            return False
+
     @classmethod
     def add_absence_validation(cls, data):
         try:
@@ -173,6 +200,31 @@ class Validation:
             print(ex)
             return False
 
+    @classmethod
+    def add_absences_validation(cls, data):
+        try:
+            data['school_class_id']
+            data['school_subject_id']
+            if not isinstance(data['absences'], list) or not data['absences']:
+                return False
+            return True
+        except Exception as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def justify_absences_validation(cls, data):
+        try:
+            if not isinstance(data['is_justified'], bool):
+                return False
+            if not isinstance(data['absence_ids'], list) or not data['absence_ids']:
+                return False
+            [int(absence_id) for absence_id in data['absence_ids']]
+            return True
+        except Exception as ex:
+            print(ex)
+            return False
+
     @classmethod
     def edit_absence_validation(cls, data):
         try:
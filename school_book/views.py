@@ -1,11 +1,17 @@
 import json
 import django
 from rest_framework.decorators import api_view
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse
+)
 from .models import (
     User,
     SchoolSubject,
     Grade,
+    GradeSummary,
     Event,
     Absence,
     Role,
@@ -18,28 +24,77 @@ from .models import (
 from .helper import (
     ok_response,
     error_handler,
-    check_valid_limit_and_offset,
     authorization,
+    conditional_get
 )
 from .validators import Validation
+from .gradebook import Gradebook
+from .dashboard import ParentDashboard
+from .exports import SchoolYearExport
+from .user_import import (
+    UserImport,
+    read_users_csv
+)
+from .pagination import (
+    CursorPaginator,
+    ListCursorPaginator
+)
+from .flat_serializers import FlatSerializer
+from .query_metrics import (
+    query_budget,
+    query_metrics
+)
+from .token_cache import security_token_cache
 from .serializers import (
     UserSerializer,
     ParentSerializer,
-    SchoolSubjectSerializer,
     GradeSerializer,
+    GradeSummarySerializer,
     EventSerializer,
     AbsenceSerializer,
-    RoleSerializer,
-    GenderSerializer,
     SchoolClassSerializer,
     SchoolCLassProfessorsSerializer,
     SchoolCLassStudentsSerializer,
     SchoolClassSubjectsSerializer
 )
 
+PARENT_EVENTS_CACHE_TTL = getattr(settings, 'PARENT_EVENTS_CACHE_TTL', 300)
+
 
 @api_view(['GET'])
 @authorization
+def get_query_metrics(request):
+    """
+    This method will get the query metrics of this process (queries, database time and the slowest statements per URL
+    pattern and of the recent requests) and the statistics of the security token cache (for its sizing)
+    :param request:
+    :return: query metrics
+    """
+    principal = request.principal
+    if not principal.has_role('Administrator'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    metrics = query_metrics.snapshot()
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK',
+                'code': 200,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Query metrics',
+                'routes': metrics['routes'],
+                'recent': metrics['recent'],
+                'token_cache': security_token_cache.stats()
+            }
+        ),
+        content_type='application/json',
+        status=200
+    )
+
+
+@api_view(['GET'])
+@authorization
+@conditional_get('users', 'reference:roles', 'reference:genders')
+@query_budget(5)
 def get_user_by_id(request, user_id):
     """
     This method will get a user by user id
@@ -47,22 +102,18 @@ def get_user_by_id(request, user_id):
     :param user_id:
     :return: message, data
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
+    principal = request.principal
     try:
         int(user_id)
     except ValueError as ex:
         print(ex)
         return error_handler(error_status=404, message=f'Not found!')
-    user = User.get_user_by_id(user_id=user_id, requester=requester_user.role.name, parent_id=requester_user.id)
+    user = User.get_user_by_id(user_id=user_id, requester=principal.role, parent_id=principal.user_id)
     if not user:
         return error_handler(error_status=404, message=f'Not found!')
-    if decoded_security_token['role'] != 'Administrator':
-        if decoded_security_token['role'] == 'Professor' or decoded_security_token['role'] == 'Parent':
-            if requester_user.security_token() != security_token:
+    if not principal.has_role('Administrator'):
+        if principal.has_role('Professor', 'Parent'):
+            if not principal.is_token_current:
                 return error_handler(error_status=403, message='Forbidden permission!')
         else:
             return error_handler(error_status=403, message='Forbidden permission!')
@@ -70,8 +121,8 @@ def get_user_by_id(request, user_id):
     user = dict(user)
     user['role'] = dict(user['role'])
     user['gender'] = dict(user['gender'])
-    user['parent_mother'] = dict(user['parent_mother']) if dict(user['parent_mother']) else {}
-    user['parent_father'] = dict(user['parent_father']) if dict(user['parent_father']) else {}
+    user['parent_mother'] = dict(user['parent_mother']) if user['parent_mother'] else {}
+    user['parent_father'] = dict(user['parent_father']) if user['parent_father'] else {}
     return HttpResponse(
                 json.dumps(
                     {
@@ -89,6 +140,8 @@ def get_user_by_id(request, user_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('users', 'reference:roles', 'reference:genders')
+@query_budget(3)
 def get_users(request):
     """
     This method will get all the users, depends on the filters.
@@ -96,32 +149,30 @@ def get_users(request):
     :param query_string:
     :return: message, data
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    user = User.get_user_by_email(email=decoded_security_token['email'])
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    if decoded_security_token['role'] != 'Administrator':
-        if decoded_security_token['role'] == 'Professor':
-            if user.security_token() != security_token:
+    principal = request.principal
+    if not principal.has_role('Administrator'):
+        if principal.has_role('Professor'):
+            if not principal.is_token_current:
                 return error_handler(error_status=403, message='Forbidden permission!')
         else:
             return error_handler(error_status=403, message='Forbidden permission!')
     query_string = request.GET
-    users = User.get_all_users(data=query_string, requester=user.role.name)
-    users = UserSerializer(many=True, instance=users).data
-    users_json = []
+    users = User.get_all_users(data=query_string, requester=principal.role)
+    user_serializer = FlatSerializer.for_serializer(UserSerializer)
+    try:
+        ordering = ['-search_rank', 'id'] if 'search' in query_string else ['id']
+        page = CursorPaginator(queryset=user_serializer.prepare(users), ordering=ordering).paginate(
+            query_string,
+            count_cache_key=User.get_users_number_cache_key(users)
+        )
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    users_json = user_serializer.serialize(page.results)
     # if not users:
     #     return error_handler(error_status=404, message=f'Not found!')
-    users_number = User.count_all_users(data=query_string, requester=user.role.name)
-    for u in users:
-        u['users_number'] = users_number
-        u = dict(u)
-        u['role'] = dict(u['role'])
-        u['gender'] = dict(u['gender'])
-        u['parent_mother'] = dict(u['parent_mother']) if u['parent_mother'] else {}
-        u['parent_father'] = dict(u['parent_father']) if u['parent_father'] else {}
-        users_json.append(u)
+    for u in users_json:
+        u['parent_mother'] = u['parent_mother'] or {}
+        u['parent_father'] = u['parent_father'] or {}
     return HttpResponse(
                 json.dumps(
                     {
@@ -129,7 +180,10 @@ def get_users(request):
                         'code': 200,
                         'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                         'message': f'Users',
-                        'results': users_json
+                        'results': users_json,
+                        'next': page.next,
+                        'prev': page.prev,
+                        'total': page.total
                     }
                 ),
                 content_type='application/json',
@@ -146,8 +200,7 @@ def delete_user(request, user_id):
     :param user_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
+    principal = request.principal
     try:
         int(user_id)
     except ValueError as ex:
@@ -156,10 +209,10 @@ def delete_user(request, user_id):
     user = User.objects.filter(id=user_id).first()
     if not user:
         return error_handler(error_status=404, message=f'Not found!')
-    if decoded_security_token['role'] != 'Administrator':
-        if user.security_token() != security_token:
+    if not principal.has_role('Administrator'):
+        if not principal.is_token_of(user):
             return error_handler(error_status=403, message='Forbidden permission!')
-    user.delete()
+    user.delete_user()
     return HttpResponse(
                 json.dumps(
                     {
@@ -185,11 +238,7 @@ def activate_or_deactivate_user(request, user_id):
     :body_param is_active:
     :return:
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
+    principal = request.principal
     body = request.data
     if 'is_active' not in body:
         return error_handler(error_status=400, message=f'Wrong data!')
@@ -201,8 +250,8 @@ def activate_or_deactivate_user(request, user_id):
     user = User.objects.filter(id=user_id).first()
     if not user:
         return error_handler(error_status=404, message=f'Not found!')
-    if decoded_security_token['role'] != 'Administrator':
-        if user.security_token() != security_token:
+    if not principal.has_role('Administrator'):
+        if not principal.is_token_of(user):
             return error_handler(error_status=403, message='Forbidden permission!')
     if body['is_active']:
         if user.activate_user():
@@ -318,28 +367,21 @@ def login_user(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('users', 'reference:roles', 'reference:genders')
+@query_budget(1)
 def get_children_by_parent_id(request):
     """
     This method will get all children by parent_id
     :param request:
     :return: list of children
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Parent':
+    principal = request.principal
+    if not principal.has_role('Parent'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    children = user.get_children_by_parent_id()
-    children = UserSerializer(many=True, instance=children).data
-    for child in children:
-        child = dict(child)
-        child['role'] = dict(child['role'])
-        child['gender'] = dict(child['gender'])
+    user_serializer = FlatSerializer.for_serializer(UserSerializer)
+    children = user_serializer.serialize(
+        user_serializer.prepare(User.get_children_by_parent_id(parent_id=principal.user_id))
+    )
     return HttpResponse(
         json.dumps(
             {
@@ -357,32 +399,55 @@ def get_children_by_parent_id(request):
 
 @api_view(['GET'])
 @authorization
+@query_budget(6)
+def get_parent_dashboard(request):
+    """
+    This method will get the parent dashboard, all the children with their current school classes, the grade
+    summaries and the absences per school subject, and the upcoming events
+    :param request:
+    :return: list of children, list of events
+    """
+    principal = request.principal
+    if not principal.has_role('Parent'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    children, events = ParentDashboard(parent_id=principal.user_id).load().results()
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK',
+                'code': 200,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Parent dashboard',
+                'results': children,
+                'events': events
+            }
+        ),
+        content_type='application/json',
+        status=200
+    )
+
+
+@api_view(['GET'])
+@authorization
+@conditional_get('reference:school_subjects')
+@query_budget(1)
 def get_all_school_subjects(request):
     """
     This method will get all school subjects
     :param request:
     :return: list of school subjects
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Parent', 'Professor', 'Administrator']:
+    principal = request.principal
+    if not principal.has_role('Parent', 'Professor', 'Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     query_string = request.GET
-    limit = query_string['limit'] if 'limit' in query_string else None
-    offset = query_string['offset'] if 'offset' in query_string else None
-    limit, offset = check_valid_limit_and_offset(limit=limit, offset=offset)
-    school_subjects = SchoolSubject.get_all_school_subjects(limit=limit, offset=offset)
-    school_subjects = SchoolSubjectSerializer(many=True, instance=school_subjects).data
-    school_subjects_number = SchoolSubject.count_school_subject()
+    try:
+        page = ListCursorPaginator(rows=SchoolSubject.get_all_school_subjects(), ordering=['id']).paginate(query_string)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    school_subjects = [dict(school_subject) for school_subject in page.results]
     for school_subject in school_subjects:
-        school_subject['school_subjects_number'] = school_subjects_number
-        school_subject = dict(school_subject)
+        school_subject['school_subjects_number'] = page.total
     return HttpResponse(
         json.dumps(
             {
@@ -390,7 +455,10 @@ def get_all_school_subjects(request):
                 'code': 200,
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                 'message': f'School subjects',
-                'results': school_subjects
+                'results': school_subjects,
+                'next': page.next,
+                'prev': page.prev,
+                'total': page.total
             }
         ),
         content_type='application/json',
@@ -410,13 +478,9 @@ def add_school_subject(request):
     body = request.data
     if not Validation.add_school_subject_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not SchoolSubject.add_new_school_subject(data=body):
         return error_handler(error_status=403, message='School subject is not added!')
     return HttpResponse(
@@ -446,13 +510,9 @@ def edit_school_subject(request, school_subject_id):
     body = request.data
     if not Validation.edit_school_subject_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_subject = SchoolSubject.get_school_subject_by_id(school_subject_id=school_subject_id)
     if not school_subject:
         return error_handler(error_status=404, message=f'Not found!')
@@ -481,13 +541,9 @@ def delete_school_subject(request, school_subject_id):
     :param school_subject_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_subject = SchoolSubject.get_school_subject_by_id(school_subject_id=school_subject_id)
     if not school_subject:
         return error_handler(error_status=404, message=f"School subject doesn't exist!")
@@ -508,32 +564,25 @@ def delete_school_subject(request, school_subject_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('school_classes')
+@query_budget(3)
 def get_all_school_classes(request):
     """
     This method will get all school classes
     :param request:
     :return: list of school classes
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     query_string = request.GET
-    limit = query_string['limit'] if 'limit' in query_string else None
-    offset = query_string['offset'] if 'offset' in query_string else None
-    limit, offset = check_valid_limit_and_offset(limit=limit, offset=offset)
-    school_classes = SchoolClass.get_all_school_classes(limit=limit, offset=offset)
-    school_classes = SchoolClassSerializer(many=True, instance=school_classes).data
-    school_classes_number = SchoolClass.count_school_classes()
+    try:
+        page = CursorPaginator(queryset=SchoolClass.get_all_school_classes(), ordering=['-id']).paginate(query_string)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    school_classes = FlatSerializer.for_serializer(SchoolClassSerializer).serialize(page.results)
     for school_class in school_classes:
-        school_class['school_classes_number'] = school_classes_number
-        school_class = dict(school_class)
+        school_class['school_classes_number'] = page.total
     return HttpResponse(
         json.dumps(
             {
@@ -542,6 +591,9 @@ def get_all_school_classes(request):
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                 'message': f'School classes',
                 'results': school_classes,
+                'next': page.next,
+                'prev': page.prev,
+                'total': page.total,
             }
         ),
         content_type='application/json',
@@ -551,24 +603,19 @@ def get_all_school_classes(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('professor:{principal.user_id}', 'school_classes')
+@query_budget(3)
 def get_all_school_classes_by_professor_id(request):
     """
     This method will get all school classes by professor
     :param request:
     :return: list of school classes
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Administrator', 'Professor']:
+    principal = request.principal
+    if not principal.has_role('Administrator', 'Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_classes = SchoolClassProfessor.get_all_school_classes_by_professor_id(
-        professor_id=decoded_security_token['user_id']
+        professor_id=principal.user_id
     )
     school_classes = SchoolClassSerializer(many=True, instance=school_classes).data
     school_classes_number = len(school_classes)
@@ -592,6 +639,8 @@ def get_all_school_classes_by_professor_id(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('student:{student_id}', 'school_classes')
+@query_budget(3)
 def get_all_school_classes_by_student_id(request, student_id):
     """
     This method will get all school classes by student id
@@ -599,16 +648,9 @@ def get_all_school_classes_by_student_id(request, student_id):
     :param student_id:
     :return: list of school classes
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Administrator', 'Parent']:
+    principal = request.principal
+    if not principal.has_role('Administrator', 'Parent'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_classes = SchoolClassStudent.get_school_classes_by_student_id(student_id=student_id)
     school_classes = SchoolClassSerializer(many=True, instance=school_classes).data
     school_classes_number = SchoolClass.count_school_classes()
@@ -632,6 +674,15 @@ def get_all_school_classes_by_student_id(request, student_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'student:{user_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(5)
 def get_all_student_grades(request, school_class_id, user_id, school_subject_id):
     """
     This method will get all student grades
@@ -641,40 +692,76 @@ def get_all_student_grades(request, school_class_id, user_id, school_subject_id)
     :param school_subject_id:
     :return: list of grades
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Parent', 'Professor', 'Administrator']:
+    principal = request.principal
+    if not principal.has_role('Parent', 'Professor', 'Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     grades = Grade.get_all_grades_by_student_id_and_school_class_id_or_school_subject(
         student_id=user_id,
         school_subject_id=school_subject_id,
         school_class_id=school_class_id
     )
-    grades = GradeSerializer(many=True, instance=grades).data
-    for grade in grades:
-        grade = dict(grade)
-        grade['professor'] = dict(grade['professor'])
-        grade['professor']['role'] = dict(grade['professor']['role'])
-        grade['professor']['gender'] = dict(grade['professor']['gender'])
-        grade['student'] = dict(grade['student'])
-        grade['student']['role'] = dict(grade['student']['role'])
-        grade['student']['gender'] = dict(grade['student']['gender'])
-        grade['school_subject'] = dict(grade['school_subject'])
-        grade['school_class'] = dict(grade['school_class'])
+    grade_serializer = FlatSerializer.for_serializer(GradeSerializer)
+    sideload = request.GET.get('include') == 'sideload'
+    try:
+        page = CursorPaginator(
+            queryset=grades if sideload else grade_serializer.prepare(grades),
+            ordering=['id']
+        ).paginate(request.GET)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    if sideload:
+        grades, included = grade_serializer.serialize_sideloaded(page.results)
+    else:
+        grades, included = grade_serializer.serialize(page.results), None
+    data = {
+        'status': f'OK',
+        'code': 200,
+        'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        'message': f'Grades',
+        'results': grades,
+        'next': page.next,
+        'prev': page.prev,
+        'total': page.total,
+    }
+    if sideload:
+        data['included'] = included
+    return HttpResponse(
+        json.dumps(data),
+        content_type='application/json',
+        status=200
+    )
+
+
+@api_view(['GET'])
+@authorization
+@conditional_get('school_class:{school_class_id}', 'reference:school_subjects')
+@query_budget(2)
+def get_grade_summaries(request, school_class_id, user_id=0):
+    """
+    This method will get the grade summaries (number, average, min, max and last date of the grades) per student and
+    school subject of the school class, the summaries are read without reading the grades
+    :param request:
+    :param school_class_id:
+    :param user_id: 0 for all the students of the school class
+    :return: list of grade summaries
+    """
+    principal = request.principal
+    roles = ['Parent', 'Professor', 'Administrator'] if user_id > 0 else ['Professor', 'Administrator']
+    if not principal.has_role(*roles):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    summary_serializer = FlatSerializer.for_serializer(GradeSummarySerializer)
+    summaries = GradeSummary.get_grade_summaries(school_class_id=school_class_id, student_id=user_id)
+    summaries = summary_serializer.serialize(summary_serializer.prepare(summaries))
+    for summary in summaries:
+        summary['grades_average'] = round(summary['grades_average'], 2)
     return HttpResponse(
         json.dumps(
             {
                 'status': f'OK',
                 'code': 200,
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                'message': f'Grades',
-                'results': grades,
+                'message': f'Grade summaries',
+                'results': summaries
             }
         ),
         content_type='application/json',
@@ -684,41 +771,59 @@ def get_all_student_grades(request, school_class_id, user_id, school_subject_id)
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'parent:{principal.user_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(3)
 def get_all_events_by_parent_id(request):
     """
     This method will get all the events by parent_id
     :param request:
     :return: list of events
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Parent', 'Professor', 'Administrator']:
+    principal = request.principal
+    if not principal.has_role('Parent', 'Professor', 'Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    events = Event.get_all_events_by_parent_id(parent_id=user.id)
-    events = EventSerializer(many=True, instance=events).data
-    for event in events:
-        event = dict(event)
-        event['professor'] = dict(event['professor'])
-        event['professor']['role'] = dict(event['professor']['role'])
-        event['professor']['gender'] = dict(event['professor']['gender'])
-        event['school_subject'] = dict(event['school_subject'])
-        event['school_class'] = dict(event['school_class'])
+    cache_key = Event.get_parent_events_cache_key(parent_id=principal.user_id, query_string=request.GET)
+    feed = cache.get(cache_key)
+    if feed is None:
+        events = Event.get_all_events_by_parent_id(parent_id=principal.user_id)
+        event_serializer = FlatSerializer.for_serializer(EventSerializer)
+        sideload = request.GET.get('include') == 'sideload'
+        try:
+            page = CursorPaginator(
+                queryset=events if sideload else event_serializer.prepare(events),
+                ordering=['-id']
+            ).paginate(request.GET)
+        except ValueError as ex:
+            return error_handler(error_status=400, message=f'{ex}')
+        if sideload:
+            events, included = event_serializer.serialize_sideloaded(page.results)
+        else:
+            events, included = event_serializer.serialize(page.results), None
+        feed = {
+            'results': events,
+            'next': page.next,
+            'prev': page.prev,
+            'total': page.total,
+        }
+        if sideload:
+            feed['included'] = included
+        cache.set(cache_key, feed, PARENT_EVENTS_CACHE_TTL)
+    data = {
+        'status': f'OK',
+        'code': 200,
+        'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        'message': f'Events',
+    }
+    data.update(feed)
     return HttpResponse(
-        json.dumps(
-            {
-                'status': f'OK',
-                'code': 200,
-                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                'message': f'Events',
-                'results': events,
-            }
-        ),
+        json.dumps(data),
         content_type='application/json',
         status=200
     )
@@ -726,6 +831,15 @@ def get_all_events_by_parent_id(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'student:{user_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(5)
 def get_all_student_absences(request, school_class_id, user_id, school_subject_id, is_justified):
     """
     This method will get all the student absences
@@ -736,50 +850,42 @@ def get_all_student_absences(request, school_class_id, user_id, school_subject_i
     :param is_justified:
     :return: list of absences
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Parent', 'Professor', 'Administrator']:
+    principal = request.principal
+    if not principal.has_role('Parent', 'Professor', 'Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     absences = Absence.get_all_absences(
         school_class_id=school_class_id,
         student_id=user_id,
         school_subject_id=school_subject_id,
         is_justified=is_justified
     )
-    justified_absences, unjustified_absences = Absence.count_all_absences_by_justified(
-        school_class_id=school_class_id,
-        student_id=user_id,
-        school_subject_id=school_subject_id
-    )
-    absences = AbsenceSerializer(many=True, instance=absences).data
-    for absence in absences:
-        absence = dict(absence)
-        absence['justified_absences'] = justified_absences
-        absence['unjustified_absences'] = unjustified_absences
-        absence['professor'] = dict(absence['professor'])
-        absence['professor']['role'] = dict(absence['professor']['role'])
-        absence['professor']['gender'] = dict(absence['professor']['gender'])
-        absence['student'] = dict(absence['student'])
-        absence['student']['role'] = dict(absence['student']['role'])
-        absence['student']['gender'] = dict(absence['student']['gender'])
-        absence['school_subject'] = dict(absence['school_subject'])
-        absence['school_class'] = dict(absence['school_class'])
+    absence_serializer = FlatSerializer.for_serializer(AbsenceSerializer)
+    sideload = request.GET.get('include') == 'sideload'
+    try:
+        page = CursorPaginator(
+            queryset=absences if sideload else absence_serializer.prepare(absences),
+            ordering=['-id']
+        ).paginate(request.GET)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    if sideload:
+        absences, included = absence_serializer.serialize_sideloaded(page.results)
+    else:
+        absences, included = absence_serializer.serialize(page.results), None
+    data = {
+        'status': f'OK',
+        'code': 200,
+        'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        'message': f'Absences',
+        'results': absences,
+        'next': page.next,
+        'prev': page.prev,
+        'total': page.total,
+    }
+    if sideload:
+        data['included'] = included
     return HttpResponse(
-        json.dumps(
-            {
-                'status': f'OK',
-                'code': 200,
-                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                'message': f'Absences',
-                'results': absences,
-            }
-        ),
+        json.dumps(data),
         content_type='application/json',
         status=200
     )
@@ -787,6 +893,15 @@ def get_all_student_absences(request, school_class_id, user_id, school_subject_i
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'student:{user_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(1)
 def get_all_student_absences_number(request, school_class_id, user_id, school_subject_id):
     """
     This method will count all the student absences
@@ -796,16 +911,9 @@ def get_all_student_absences_number(request, school_class_id, user_id, school_su
     :param school_subject_id:
     :return: number of justified and unjustified absences
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Parent', 'Professor', 'Administrator']:
+    principal = request.principal
+    if not principal.has_role('Parent', 'Professor', 'Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     justified_absences, unjustified_absences = Absence.count_all_absences_by_justified(
         school_class_id=school_class_id,
         student_id=user_id,
@@ -832,29 +940,63 @@ def get_all_student_absences_number(request, school_class_id, user_id, school_su
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'school_class:{school_class_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(1)
+def get_school_class_absences_number(request, school_class_id):
+    """
+    This method will count the justified and the unjustified absences of every student and school subject of the
+    school class
+    :param request:
+    :param school_class_id:
+    :return: list of absence numbers, the missing student and school subject pairs have no absences
+    """
+    principal = request.principal
+    if not principal.has_role('Professor', 'Administrator'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    absences = Absence.count_all_absences_by_school_class_id(school_class_id=school_class_id)
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK',
+                'code': 200,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Absences',
+                'results': absences
+            }
+        ),
+        content_type='application/json',
+        status=200
+    )
+
+
+@api_view(['GET'])
+@authorization
+@conditional_get('reference:roles')
+@query_budget(1)
 def get_all_roles(request):
     """
     This method will get all the roles
     :param request:
     :return: list of roles
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     query_string = request.GET
-    limit = query_string['limit'] if 'limit' in query_string else None
-    offset = query_string['offset'] if 'offset' in query_string else None
-    limit, offset = check_valid_limit_and_offset(limit=limit, offset=offset)
-    roles = Role.get_all_roles(limit=limit, offset=offset)
-    roles = RoleSerializer(many=True, instance=roles).data
-    roles_number = Role.count_roles()
+    try:
+        page = ListCursorPaginator(rows=Role.get_all_roles(), ordering=['id']).paginate(query_string)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    roles = [dict(role) for role in page.results]
     for role in roles:
-        role['roles_number'] = roles_number
-        role = dict(role)
+        role['roles_number'] = page.total
     return HttpResponse(
         json.dumps(
             {
@@ -862,7 +1004,10 @@ def get_all_roles(request):
                 'code': 200,
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                 'message': f'Roles',
-                'results': roles
+                'results': roles,
+                'next': page.next,
+                'prev': page.prev,
+                'total': page.total
             }
         ),
         content_type='application/json',
@@ -882,13 +1027,9 @@ def add_new_role(request):
     body = request.data
     if 'roleName' not in body:
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not Role.add_new_role(role_name=body['roleName']):
         return error_handler(error_status=403, message=f'Role is not added!')
     return HttpResponse(
@@ -915,13 +1056,9 @@ def delete_role(request, role_id):
     :param_body: roleName
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     role = Role.get_role_by_id(role_id=role_id)
     if not role:
         return error_handler(error_status=404, message=f"Role doesn't exist!")
@@ -942,23 +1079,18 @@ def delete_role(request, role_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('reference:genders')
+@query_budget(1)
 def get_all_genders(request):
     """
     This method will get all the genders
     :param request:
     :return: list of roles
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     genders = Gender.get_all_genders()
-    genders = GenderSerializer(many=True, instance=genders).data
-    for gender in genders:
-        gender = dict(gender)
     return HttpResponse(
         json.dumps(
             {
@@ -987,13 +1119,9 @@ def add_new_user(request):
     body = request.data
     if not Validation.add_user_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not User.add_new_user(data=body):
         return error_handler(error_status=403, message=f'User is not added!')
     return HttpResponse(
@@ -1010,6 +1138,49 @@ def add_new_user(request):
     )
 
 
+@api_view(['POST'])
+@authorization
+def import_users(request):
+    """
+    This method will import many users at once, all the rows are validated first and nothing is imported if any row
+    is not valid
+    :param request:
+    :param_body: users (list of the add_new_user fields, the role and the gender can be given by name and the parents by
+    parent_mother_email, parent_father_email) or file (CSV with the same fields in the header)
+    :return: message, number of imported users per role, errors
+    """
+    principal = request.principal
+    if not principal.has_role('Administrator'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    body = request.data
+    try:
+        if 'file' in request.FILES:
+            rows = read_users_csv(request.FILES['file'].read().decode('utf-8-sig'))
+        else:
+            rows = body['users']
+    except (KeyError, TypeError, UnicodeDecodeError) as ex:
+        print(ex)
+        return error_handler(error_status=400, message=f'Wrong data!')
+    if not isinstance(rows, list) or not rows:
+        return error_handler(error_status=400, message=f'Wrong data!')
+    users_number, errors = UserImport(rows=rows).run()
+    status = 400 if errors else 201
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'ERROR' if errors else f'OK',
+                'code': status,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Users are not imported!' if errors else f'Users are successfully imported!',
+                'users_number': users_number,
+                'errors': errors
+            }
+        ),
+        content_type='application/json',
+        status=status
+    )
+
+
 @api_view(['PUT'])
 @authorization
 def edit_user(request, user_id):
@@ -1024,14 +1195,10 @@ def edit_user(request, user_id):
     body = request.data
     if not Validation.edit_user_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.get_user_by_id(user_id=user_id, requester=requester_user.role.name)
+    user = User.get_user_by_id(user_id=user_id, requester=principal.role)
     if not user:
         return error_handler(error_status=404, message=f'Not found!')
     if not user.edit_user(data=body):
@@ -1063,14 +1230,10 @@ def change_user_password(request, user_id):
     body = request.data
     if not Validation.admin_change_user_password_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.get_user_by_id(user_id=user_id, requester=requester_user.role.name)
+    user = User.get_user_by_id(user_id=user_id, requester=principal.role)
     if not user:
         return error_handler(error_status=404, message=f'Not found!')
     if not user.change_password(password=body['password']):
@@ -1102,13 +1265,9 @@ def edit_role(request, role_id):
     body = request.data
     if not Validation.edit_role_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     role = Role.get_role_by_id(role_id=role_id)
     if not role:
         return error_handler(error_status=404, message=f'Not found!')
@@ -1130,6 +1289,8 @@ def edit_role(request, role_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get('school_class:{school_class_id}', 'users', 'reference:roles', 'reference:genders')
+@query_budget(4)
 def get_school_class_members(request, school_class_id):
     """
     This method will get all the users by class_id, the users are part of some class.
@@ -1137,48 +1298,30 @@ def get_school_class_members(request, school_class_id):
     :param school_class_id:
     :return: message, data
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    user = User.get_user_by_email(email=decoded_security_token['email'])
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    if decoded_security_token['role'] not in ['Administrator', 'Professor']:
-        if decoded_security_token['role'] == 'Professor':
-            if user.security_token() != security_token:
-                return error_handler(error_status=403, message='Forbidden permission!')
-        else:
-            return error_handler(error_status=403, message='Forbidden permission!')
+    principal = request.principal
+    if not principal.has_role('Administrator', 'Professor'):
+        return error_handler(error_status=403, message='Forbidden permission!')
     query_string = request.GET
-    limit = query_string['limit'] if 'limit' in query_string else None
-    offset = query_string['offset'] if 'offset' in query_string else None
-    limit, offset = check_valid_limit_and_offset(limit=limit, offset=offset)
-    professors, students = SchoolClass.get_members_by_school_class_id(
-        school_class_id=school_class_id,
-        limit=limit,
-        offset=offset
-    )
-    professors = SchoolCLassProfessorsSerializer(many=True, instance=professors).data
-    students = SchoolCLassStudentsSerializer(many=True, instance=students).data
-    users_number = SchoolClass.count_members_by_school_class_id(school_class_id=school_class_id)
+    professors, students = SchoolClass.get_members_by_school_class_id(school_class_id=school_class_id)
+    professor_serializer = FlatSerializer.for_serializer(SchoolCLassProfessorsSerializer)
+    student_serializer = FlatSerializer.for_serializer(SchoolCLassStudentsSerializer)
+    try:
+        page = CursorPaginator(
+            queryset=[professor_serializer.prepare(professors), student_serializer.prepare(students)],
+            ordering=['id']
+        ).paginate(query_string)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
     users_json = []
-    for p in professors:
-        p['users_number'] = users_number
-        p = dict(p)
-        p['professor'] = dict(p['professor'])
-        p['professor']['role'] = dict(p['professor']['role'])
-        p['professor']['gender'] = dict(p['professor']['gender'])
-        p['professor']['parent_mother'] = dict(p['professor']['parent_mother']) if p['professor']['parent_mother'] else {}
-        p['professor']['parent_father'] = dict(p['professor']['parent_father']) if p['professor']['parent_father'] else {}
-        users_json.append(p)
-    for s in students:
-        s['users_number'] = users_number
-        s = dict(s)
-        s['student'] = dict(s['student'])
-        s['student']['role'] = dict(s['student']['role'])
-        s['student']['gender'] = dict(s['student']['gender'])
-        s['student']['parent_mother'] = dict(s['student']['parent_mother']) if s['student']['parent_mother'] else {}
-        s['student']['parent_father'] = dict(s['student']['parent_father']) if s['student']['parent_father'] else {}
-        users_json.append(s)
+    for member in page.results:
+        if isinstance(member, SchoolClassProfessor):
+            member, user = professor_serializer.serialize([member])[0], 'professor'
+        else:
+            member, user = student_serializer.serialize([member])[0], 'student'
+        member['users_number'] = page.total
+        member[user]['parent_mother'] = member[user]['parent_mother'] or {}
+        member[user]['parent_father'] = member[user]['parent_father'] or {}
+        users_json.append(member)
     return HttpResponse(
         json.dumps(
             {
@@ -1186,7 +1329,10 @@ def get_school_class_members(request, school_class_id):
                 'code': 200,
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                 'message': f'Users',
-                'results': users_json
+                'results': users_json,
+                'next': page.next,
+                'prev': page.prev,
+                'total': page.total
             }
         ),
         content_type='application/json',
@@ -1203,13 +1349,9 @@ def delete_school_class(request, school_class_id):
     :param school_class_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_class = SchoolClass.get_school_class_by_id(school_class_id=school_class_id)
     if not school_class:
         return error_handler(error_status=404, message=f"School class doesn't exist!")
@@ -1240,13 +1382,9 @@ def add_school_class(request):
     body = request.data
     if not Validation.add_school_class_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not SchoolClass.add_new_school_class(data=body):
         return error_handler(error_status=403, message='School class is not added!')
     return HttpResponse(
@@ -1276,13 +1414,9 @@ def edit_school_class(request, school_class_id):
     body = request.data
     if not Validation.edit_school_class_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not SchoolClass.edit_new_school_class(data=body, school_class_id=school_class_id):
         return error_handler(error_status=403, message='School class is not edited!')
     return HttpResponse(
@@ -1311,13 +1445,9 @@ def add_school_class_member(request):
     body = request.data
     if not Validation.add_member_to_school_class_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if body['role_name'] not in ['professor', 'student']:
         return error_handler(error_status=400, message=f'Wrong data!')
     if body['role_name'] == 'professor':
@@ -1353,13 +1483,9 @@ def activate_or_deactivate_school_class_member(request, member_id):
     body = request.data
     if not Validation.activate_or_deactivate_school_class_member_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if body['role_name'] not in ['Professor', 'Student']:
         return error_handler(error_status=400, message=f'Wrong data!')
     if body['role_name'] == 'Professor':
@@ -1383,6 +1509,51 @@ def activate_or_deactivate_school_class_member(request, member_id):
     )
 
 
+@api_view(['POST'])
+@authorization
+def update_school_class_members(request, school_class_id):
+    """
+    This method will enroll, activate, deactivate or remove many professors and students of the school class at once
+    (e.g. at the start of the school year)
+    :param request:
+    :param school_class_id:
+    :param_body: action (enroll, activate, deactivate or remove), professor_ids, student_ids, is_active (enroll only)
+    :return: message, number of changed members, errors
+    """
+    body = request.data
+    if not Validation.school_class_members_validation(data=body):
+        return error_handler(error_status=400, message=f'Wrong data!')
+    principal = request.principal
+    if not principal.has_role('Administrator'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    try:
+        members_number, errors = SchoolClass.update_members(
+            school_class_id=school_class_id,
+            action=body['action'],
+            professor_ids=body.get('professor_ids'),
+            student_ids=body.get('student_ids'),
+            is_active=body.get('is_active', False)
+        )
+    except ValueError as ex:
+        print(ex)
+        return error_handler(error_status=403, message=f'Members are not changed! {ex}')
+    status = (201 if body['action'] == 'enroll' else 200) if members_number else 400
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK' if members_number else f'ERROR',
+                'code': status,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Members are successfully changed!' if members_number else f'Members are not changed!',
+                'members_number': members_number,
+                'errors': errors
+            }
+        ),
+        content_type='application/json',
+        status=status
+    )
+
+
 @api_view(['DELETE'])
 @authorization
 def delete_school_class_member(request, role_name, member_id):
@@ -1393,13 +1564,9 @@ def delete_school_class_member(request, role_name, member_id):
     :param member_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if role_name not in ['Professor', 'Student']:
         return error_handler(error_status=400, message=f'Wrong data!')
     if role_name == 'Professor':
@@ -1425,6 +1592,15 @@ def delete_school_class_member(request, role_name, member_id):
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'school_class:{school_class_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(3)
 def get_school_class_subjects(request, school_class_id):
     """
     This method will get all school class subjects
@@ -1432,32 +1608,24 @@ def get_school_class_subjects(request, school_class_id):
     :param school_class_id:
     :return: list of school class subjects
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Administrator', 'Professor', 'Parent']:
+    principal = request.principal
+    if not principal.has_role('Administrator', 'Professor', 'Parent'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
     query_string = request.GET
-    limit = query_string['limit'] if 'limit' in query_string else None
-    offset = query_string['offset'] if 'offset' in query_string else None
-    limit, offset = check_valid_limit_and_offset(limit=limit, offset=offset)
     school_class_subjects = ClassRoomSchoolSubject.get_all_school_subjects_by_school_class_id(
-        school_class_id=school_class_id,
-        limit=limit,
-        offset=offset
-    )
-    school_class_subjects_number = ClassRoomSchoolSubject.count_all_school_subjects_by_school_class_id(
         school_class_id=school_class_id
     )
-    school_class_subjects = SchoolClassSubjectsSerializer(many=True, instance=school_class_subjects).data
+    school_class_subject_serializer = FlatSerializer.for_serializer(SchoolClassSubjectsSerializer)
+    try:
+        page = CursorPaginator(
+            queryset=school_class_subject_serializer.prepare(school_class_subjects),
+            ordering=['id']
+        ).paginate(query_string)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    school_class_subjects = school_class_subject_serializer.serialize(page.results)
     for school_class_subject in school_class_subjects:
-        school_class_subject['school_class_subjects_number'] = school_class_subjects_number
-        school_class_subject = dict(school_class_subject)
+        school_class_subject['school_class_subjects_number'] = page.total
     return HttpResponse(
         json.dumps(
             {
@@ -1466,6 +1634,9 @@ def get_school_class_subjects(request, school_class_id):
                 'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
                 'message': f'School classe subjects',
                 'results': school_class_subjects,
+                'next': page.next,
+                'prev': page.prev,
+                'total': page.total,
             }
         ),
         content_type='application/json',
@@ -1482,13 +1653,9 @@ def delete_school_class_subject(request, school_class_subject_id):
     :param school_class_subject_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_class_subject = ClassRoomSchoolSubject.get_school_school_subject_by_id(
         school_subject_id=school_class_subject_id
     )
@@ -1522,13 +1689,9 @@ def activate_or_deactivate_school_class_subject(request, school_class_subject_id
     body = request.data
     if not Validation.activate_or_deactivate_school_class_subject_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     school_class_subject = ClassRoomSchoolSubject.get_school_school_subject_by_id(
         school_subject_id=school_class_subject_id
     )
@@ -1561,13 +1724,9 @@ def add_school_class_subject(request):
     body = request.data
     if not Validation.add_school_subject_to_school_class_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Administrator':
+    principal = request.principal
+    if not principal.has_role('Administrator'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     if not ClassRoomSchoolSubject.add_new_school_subject(data=body):
         return error_handler(error_status=403, message='Member is not added to this school class!')
     return HttpResponse(
@@ -1586,6 +1745,15 @@ def add_school_class_subject(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'school_class:{class_room_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(3)
 def get_all_school_room_information(request, class_room_id):
     """
     This method will get all school room information (students, grades, absences etc.)
@@ -1593,33 +1761,10 @@ def get_all_school_room_information(request, class_room_id):
     :param class_room_id:
     :return: list of all school room information
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] not in ['Administrator', 'Professor']:
+    principal = request.principal
+    if not principal.has_role('Administrator', 'Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    school_class_students = SchoolClassStudent.get_all_students_by_class_room_id(class_room_id=class_room_id)
-    school_class_students = UserSerializer(many=True, instance=school_class_students, context={'request': request}).data
-    class_room_subjects = ClassRoomSchoolSubject.get_all_school_subjects_by_school_class_id(class_room_id, 0, 0)
-    for student in school_class_students:
-        subject_list = []
-        for subject in class_room_subjects:
-            grades = Grade.get_all_grades_by_student_id_and_school_class_id_or_school_subject(
-                student_id=student['id'],
-                school_subject_id=subject.school_subject.id,
-                school_class_id=class_room_id
-            )
-            temp = {}
-            temp['school_subject'] = SchoolClassSubjectsSerializer(many=False, instance=subject).data
-            temp['school_subject']['grades'] = [grade.grade for grade in grades]
-            temp['school_subject']['grades_info'] = GradeSerializer(many=True, instance=grades).data
-            subject_list.append(temp)
-        student['school_subjects'] = subject_list
+    school_class_students = Gradebook(school_class_id=class_room_id).load().results()
     return HttpResponse(
         json.dumps(
             {
@@ -1647,14 +1792,10 @@ def add_new_grade(request):
     body = request.data
     if not Validation.add_grade_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    if not Grade.add_new_grade(data=body, professor_id=requester_user.id):
+    if not Grade.add_new_grade(data=body, professor_id=principal.user_id):
         return error_handler(error_status=403, message='Grade is not added!')
     return HttpResponse(
         json.dumps(
@@ -1670,6 +1811,43 @@ def add_new_grade(request):
     )
 
 
+@api_view(['POST'])
+@authorization
+def add_new_grades(request):
+    """
+    This method will add the grades of many students at once (e.g. after an exam)
+    :param request:
+    :param_body: school_class_id, school_subject_id, grades (list of student_id, grade, grade_type, comment)
+    :return: message, number of added grades, errors
+    """
+    body = request.data
+    if not Validation.add_grades_validation(data=body):
+        return error_handler(error_status=400, message=f'Wrong data!')
+    principal = request.principal
+    if not principal.has_role('Professor'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    try:
+        grades_number, errors = Grade.add_new_grades(data=body, professor_id=principal.user_id)
+    except ValueError as ex:
+        print(ex)
+        return error_handler(error_status=403, message=f'Grades are not added! {ex}')
+    status = 201 if grades_number else 400
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK' if grades_number else f'ERROR',
+                'code': status,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Grades are successfully added!' if grades_number else f'Grades are not added!',
+                'grades_number': grades_number,
+                'errors': errors
+            }
+        ),
+        content_type='application/json',
+        status=status
+    )
+
+
 @api_view(['POST'])
 @authorization
 def add_absence(request):
@@ -1682,14 +1860,10 @@ def add_absence(request):
     body = request.data
     if not Validation.add_absence_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    if not Absence.add_new_absence(data=body, requester_id=requester_user.id):
+    if not Absence.add_new_absence(data=body, requester_id=principal.user_id):
         return error_handler(error_status=403, message='Absence is not added!')
     return HttpResponse(
         json.dumps(
@@ -1705,6 +1879,74 @@ def add_absence(request):
     )
 
 
+@api_view(['POST'])
+@authorization
+def add_absences(request):
+    """
+    This method will add the absences of many students for one lesson at once (roll call)
+    :param request:
+    :param_body: school_class_id, school_subject_id, absences (list of student_id, title, comment, is_justified)
+    :return: message, number of added absences, errors
+    """
+    body = request.data
+    if not Validation.add_absences_validation(data=body):
+        return error_handler(error_status=400, message=f'Wrong data!')
+    principal = request.principal
+    if not principal.has_role('Professor'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    try:
+        absences_number, errors = Absence.add_new_absences(data=body, professor_id=principal.user_id)
+    except ValueError as ex:
+        print(ex)
+        return error_handler(error_status=403, message=f'Absences are not added! {ex}')
+    status = 201 if absences_number else 400
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK' if absences_number else f'ERROR',
+                'code': status,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Absences are successfully added!' if absences_number else f'Absences are not added!',
+                'absences_number': absences_number,
+                'errors': errors
+            }
+        ),
+        content_type='application/json',
+        status=status
+    )
+
+
+@api_view(['PATCH'])
+@authorization
+def justify_absences(request):
+    """
+    This method will justify or unjustify many absences at once
+    :param request:
+    :param_body: absence_ids, is_justified
+    :return: message, number of changed absences
+    """
+    body = request.data
+    if not Validation.justify_absences_validation(data=body):
+        return error_handler(error_status=400, message=f'Wrong data!')
+    principal = request.principal
+    if not principal.has_role('Professor'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    absences_number = Absence.justify_absences(absence_ids=body['absence_ids'], is_justified=body['is_justified'])
+    return HttpResponse(
+        json.dumps(
+            {
+                'status': f'OK',
+                'code': 200,
+                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                'message': f'Absences are successfully justified!' if body['is_justified'] else f'Absences are successfully unjustified!',
+                'absences_number': absences_number
+            }
+        ),
+        content_type='application/json',
+        status=200
+    )
+
+
 @api_view(['PUT'])
 @authorization
 def edit_absence(request):
@@ -1717,13 +1959,9 @@ def edit_absence(request):
     body = request.data
     if not Validation.edit_absence_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
     absence = Absence.get_absence_by_id(body['absence_id'])
     if not absence:
         return error_handler(error_status=404, message='Not found!')
@@ -1745,41 +1983,52 @@ def edit_absence(request):
 
 @api_view(['GET'])
 @authorization
+@conditional_get(
+    'professor:{principal.user_id}',
+    'users',
+    'reference:roles',
+    'reference:genders',
+    'reference:school_subjects',
+    'school_classes'
+)
+@query_budget(3)
 def get_all_events_by_professor_id(request):
     """
     This method will get all the events by professor_id
     :param request:
     :return: list of events
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    user = User.objects.filter(id=requester_user.id).first()
-    if not user:
-        return error_handler(error_status=404, message=f'Not found!')
-    events = Event.get_all_events_by_professor_id(professor_id=user.id)
-    events = EventSerializer(many=True, instance=events).data
-    for event in events:
-        event = dict(event)
-        event['professor'] = dict(event['professor'])
-        event['professor']['role'] = dict(event['professor']['role'])
-        event['professor']['gender'] = dict(event['professor']['gender'])
-        event['school_subject'] = dict(event['school_subject'])
-        event['school_class'] = dict(event['school_class'])
+    events = Event.get_all_events_by_professor_id(professor_id=principal.user_id)
+    event_serializer = FlatSerializer.for_serializer(EventSerializer)
+    sideload = request.GET.get('include') == 'sideload'
+    try:
+        page = CursorPaginator(
+            queryset=events if sideload else event_serializer.prepare(events),
+            ordering=['-id']
+        ).paginate(request.GET)
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    if sideload:
+        events, included = event_serializer.serialize_sideloaded(page.results)
+    else:
+        events, included = event_serializer.serialize(page.results), None
+    data = {
+        'status': f'OK',
+        'code': 200,
+        'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        'message': f'Events',
+        'results': events,
+        'next': page.next,
+        'prev': page.prev,
+        'total': page.total,
+    }
+    if sideload:
+        data['included'] = included
     return HttpResponse(
-        json.dumps(
-            {
-                'status': f'OK',
-                'code': 200,
-                'server_time': django.utils.timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                'message': f'Events',
-                'results': events,
-            }
-        ),
+        json.dumps(data),
         content_type='application/json',
         status=200
     )
@@ -1794,14 +2043,10 @@ def delete_event(request, event_id):
     :param event_id:
     :return: message
     """
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    event = Event.get_event_by_id_and_professor_id(event_id=event_id, professor_id=requester_user.id)
+    event = Event.get_event_by_id_and_professor_id(event_id=event_id, professor_id=principal.user_id)
     if not event:
         return error_handler(error_status=404, message=f"Event doesn't exist!")
     event.delete_event()
@@ -1831,14 +2076,10 @@ def add_event(request):
     body = request.data
     if not Validation.add_event_validation(data=body):
         return error_handler(error_status=400, message=f'Wrong data!')
-    security_token = request.headers['Authorization']
-    decoded_security_token = User.check_security_token(security_token=security_token)
-    requester_user = User.get_user_by_email(email=decoded_security_token['email'])
-    if decoded_security_token['role'] != 'Professor':
+    principal = request.principal
+    if not principal.has_role('Professor'):
         return error_handler(error_status=403, message='Forbidden permission!')
-    if not requester_user:
-        return error_handler(error_status=404, message=f'Not found!')
-    if not Event.add_new_event(data=body, requester_id=requester_user.id):
+    if not Event.add_new_event(data=body, requester_id=principal.user_id):
         return error_handler(error_status=403, message='Event is not added!')
     return HttpResponse(
         json.dumps(
@@ -1852,3 +2093,34 @@ def add_event(request):
         content_type='application/json',
         status=201
     )
+
+
+@api_view(['GET'])
+@authorization
+@query_budget(0)
+def export_school_year(request, kind):
+    """
+    This method will stream all the grades or absences of a school year (or of one school class of the school year)
+    as a CSV or JSON Lines file, the names of the students, the school subjects and the professors are included
+    :param request:
+    :param kind: grades or absences
+    :param_query: school_year, school_class_id (optional), output (csv or jsonl, csv by default)
+    :return: file
+    """
+    principal = request.principal
+    if not principal.has_role('Administrator'):
+        return error_handler(error_status=403, message='Forbidden permission!')
+    query_string = request.GET
+    try:
+        school_class_id = int(query_string['school_class_id']) if query_string.get('school_class_id') else None
+        export = SchoolYearExport(
+            kind=kind,
+            school_year=query_string.get('school_year'),
+            school_class_id=school_class_id,
+            export_format=query_string.get('output', 'csv')
+        )
+    except ValueError as ex:
+        return error_handler(error_status=400, message=f'{ex}')
+    response = StreamingHttpResponse(export.lines(), content_type=export.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+    return response
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'school_book.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.BrokenLinkEmailsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'school_book.middleware.SecurityTokenMiddleware',
 ]
 
 ROOT_URLCONF = 'school_book_django.urls'
@@ -131,6 +133,26 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Verified security tokens cache (number of tokens, seconds)
+SECURITY_TOKEN_CACHE_SIZE = 10000
+SECURITY_TOKEN_CACHE_TTL = 300
+
+# Cursor pagination of the list endpoints (default and max number of rows per page)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Cached event feed pages of a parent (seconds), invalidated on the event and enrollment changes
+PARENT_EVENTS_CACHE_TTL = 300
+
+# Reference data kept in every process (seconds) before its version is checked in the database again
+REFERENCE_DATA_TTL = 5
+
+# Query metrics (slowest statements kept per request and per URL pattern, recent requests kept)
+QUERY_METRICS_SLOWEST = 5
+QUERY_METRICS_RECENT = 100
+# The test runner fails the tests when a view runs more queries than its query budget
+TEST_RUNNER = 'school_book.test_runner.QueryBudgetTestRunner'
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
 EMAIL_HOST = ''
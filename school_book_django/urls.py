@@ -27,23 +27,31 @@ urlpatterns = [
     path('school_book/users/user/<int:user_id>/activate', school_book_views.activate_or_deactivate_user),
     path('school_book/users/user/<int:user_id>/deactivate', school_book_views.activate_or_deactivate_user),
     path('school_book/login', school_book_views.login_user),
+    path('school_book/metrics', school_book_views.get_query_metrics),
     path('school_book/users/user/activate', school_book_views.activate_user),
     path('school_book/parent/children', school_book_views.get_children_by_parent_id),
+    path('school_book/parent/dashboard', school_book_views.get_parent_dashboard),
     path('school_book/school_subjects', school_book_views.get_all_school_subjects),
     # path('school_book/child/<int:user_id>/school_subject/<int:school_subject_id>/grades',
     #      school_book_views.get_all_student_grades),
     path('school_book/school_class/<int:school_class_id>/child/<int:user_id>/school_subject/<int:school_subject_id>/grades',
          school_book_views.get_all_student_grades),
+    path('school_book/school_class/<int:school_class_id>/child/<int:user_id>/grade_summaries',
+         school_book_views.get_grade_summaries),
+    path('school_book/school_class/<int:school_class_id>/grade_summaries', school_book_views.get_grade_summaries),
     path('school_book/parent/events', school_book_views.get_all_events_by_parent_id),
     path('school_book/school_class/<int:school_class_id>/child/<int:user_id>/school_subject/<int:school_subject_id>/isJustified/<str:is_justified>/absences',
          school_book_views.get_all_student_absences),
     path('school_book/school_class/<int:school_class_id>/child/<int:user_id>/school_subject/<int:school_subject_id>/absences',
          school_book_views.get_all_student_absences_number),
+    path('school_book/school_class/<int:school_class_id>/absences', school_book_views.get_school_class_absences_number),
     path('school_book/admin/roles', school_book_views.get_all_roles),
     path('school_book/admin/roles/new', school_book_views.add_new_role),
     path('school_book/admin/roles/role/<int:role_id>/delete', school_book_views.delete_role),
     path('school_book/admin/genders', school_book_views.get_all_genders),
+    path('school_book/admin/exports/<str:kind>', school_book_views.export_school_year),
     path('school_book/admin/users/add', school_book_views.add_new_user),
+    path('school_book/admin/users/import', school_book_views.import_users),
     path('school_book/admin/users/user/<int:user_id>/edit', school_book_views.edit_user),
     path('school_book/admin/users/user/<int:user_id>/change_password', school_book_views.change_user_password),
     path('school_book/admin/roles/role/<int:role_id>/edit', school_book_views.edit_role),
@@ -62,6 +70,8 @@ urlpatterns = [
     path('school_book/admin/school_classes/school_class/<int:school_class_id>/edit',
          school_book_views.edit_school_class),
     path('school_book/admin/school_classes/school_class/members/add', school_book_views.add_school_class_member),
+    path('school_book/admin/school_classes/school_class/<int:school_class_id>/members/bulk',
+         school_book_views.update_school_class_members),
     path('school_book/admin/school_classes/school_class/members/member/<int:member_id>/activate_or_deactivate',
          school_book_views.activate_or_deactivate_school_class_member),
     path('school_book/admin/school_classes/school_class/role_name/<str:role_name>/members/member/<int:member_id>/delete',
@@ -79,8 +89,11 @@ urlpatterns = [
     path('school_book/school_classes/<int:class_room_id>/information',
          school_book_views.get_all_school_room_information),
     path('school_book/school_classes/new_grade', school_book_views.add_new_grade),
+    path('school_book/school_classes/grades/bulk', school_book_views.add_new_grades),
     path('school_book/school_classes/absences/edit_absence', school_book_views.edit_absence),
     path('school_book/school_classes/absences/new_absence', school_book_views.add_absence),
+    path('school_book/school_classes/absences/roll_call', school_book_views.add_absences),
+    path('school_book/school_classes/absences/justify', school_book_views.justify_absences),
     path('school_book/professor/events', school_book_views.get_all_events_by_professor_id),
     path('school_book/professor/events/event/<int:event_id>/delete', school_book_views.delete_event),
     path('school_book/professor/events/add', school_book_views.add_event)